@@ -0,0 +1 @@
+"""Benchmarks of the webhook event processing."""
@@ -0,0 +1,286 @@
+"""Benchmark the PR event handler against the stub GitHub API.
+
+Run it with ``python -m benchmarks.handlers``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import typing
+
+from aiohttp import ClientSession
+import attr
+from gidgethub.sansio import Event
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+from octomachinery.github.api.raw_client import RawGitHubAPI
+from octomachinery.github.api.tokens import GitHubOAuthToken
+from octomachinery.github.models.events import GitHubEvent
+
+from .stub_github import StubGitHubAPI, StubRepository, make_synthetic_files
+
+
+DEFAULT_CHANGED_FILES_COUNTS = 1, 10, 100, 1000, 10_000, 50_000
+"""The sizes of the synthetic PRs to evaluate by default."""
+
+DEFAULT_DIFF_SOURCES = 'diff', 'files-api'
+"""The changed files sources to evaluate by default."""
+
+EVALUATION_OUTCOME_CACHES = 'verdicts', 'reported_check_runs'
+"""The caches remembering the evaluations rather than the inputs."""
+
+BENCHMARK_REPO_SLUG = 'bench/repo'
+"""The repository the synthetic PRs are opened against."""
+
+
+@attr.dataclass(frozen=True)
+class ScenarioResult:  # pylint: disable=too-few-public-methods
+    """The measurements of a single benchmark scenario."""
+
+    diff_source: str
+    """How the changed files were retrieved."""
+    changed_files_count: int
+    """How many files the PR changes."""
+    cold_latency: float
+    """Seconds the first evaluation took, with empty caches."""
+    warm_latencies: tuple[float, ...]
+    """Seconds each of the subsequent evaluations took."""
+    peak_memory: int
+    """The most bytes allocated at once during a warm evaluation."""
+    cold_api_calls: int
+    """API calls made by the first evaluation."""
+    warm_api_calls: int
+    """API calls made by the last evaluation."""
+
+    def to_row(self) -> tuple[typing.Any, ...]:
+        """Render the human-readable result table row."""
+        warm_latencies = self.warm_latencies or (self.cold_latency,)
+        return (
+            self.diff_source,
+            self.changed_files_count,
+            f'{self.cold_latency * 1000:.1f}',
+            f'{statistics.median(warm_latencies) * 1000:.1f}',
+            f'{max(warm_latencies) * 1000:.1f}',
+            f'{self.peak_memory / 2 ** 20:.2f}',
+            self.cold_api_calls,
+            self.warm_api_calls,
+        )
+
+
+RESULT_TABLE_HEADER = (
+    'source', 'files', 'cold ms', 'warm p50 ms', 'warm max ms',
+    'peak MiB', 'cold calls', 'warm calls',
+)
+
+
+def _import_chronographer():
+    """Import the bot modules, tuned for back-to-back evaluations."""
+    # NOTE: The debounce window would dominate the measurements.
+    os.environ.setdefault('CHRONOGRAPHER_DEBOUNCE_WINDOW', '0')
+    # pylint: disable-next=import-outside-toplevel
+    from chronographer import caching, diff_sources, event_handlers
+    return caching, diff_sources, event_handlers
+
+
+async def _evaluate_once(
+        stub_api: StubGitHubAPI,
+        event_handlers,
+        event_payload: typing.Mapping[str, typing.Any],
+) -> tuple[float, int]:
+    """Run the PR event handler, measuring its latency and API calls."""
+    stub_api.calls.clear()
+    started_at = time.perf_counter()
+    await event_handlers.on_pr(
+        Event(event_payload, event='pull_request', delivery_id='bench'),
+    )
+    latency = time.perf_counter() - started_at
+    return latency, sum(stub_api.calls.values())
+
+
+async def _trace_peak_memory(
+        stub_api: StubGitHubAPI,
+        event_handlers,
+        event_payload: typing.Mapping[str, typing.Any],
+) -> int:
+    """Run the PR event handler, measuring the allocations peak.
+
+    This is kept apart from the timed runs because tracing the memory
+    allocations slows everything down a lot.
+    """
+    tracemalloc.start()
+    try:
+        await _evaluate_once(stub_api, event_handlers, event_payload)
+        _current_memory, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_memory
+
+
+# pylint: disable-next=too-many-locals
+async def run_scenario(
+        *,
+        stub_api: StubGitHubAPI,
+        http_session: ClientSession,
+        diff_source: str,
+        changed_files_count: int,
+        iterations: int,
+) -> ScenarioResult:
+    """Evaluate a synthetic PR repeatedly, starting with cold caches."""
+    caching, diff_sources, event_handlers = _import_chronographer()
+    diff_sources.DIFF_SOURCE = diff_source
+
+    pull_request = stub_api.add_pull_request(
+        BENCHMARK_REPO_SLUG,
+        make_synthetic_files(changed_files_count),
+    )
+    event_payload = stub_api.make_pr_event_payload(
+        BENCHMARK_REPO_SLUG, pull_request.number,
+    )
+
+    async def get_token():
+        return GitHubOAuthToken('benchmark-token')
+
+    # pylint: disable=assigning-non-slot
+    RUNTIME_CONTEXT.IS_GITHUB_ACTION = False
+    RUNTIME_CONTEXT.github_event = GitHubEvent('pull_request', event_payload)
+    RUNTIME_CONTEXT.app_installation_client = RawGitHubAPI(
+        get_token,
+        session=http_session,
+        user_agent='Chronographer-Benchmarks',
+        base_url=stub_api.base_url,
+    )
+
+    named_caches = dict(caching.iter_named_caches())
+    for cache in named_caches.values():
+        cache.clear()
+
+    measurements = []
+    for _iteration in range(iterations):
+        # NOTE: Remembered verdicts and check runs would spare the warm
+        # NOTE: evaluations all the work being measured.
+        _forget_evaluations(named_caches)
+        measurements.append(
+            await _evaluate_once(stub_api, event_handlers, event_payload),
+        )
+    (cold_latency, cold_api_calls), *warm_measurements = measurements
+    _forget_evaluations(named_caches)
+    peak_memory = await _trace_peak_memory(
+        stub_api, event_handlers, event_payload,
+    )
+    return ScenarioResult(
+        diff_source=diff_source,
+        changed_files_count=changed_files_count,
+        cold_latency=cold_latency,
+        warm_latencies=tuple(latency for latency, _ in warm_measurements),
+        peak_memory=peak_memory,
+        cold_api_calls=cold_api_calls,
+        warm_api_calls=measurements[-1][-1],
+    )
+
+
+def _forget_evaluations(
+        named_caches: typing.Mapping[str, typing.Any],
+) -> None:
+    """Drop the outcomes of the evaluations done so far."""
+    for cache_name in EVALUATION_OUTCOME_CACHES:
+        named_caches[cache_name].clear()
+
+
+async def run_benchmarks(
+        *,
+        changed_files_counts: typing.Iterable[int],
+        diff_sources: typing.Iterable[str],
+        iterations: int,
+        latency: float,
+) -> list[ScenarioResult]:
+    """Run every scenario against a freshly served stub API."""
+    stub_api = StubGitHubAPI(latency=latency)
+    stub_api.add_repository(StubRepository(slug=BENCHMARK_REPO_SLUG))
+
+    async with stub_api.serve(), ClientSession() as http_session:
+        return [
+            await run_scenario(
+                stub_api=stub_api,
+                http_session=http_session,
+                diff_source=diff_source,
+                changed_files_count=changed_files_count,
+                iterations=iterations,
+            )
+            for diff_source in diff_sources
+            for changed_files_count in changed_files_counts
+        ]
+
+
+def _print_table(results: typing.Iterable[ScenarioResult]) -> None:
+    """Print the results aligned in columns."""
+    rows = [RESULT_TABLE_HEADER, *(r.to_row() for r in results)]
+    column_widths = [max(len(str(cell)) for cell in col) for col in zip(*rows)]
+    for row in rows:
+        print('  '.join(
+            str(cell).rjust(width) for cell, width in zip(row, column_widths)
+        ))
+
+
+def _parse_args(argv: typing.Sequence[str]) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.handlers',
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument(
+        '--files',
+        type=lambda counts: [int(c) for c in counts.split(',')],
+        default=DEFAULT_CHANGED_FILES_COUNTS,
+        help='comma-separated numbers of files the synthetic PRs change',
+    )
+    parser.add_argument(
+        '--diff-source',
+        action='append',
+        choices=DEFAULT_DIFF_SOURCES,
+        help='where to take the changed files from (default: all)',
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=5,
+        help='how many times to evaluate each PR, the first one cold',
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0,
+        help='seconds each stub API response is delayed by',
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='print the results as JSON lines instead of a table',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Sequence[str] | None = None) -> None:
+    """Run the benchmarks and report the results."""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    results = asyncio.run(
+        run_benchmarks(
+            changed_files_counts=args.files,
+            diff_sources=args.diff_source or DEFAULT_DIFF_SOURCES,
+            iterations=args.iterations,
+            latency=args.latency,
+        ),
+    )
+    if args.json:
+        for result in results:
+            print(json.dumps(attr.asdict(result)))
+    else:
+        _print_table(results)
+
+
+# pylint: disable=expression-not-assigned
+__name__ == '__main__' and main()
@@ -0,0 +1,166 @@
+"""Measure the import time of the GitHub Action entry point.
+
+Run it with ``python -m benchmarks.import_time``.
+"""
+
+import argparse
+import collections
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import typing
+
+import attr
+
+
+ENTRY_POINT_MODULE = 'chronographer.action'
+"""The module the Action imports on every run."""
+
+RUNNER_MODULE = 'octomachinery.app.action.runner'
+"""The dependency the entry point builds upon, outside of our control."""
+
+DEFAULT_BUDGET_MS = 80
+"""The import time the entry point may add on top of the runner."""
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+"""The directory the measured interpreters import the app from."""
+
+
+@attr.dataclass(frozen=True)
+class ImportTimeResult:  # pylint: disable=too-few-public-methods
+    """The median import times over the measured runs."""
+
+    total_ms: float
+    """The time to import the entry point with everything it needs."""
+    runner_ms: float
+    """The share of it spent importing the Action runner."""
+    slowest_modules: tuple[tuple[str, float], ...]
+    """The modules taking the longest to execute themselves."""
+
+    @property
+    def own_ms(self) -> float:
+        """Return the time the app adds on top of the runner."""
+        return self.total_ms - self.runner_ms
+
+
+def measure_import_once(module_name: str) -> dict[str, tuple[float, float]]:
+    """Import the module in a fresh interpreter.
+
+    Return the self and the cumulative microseconds each module took.
+    """
+    completed_process = subprocess.run(
+        (sys.executable, '-X', 'importtime', '-c', f'import {module_name}'),
+        capture_output=True,
+        check=True,
+        cwd=REPO_ROOT,
+        text=True,
+    )
+    import_times = {}
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        self_us, cumulative_us, imported_module = (
+            column.strip()
+            for column in line.removeprefix('import time:').split('|')
+        )
+        if not self_us.isdigit():  # The column titles
+            continue
+
+        import_times[imported_module] = float(self_us), float(cumulative_us)
+    return import_times
+
+
+def measure_import_time(*, runs: int, top: int) -> ImportTimeResult:
+    """Import the entry point ``runs`` times and take the medians."""
+    totals, runner_totals = [], []
+    self_times: collections.defaultdict[str, list[float]] = (
+        collections.defaultdict(list)
+    )
+    for _run in range(runs):
+        import_times = measure_import_once(ENTRY_POINT_MODULE)
+        totals.append(import_times[ENTRY_POINT_MODULE][1] / 1000)
+        runner_totals.append(import_times[RUNNER_MODULE][1] / 1000)
+        for imported_module, (self_us, _cumulative_us) in import_times.items():
+            self_times[imported_module].append(self_us / 1000)
+
+    return ImportTimeResult(
+        total_ms=statistics.median(totals),
+        runner_ms=statistics.median(runner_totals),
+        slowest_modules=tuple(
+            sorted(
+                (
+                    (imported_module, statistics.median(module_self_times))
+                    for imported_module, module_self_times
+                    in self_times.items()
+                ),
+                key=lambda module_time: module_time[1],
+                reverse=True,
+            )[:top],
+        ),
+    )
+
+
+def _print_report(result: ImportTimeResult, budget_ms: float) -> None:
+    """Print the medians along with the slowest modules."""
+    print(f'{ENTRY_POINT_MODULE}: {result.total_ms:.1f}ms')
+    print(f'{RUNNER_MODULE}: {result.runner_ms:.1f}ms')
+    print(f'own: {result.own_ms:.1f}ms (budget: {budget_ms:g}ms)')
+    print('slowest modules:')
+    for imported_module, self_ms in result.slowest_modules:
+        print(f'{self_ms:8.1f}ms  {imported_module}')
+
+
+def _parse_args(argv: typing.Sequence[str]) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.import_time',
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument(
+        '--runs',
+        type=int,
+        default=10,
+        help='how many fresh interpreters to import it in',
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='how many of the slowest modules to list',
+    )
+    parser.add_argument(
+        '--budget-ms',
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help='fail if the app adds more than this on top of the runner '
+        '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='print the result as JSON instead of a report',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Sequence[str] | None = None) -> None:
+    """Measure the import time and check it against the budget."""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    result = measure_import_time(runs=args.runs, top=args.top)
+    if args.json:
+        print(json.dumps({**attr.asdict(result), 'own_ms': result.own_ms}))
+    else:
+        _print_report(result, args.budget_ms)
+
+    if result.own_ms > args.budget_ms:
+        sys.exit(
+            f'The entry point import takes {result.own_ms:.1f}ms on top of '
+            f'the runner, over the {args.budget_ms:g}ms budget',
+        )
+
+
+# pylint: disable=expression-not-assigned
+__name__ == '__main__' and main()
@@ -0,0 +1,468 @@
+"""Replay recorded webhook deliveries against a running bot instance.
+
+Run it with ``python -m benchmarks.replay``.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+import hmac
+import json
+import math
+import pathlib
+import sys
+import time
+import typing
+import uuid
+
+from aiohttp import ClientError, ClientSession
+import attr
+
+from .stub_github import StubGitHubAPI, StubRepository, make_synthetic_files
+
+
+EVENT_FIXTURE_SUFFIX = '_event'
+"""The file name suffix of the ``<event>_event.json`` fixtures."""
+
+RECORDED_HEADERS_TO_DROP = frozenset({
+    'content-length',
+    'content-type',
+    'x-github-delivery',
+    'x-hub-signature',
+    'x-hub-signature-256',
+})
+"""Headers made up anew for every replayed delivery."""
+
+
+@attr.dataclass(frozen=True)
+class Delivery:
+    """A recorded webhook delivery."""
+
+    event: str
+    """The ``X-GitHub-Event`` name."""
+    payload: typing.Mapping[str, typing.Any]
+    """The webhook payload."""
+    headers: typing.Mapping[str, str] = attr.Factory(dict)
+    """Any extra HTTP headers recorded along with the payload."""
+    timestamp: float | None = None
+    """When the delivery happened originally, in seconds since epoch."""
+
+    @property
+    def pull_requests(self) -> list[dict[str, typing.Any]]:
+        """Find the pull requests the delivery is about, if any.
+
+        The lookup mirrors the one of the bot PR event handler.
+        """
+        if 'pull_request' in self.payload:
+            return [self.payload['pull_request']]
+
+        check_suite = (
+            self.payload.get('check_run', {}).get('check_suite')
+            if self.event == 'check_run'
+            else self.payload.get('check_suite')
+        ) or {}
+        return check_suite.get('pull_requests') or []
+
+    @property
+    def pull_request(self) -> typing.Mapping[str, typing.Any] | None:
+        """Find the first pull request the delivery is about, if any."""
+        return next(iter(self.pull_requests), None)
+
+    def render(
+            self,
+            *,
+            webhook_secret: str | None,
+    ) -> tuple[dict[str, str], bytes]:
+        """Make the HTTP headers and body, signing it if possible."""
+        http_body = json.dumps(self.payload).encode()
+        http_headers = {
+            **self.headers,
+            'content-type': 'application/json',
+            'x-github-event': self.event,
+            'x-github-delivery': str(uuid.uuid4()),
+        }
+        if webhook_secret is not None:
+            for header_name, digest in (
+                    ('x-hub-signature', 'sha1'),
+                    ('x-hub-signature-256', 'sha256'),
+            ):
+                signature = hmac.new(
+                    webhook_secret.encode(), http_body, digest,
+                ).hexdigest()
+                http_headers[header_name] = f'{digest}={signature}'
+        return http_headers, http_body
+
+
+@attr.dataclass(frozen=True)
+class DeliveryOutcome:  # pylint: disable=too-few-public-methods
+    """How the server reacted to a replayed delivery."""
+
+    delivery: Delivery
+    """The delivery replayed."""
+    sent_at: float
+    """The monotonic time of sending the delivery."""
+    ack_latency: float
+    """Seconds until the server responded."""
+    status: int | None
+    """The HTTP response status, ``None`` on connection errors."""
+
+    @property
+    def is_error(self) -> bool:
+        """Tell whether the delivery failed."""
+        return self.status is None or self.status >= 400
+
+
+def _parse_timestamp(timestamp: typing.Any) -> float | None:
+    """Turn an ISO 8601 or a numeric timestamp into epoch seconds."""
+    if timestamp is None or isinstance(timestamp, (int, float)):
+        return timestamp
+
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+
+
+def load_deliveries(paths: typing.Iterable[pathlib.Path]) -> list[Delivery]:
+    """Read the deliveries from JSONL recordings and event fixtures.
+
+    Each JSONL line is an object with ``headers`` and ``body`` and,
+    optionally, ``event`` and ``timestamp``. The JSON files hold bare
+    payloads of the event their ``<event>_event.json`` name tells.
+    """
+    deliveries = []
+    for path in paths:
+        if path.suffix != '.jsonl':
+            deliveries.append(Delivery(
+                event=path.stem.removesuffix(EVENT_FIXTURE_SUFFIX),
+                payload=json.loads(path.read_text()),
+            ))
+            continue
+
+        for recorded_line in path.read_text().splitlines():
+            if not recorded_line.strip():
+                continue
+            recorded = json.loads(recorded_line)
+            headers = {
+                name.lower(): value
+                for name, value in recorded.get('headers', {}).items()
+                if name.lower() not in RECORDED_HEADERS_TO_DROP
+            }
+            payload = recorded['body']
+            deliveries.append(Delivery(
+                event=recorded.get('event') or headers.pop('x-github-event'),
+                payload=json.loads(payload)
+                if isinstance(payload, str) else payload,
+                headers=headers,
+                timestamp=_parse_timestamp(recorded.get('timestamp')),
+            ))
+    return deliveries
+
+
+def adapt_to_stub_api(
+        delivery: Delivery,
+        stub_api: StubGitHubAPI,
+        *,
+        changed_files_count: int,
+) -> Delivery:
+    """Serve the delivery repo and PR via the stub and point at them."""
+    pull_request = delivery.pull_request
+    repository = delivery.payload.get('repository')
+    if pull_request is None or repository is None:
+        return delivery
+
+    repo_slug = repository['full_name']
+    pr_number = pull_request['number']
+    if not stub_api.has_pull_request(repo_slug, pr_number):
+        stub_api.add_repository(StubRepository(slug=repo_slug))
+        stub_api.add_pull_request(
+            repo_slug,
+            make_synthetic_files(changed_files_count),
+            number=pr_number,
+            head_sha=pull_request['head']['sha'],
+        )
+    stub_payload = stub_api.make_pr_event_payload(repo_slug, pr_number)
+    payload = json.loads(json.dumps(delivery.payload))  # Deep copy
+    payload['repository'] = {**stub_payload['repository'], **repository}
+    payload['repository'].setdefault('default_branch', 'main')
+    stub_pull_request = {
+        **stub_payload['pull_request'],
+        **pull_request,
+        'diff_url': stub_payload['pull_request']['diff_url'],
+        'issue_url': stub_payload['pull_request']['issue_url'],
+    }
+    stub_pull_request.setdefault('labels', [])
+    stub_delivery = attr.evolve(delivery, payload=payload)
+    stub_delivery.pull_requests[0].update(stub_pull_request)
+    return stub_delivery
+
+
+def make_schedule(
+        deliveries: typing.Sequence[Delivery],
+        *,
+        rate: float | None,
+        time_compression: float | None,
+) -> list[float | None]:
+    """Compute when to send each delivery, relative to the start.
+
+    ``None`` means as soon as a concurrency slot frees up.
+    """
+    if rate is not None:
+        return [n / rate for n in range(len(deliveries))]
+
+    if time_compression is not None:
+        first_timestamp = min(
+            (d.timestamp for d in deliveries if d.timestamp is not None),
+            default=0,
+        )
+        return [
+            ((d.timestamp or first_timestamp) - first_timestamp)
+            / time_compression
+            for d in deliveries
+        ]
+
+    return [None] * len(deliveries)
+
+
+async def replay(
+        deliveries: typing.Sequence[Delivery],
+        *,
+        webhook_url: str,
+        webhook_secret: str | None,
+        schedule: typing.Sequence[float | None],
+        concurrency: int,
+) -> tuple[list[DeliveryOutcome], float]:
+    """Send the deliveries following the schedule.
+
+    Return the outcomes and how many seconds sending them all took.
+    """
+    concurrency_slots = asyncio.Semaphore(concurrency)
+
+    async def send(http_session, delivery, send_after, replay_started_at):
+        if send_after is not None:
+            await asyncio.sleep(
+                replay_started_at + send_after - time.monotonic(),
+            )
+        async with concurrency_slots:
+            http_headers, http_body = delivery.render(
+                webhook_secret=webhook_secret,
+            )
+            sent_at = time.monotonic()
+            try:
+                async with http_session.post(
+                        webhook_url, data=http_body, headers=http_headers,
+                ) as http_response:
+                    await http_response.read()
+                    status = http_response.status
+            except ClientError:
+                status = None
+            return DeliveryOutcome(
+                delivery=delivery,
+                sent_at=sent_at,
+                ack_latency=time.monotonic() - sent_at,
+                status=status,
+            )
+
+    async with ClientSession() as http_session:
+        replay_started_at = time.monotonic()
+        outcomes = await asyncio.gather(*(
+            send(http_session, delivery, send_after, replay_started_at)
+            for delivery, send_after in zip(deliveries, schedule)
+        ))
+        return outcomes, time.monotonic() - replay_started_at
+
+
+async def wait_for_verdicts(
+        outcomes: typing.Iterable[DeliveryOutcome],
+        stub_api: StubGitHubAPI,
+        *,
+        timeout: float,
+) -> list[float]:
+    """Collect the seconds from each PR delivery to its check run verdict.
+
+    The deliveries still waiting for one after ``timeout`` are left out.
+    """
+    awaited_verdicts = [
+        (
+            o.delivery.payload['repository']['full_name'],
+            o.delivery.pull_request['head']['sha'],
+            o.sent_at,
+        )
+        for o in outcomes
+        if not o.is_error and o.delivery.pull_request is not None
+    ]
+
+    def match_verdicts():
+        return [
+            min((
+                completed_at - sent_at
+                for c_repo_slug, c_head_sha, completed_at
+                in stub_api.check_run_completions
+                if (c_repo_slug, c_head_sha) == (repo_slug, head_sha)
+                and completed_at >= sent_at
+            ), default=None)
+            for repo_slug, head_sha, sent_at in awaited_verdicts
+        ]
+
+    deadline = time.monotonic() + timeout
+    verdict_latencies = match_verdicts()
+    while None in verdict_latencies and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        verdict_latencies = match_verdicts()
+    return [latency for latency in verdict_latencies if latency is not None]
+
+
+def percentile(values: typing.Sequence[float], rank: float) -> float:
+    """Pick the nearest-rank percentile of the values."""
+    sorted_values = sorted(values)
+    return sorted_values[
+        max(math.ceil(rank / 100 * len(sorted_values)) - 1, 0)
+    ]
+
+
+def _format_latencies(latencies: typing.Sequence[float]) -> str:
+    """Render the latency percentiles in milliseconds."""
+    if not latencies:
+        return 'n/a'
+
+    return ' '.join(
+        f'p{rank:d}={percentile(latencies, rank) * 1000:.1f}ms'
+        for rank in (50, 95, 99)
+    )
+
+
+def print_report(
+        outcomes: typing.Sequence[DeliveryOutcome],
+        replay_duration: float,
+        verdict_latencies: typing.Sequence[float] | None,
+) -> None:
+    """Summarize the replay outcomes."""
+    errors_count = sum(o.is_error for o in outcomes)
+    print(f'deliveries:   {len(outcomes):d} in {replay_duration:.2f}s')
+    print(
+        'throughput:   '
+        f'{len(outcomes) / max(replay_duration, 1e-9):.1f} deliveries/s',
+    )
+    print(
+        f'errors:       {errors_count:d} '
+        f'({errors_count / max(len(outcomes), 1) * 100:.1f}%)',
+    )
+    print(
+        'ack latency:  '
+        f'{_format_latencies([o.ack_latency for o in outcomes])}',
+    )
+    if verdict_latencies is not None:
+        awaited_count = sum(
+            o.delivery.pull_request is not None and not o.is_error
+            for o in outcomes
+        )
+        print(
+            f'verdicts:     {len(verdict_latencies):d} of {awaited_count:d} '
+            f'{_format_latencies(verdict_latencies)}',
+        )
+
+
+def _parse_args(argv: typing.Sequence[str]) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.replay',
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument(
+        'recordings', nargs='+', type=pathlib.Path,
+        help='JSONL recordings of deliveries or *_event.json fixtures',
+    )
+    parser.add_argument(
+        '--url', default='http://localhost:8080',
+        help='the webhook endpoint of the bot (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--secret',
+        help='the webhook secret to sign the payloads with',
+    )
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument(
+        '--rate', type=float,
+        help='deliveries per second to send, regardless of the responses',
+    )
+    pacing.add_argument(
+        '--time-compression', type=float,
+        help='replay the recorded timeline this many times faster',
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=10,
+        help='the most deliveries awaiting responses at once '
+        '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=1,
+        help='how many times to go through the recordings',
+    )
+    parser.add_argument(
+        '--stub-api', metavar='HOST:PORT',
+        help='serve a stub GitHub API there and measure the time to the '
+        'check run verdicts; start the bot with '
+        'CHRONOGRAPHER_GITHUB_API_URL pointing to it',
+    )
+    parser.add_argument(
+        '--stub-latency', type=float, default=0,
+        help='seconds each stub API response is delayed by',
+    )
+    parser.add_argument(
+        '--stub-changed-files', type=int, default=100,
+        help='how many files each stub PR changes (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--drain-timeout', type=float, default=30,
+        help='seconds to wait for the check run verdicts after replaying',
+    )
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    """Replay the recordings as the arguments say."""
+    recorded_deliveries = load_deliveries(args.recordings)
+    deliveries = recorded_deliveries * args.repeat
+    schedule = make_schedule(
+        deliveries, rate=args.rate, time_compression=args.time_compression,
+    )
+    if args.time_compression is not None:
+        # NOTE: The recorded timeline is played back to back on repeat.
+        recording_span = max(schedule[:len(recorded_deliveries)])
+        schedule = [
+            send_after + n // len(recorded_deliveries) * recording_span
+            for n, send_after in enumerate(schedule)
+        ]
+    replay_kwargs = {
+        'webhook_url': args.url,
+        'webhook_secret': args.secret,
+        'schedule': schedule,
+        'concurrency': args.concurrency,
+    }
+
+    if args.stub_api is None:
+        outcomes, replay_duration = await replay(deliveries, **replay_kwargs)
+        print_report(outcomes, replay_duration, verdict_latencies=None)
+        return
+
+    stub_host, _sep, stub_port = args.stub_api.rpartition(':')
+    stub_api = StubGitHubAPI(latency=args.stub_latency)
+    async with stub_api.serve(stub_host or '127.0.0.1', int(stub_port)):
+        deliveries = [
+            adapt_to_stub_api(
+                delivery, stub_api,
+                changed_files_count=args.stub_changed_files,
+            )
+            for delivery in deliveries
+        ]
+        outcomes, replay_duration = await replay(deliveries, **replay_kwargs)
+        verdict_latencies = await wait_for_verdicts(
+            outcomes, stub_api, timeout=args.drain_timeout,
+        )
+    print_report(outcomes, replay_duration, verdict_latencies)
+
+
+def main(argv: typing.Sequence[str] | None = None) -> None:
+    """Replay the deliveries and report the server behavior."""
+    asyncio.run(_run(_parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+# pylint: disable=expression-not-assigned
+__name__ == '__main__' and main()
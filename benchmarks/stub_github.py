@@ -0,0 +1,522 @@
+"""An in-process stand-in for the GitHub API endpoints the bot uses."""
+
+import asyncio
+from base64 import b64encode
+import collections
+import contextlib
+from datetime import datetime, timedelta, timezone
+import hashlib
+import itertools
+import json
+import time
+import typing
+
+from aiohttp import web
+import attr
+import yaml
+
+
+FILES_PAGE_SIZE = 100
+"""The maximum number of PR files the stub returns per page."""
+
+
+def _make_blob_sha(blob_contents: bytes) -> str:
+    """Compute the Git blob SHA of the contents."""
+    return hashlib.sha1(
+        b'blob %d\0%s' % (len(blob_contents), blob_contents),
+    ).hexdigest()
+
+
+@attr.dataclass(frozen=True)
+class SyntheticFile:
+    """A file changed in a synthetic pull request."""
+
+    path: str
+    """The path of the file after the change."""
+    status: str = 'modified'
+    """The GitHub files API status: ``added``, ``removed``, etc."""
+    additions: int = 1
+    """The number of lines added to the file."""
+
+    def render_diff(self) -> bytes:
+        """Render the file change as a part of a unified Git diff."""
+        path = self.path.encode()
+        diff_header = [b'diff --git a/%s b/%s' % (path, path)]
+        source_path, target_path = b'a/' + path, b'b/' + path
+        if self.status == 'added':
+            diff_header.append(b'new file mode 100644')
+            source_path = b'/dev/null'
+        elif self.status == 'removed':
+            diff_header.append(b'deleted file mode 100644')
+            target_path = b'/dev/null'
+        diff_header.extend((
+            b'index 0000000..1111111',
+            b'--- ' + source_path,
+            b'+++ ' + target_path,
+            b'@@ -1,%d +1,%d @@' % (
+                0 if self.status == 'added' else 1,
+                0 if self.status == 'removed' else self.additions + 1,
+            ),
+        ))
+        hunk_lines = (
+            [b'-removed line']
+            if self.status == 'removed'
+            else [b' context line'] * (self.status != 'added')
+            + [b'+added line %d' % n for n in range(self.additions)]
+        )
+        return b'\n'.join(diff_header + hunk_lines) + b'\n'
+
+    def to_files_api(self) -> dict[str, typing.Any]:
+        """Render the file as a PR files API response item."""
+        return {
+            'filename': self.path,
+            'status': self.status,
+            'additions': self.additions,
+        }
+
+
+def make_synthetic_files(
+        changed_files_count: int,
+        *,
+        news_fragment_position: float | None = 1.0,
+) -> list[SyntheticFile]:
+    """Generate the changes of a PR touching the given number of files.
+
+    The news fragment is put at the given relative position within the
+    changes, ``1.0`` being the very end, or omitted with ``None``.
+    """
+    changed_files = [
+        SyntheticFile(path=f'src/pkg{n // 100:d}/module{n:d}.py', additions=3)
+        for n in range(
+            changed_files_count - (news_fragment_position is not None),
+        )
+    ]
+    if news_fragment_position is not None:
+        changed_files.insert(
+            round(news_fragment_position * len(changed_files)),
+            SyntheticFile(path='news/1.bugfix', status='added'),
+        )
+    return changed_files
+
+
+@attr.dataclass
+class StubPullRequest:  # pylint: disable=too-few-public-methods
+    """A pull request the stub API serves."""
+
+    number: int
+    """The PR number."""
+    head_sha: str
+    """The PR head commit SHA."""
+    changed_files: list[SyntheticFile]
+    """The files changed in the PR."""
+    diff: bytes = b''
+    """The pre-rendered PR diff."""
+
+    def __attrs_post_init__(self) -> None:
+        """Render the diff upfront so serving it costs nothing."""
+        self.diff = b''.join(f.render_diff() for f in self.changed_files)
+
+
+@attr.dataclass
+class StubRepository:  # pylint: disable=too-few-public-methods
+    """A repository the stub API serves."""
+
+    slug: str
+    """The ``owner/name`` repository slug."""
+    chronographer_config: typing.Mapping[str, typing.Any] = attr.Factory(
+        dict,
+    )
+    """The contents of ``.github/chronographer.yml``."""
+    towncrier_config: str = '[tool.towncrier]\ndirectory = "news"\n'
+    """The contents of ``pyproject.toml``."""
+    default_branch: str = 'main'
+    """The repository default branch."""
+    pull_requests: dict[int, StubPullRequest] = attr.Factory(dict)
+    """The pull requests of the repository by their numbers."""
+
+
+class StubGitHubAPI:
+    """A fake GitHub API served by an in-process aiohttp app.
+
+    Every response gets delayed by ``latency`` seconds to resemble
+    the network round-trips. The calls are counted per endpoint.
+    """
+
+    def __init__(self, *, latency: float = 0) -> None:
+        """Initialize a stub API with no repositories."""
+        self.latency = latency
+        self.calls: collections.Counter[str] = collections.Counter()
+        """The number of API calls made, by the endpoint."""
+        self.base_url = None
+        """The stub API URL, once it's being served."""
+        self.check_run_completions: list[tuple[str, str, float]] = []
+        """Repo slugs, head SHAs and monotonic times of the verdicts."""
+        self._repos: dict[str, StubRepository] = {}
+        self._check_run_ids = itertools.count(1)
+        self._check_run_heads: dict[int, tuple[str, str]] = {}
+
+    def add_repository(self, repo: StubRepository) -> StubRepository:
+        """Start serving the repository unless it's served already."""
+        return self._repos.setdefault(repo.slug, repo)
+
+    def has_pull_request(self, repo_slug: str, pr_number: int) -> bool:
+        """Check whether the PR is being served."""
+        return pr_number in self._repos.get(
+            repo_slug, StubRepository(slug=repo_slug),
+        ).pull_requests
+
+    def add_pull_request(
+            self,
+            repo_slug: str,
+            changed_files: list[SyntheticFile],
+            *,
+            number: int | None = None,
+            head_sha: str | None = None,
+    ) -> StubPullRequest:
+        """Start serving a pull request with the given changes."""
+        repo = self._repos[repo_slug]
+        number = number or len(repo.pull_requests) + 1
+        pull_request = repo.pull_requests[number] = StubPullRequest(
+            number=number,
+            head_sha=head_sha or hashlib.sha1(b'%s#%d' % (
+                repo_slug.encode(), number,
+            )).hexdigest(),
+            changed_files=changed_files,
+        )
+        return pull_request
+
+    def make_pr_event_payload(
+            self,
+            repo_slug: str,
+            pr_number: int,
+            *,
+            action: str = 'synchronize',
+            labels: typing.Iterable[str] = (),
+            installation_id: int = 1,
+    ) -> dict[str, typing.Any]:
+        """Compose a ``pull_request`` webhook payload for the PR."""
+        repo = self._repos[repo_slug]
+        pull_request = repo.pull_requests[pr_number]
+        return {
+            'action': action,
+            'installation': {'id': installation_id},
+            'repository': {
+                'full_name': repo.slug,
+                'default_branch': repo.default_branch,
+            },
+            'pull_request': {
+                'number': pull_request.number,
+                'head': {'ref': 'feature', 'sha': pull_request.head_sha},
+                'base': {
+                    'ref': repo.default_branch,
+                    'sha': hashlib.sha1(repo.slug.encode()).hexdigest(),
+                },
+                'user': {'login': 'contributor', 'type': 'User'},
+                'labels': [{'name': label} for label in labels],
+                'changed_files': len(pull_request.changed_files),
+                'issue_url':
+                    f'{self.base_url}/repos/{repo.slug}/issues/{pr_number:d}',
+                'diff_url':
+                    f'{self.base_url}/{repo.slug}/pull/{pr_number:d}.diff',
+            },
+        }
+
+    def make_app(self) -> web.Application:
+        """Route the endpoints the bot hits."""
+        web_app = web.Application(middlewares=[self._count_and_delay])
+        web_app.router.add_get('/app/installations', self._get_installations)
+        web_app.router.add_get(
+            '/app/installations/{installation_id:\\d+}',
+            self._get_installation,
+        )
+        web_app.router.add_post(
+            '/app/installations/{installation_id:\\d+}/access_tokens',
+            self._create_access_token,
+        )
+        repo_prefix = '/repos/{owner}/{repo}'
+        web_app.router.add_get(
+            f'{repo_prefix}/contents/{{path:.+}}', self._get_file_contents,
+        )
+        web_app.router.add_get(
+            f'{repo_prefix}/contents', self._get_root_listing,
+        )
+        web_app.router.add_get(
+            f'{repo_prefix}/git/blobs/{{sha}}', self._get_blob,
+        )
+        web_app.router.add_get(
+            f'{repo_prefix}/pulls', self._list_pull_requests,
+        )
+        web_app.router.add_get(
+            f'{repo_prefix}/pulls/{{number:\\d+}}', self._get_pull_request,
+        )
+        web_app.router.add_get(
+            f'{repo_prefix}/pulls/{{number:\\d+}}/files', self._get_pr_files,
+        )
+        web_app.router.add_get(
+            '/{owner}/{repo}/pull/{number:\\d+}.diff', self._get_pr_diff,
+        )
+        web_app.router.add_post(
+            f'{repo_prefix}/check-runs', self._create_check_run,
+        )
+        web_app.router.add_patch(
+            f'{repo_prefix}/check-runs/{{check_run_id:\\d+}}',
+            self._update_check_run,
+        )
+        web_app.router.add_post(
+            f'{repo_prefix}/issues/{{number:\\d+}}/labels', self._add_labels,
+        )
+        return web_app
+
+    @contextlib.asynccontextmanager
+    async def serve(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 0,
+    ) -> typing.AsyncIterator['StubGitHubAPI']:
+        """Serve the stub API on a local port for the duration."""
+        aiohttp_server_runner = web.AppRunner(self.make_app())
+        await aiohttp_server_runner.setup()
+        aiohttp_tcp_site = web.TCPSite(aiohttp_server_runner, host, port)
+        await aiohttp_tcp_site.start()
+        # pylint: disable-next=protected-access
+        bound_host, bound_port = aiohttp_tcp_site._server.sockets[
+            0
+        ].getsockname()[:2]
+        self.base_url = f'http://{bound_host}:{bound_port:d}'
+        try:
+            yield self
+        finally:
+            await aiohttp_server_runner.cleanup()
+            self.base_url = None
+
+    @web.middleware
+    async def _count_and_delay(self, request, handler):
+        """Count the call against its endpoint and simulate latency."""
+        self.calls[
+            f'{request.method} {request.match_info.route.resource.canonical}'
+            if request.match_info.route.resource is not None
+            else f'{request.method} <unrouted>'
+        ] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _make_installation(self, installation_id: int) -> dict:
+        """Render the installation as the GitHub App API returns it."""
+        return {
+            'id': installation_id,
+            'app_id': 1,
+            'app_slug': 'chronographer-stub',
+            'created_at': '2020-01-01T00:00:00Z',
+            'updated_at': '2020-01-01T00:00:00Z',
+            'account': {'login': f'stub-account-{installation_id:d}'},
+            'events': ['pull_request', 'check_run', 'check_suite', 'push'],
+            'permissions': {'checks': 'write', 'pull_requests': 'write'},
+            'repository_selection': 'all',
+            'single_file_name': None,
+            'target_id': installation_id,
+            'target_type': 'Organization',
+            'access_tokens_url':
+                f'{self.base_url}/app/installations'
+                f'/{installation_id:d}/access_tokens',
+            'html_url': f'{self.base_url}/settings/installations',
+            'repositories_url': f'{self.base_url}/installation/repositories',
+            'suspended_at': None,
+            'suspended_by': None,
+            'has_multiple_single_files': False,
+            'single_file_paths': [],
+        }
+
+    def _record_check_run(self, check_run_id: int, check_run: dict) -> None:
+        """Remember when the check run reached its final state."""
+        if check_run.get('status') == 'completed':
+            self.check_run_completions.append(
+                (*self._check_run_heads[check_run_id], time.monotonic()),
+            )
+
+    def _get_repo(self, request: web.Request) -> StubRepository:
+        """Look up the repository the request is about."""
+        repo_slug = '/'.join((
+            request.match_info['owner'], request.match_info['repo'],
+        ))
+        try:
+            return self._repos[repo_slug]
+        except KeyError:
+            raise web.HTTPNotFound(
+                text=json.dumps({'message': 'Not Found'}),
+                content_type='application/json',
+            ) from None
+
+    def _get_pr(self, request: web.Request) -> StubPullRequest:
+        """Look up the pull request the request is about."""
+        try:
+            return self._get_repo(request).pull_requests[
+                int(request.match_info['number'])
+            ]
+        except KeyError:
+            raise web.HTTPNotFound(
+                text=json.dumps({'message': 'Not Found'}),
+                content_type='application/json',
+            ) from None
+
+    def _get_repo_files(self, repo: StubRepository) -> dict[str, bytes]:
+        """Render the files the bot reads from the repository."""
+        return {
+            '.github/chronographer.yml': yaml.safe_dump(
+                repo.chronographer_config,
+            ).encode(),
+            'pyproject.toml': repo.towncrier_config.encode(),
+        }
+
+    async def _get_installations(self, _request):
+        """List the only installation of the stub app."""
+        return web.json_response([self._make_installation(1)])
+
+    async def _get_installation(self, request):
+        """Serve any installation asked for."""
+        return web.json_response(
+            self._make_installation(
+                int(request.match_info['installation_id']),
+            ),
+        )
+
+    async def _create_access_token(self, request):
+        """Issue an installation token valid for an hour."""
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        return web.json_response(
+            {
+                'token':
+                    f'stub-token-{request.match_info["installation_id"]}',
+                'expires_at': expires_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'permissions': {},
+                'repository_selection': 'all',
+            },
+            status=201,
+        )
+
+    async def _get_file_contents(self, request):
+        """Serve a file via the contents API with an ETag."""
+        repo = self._get_repo(request)
+        file_contents = self._get_repo_files(repo).get(
+            request.match_info['path'],
+        )
+        if file_contents is None:
+            return web.json_response({'message': 'Not Found'}, status=404)
+
+        blob_sha = _make_blob_sha(file_contents)
+        if request.headers.get('If-None-Match') == f'"{blob_sha}"':
+            return web.Response(status=304)
+
+        return web.json_response(
+            {
+                'type': 'file',
+                'encoding': 'base64',
+                'content': b64encode(file_contents).decode(),
+                'sha': blob_sha,
+            },
+            headers={'ETag': f'"{blob_sha}"'},
+        )
+
+    async def _get_root_listing(self, request):
+        """List the repository root via the contents API."""
+        repo = self._get_repo(request)
+        return web.json_response([
+            {'name': path, 'type': 'file', 'sha': _make_blob_sha(contents)}
+            for path, contents in self._get_repo_files(repo).items()
+            if '/' not in path
+        ])
+
+    async def _get_blob(self, request):
+        """Serve a Git blob by its SHA."""
+        repo = self._get_repo(request)
+        for file_contents in self._get_repo_files(repo).values():
+            if _make_blob_sha(file_contents) == request.match_info['sha']:
+                return web.json_response({
+                    'encoding': 'base64',
+                    'content': b64encode(file_contents).decode(),
+                })
+        return web.json_response({'message': 'Not Found'}, status=404)
+
+    async def _get_pull_request(self, request):
+        """Serve the pull request object."""
+        repo = self._get_repo(request)
+        pull_request = self._get_pr(request)
+        return web.json_response(
+            self.make_pr_event_payload(
+                repo.slug, pull_request.number,
+            )['pull_request'],
+        )
+
+    async def _list_pull_requests(self, request):
+        """Serve a page of the open pull requests, oldest first."""
+        repo = self._get_repo(request)
+        per_page = int(request.query.get('per_page', 30))
+        page = int(request.query.get('page', 1))
+        pr_numbers = sorted(repo.pull_requests)
+        pr_numbers_page = pr_numbers[(page - 1) * per_page:page * per_page]
+        pagination_headers = {}
+        if page * per_page < len(pr_numbers):
+            next_page_url = (
+                f'{self.base_url}{request.rel_url.update_query(page=page + 1)}'
+            )
+            pagination_headers['Link'] = f'<{next_page_url}>; rel="next"'
+        return web.json_response(
+            [
+                self.make_pr_event_payload(
+                    repo.slug, pr_number,
+                )['pull_request']
+                for pr_number in pr_numbers_page
+            ],
+            headers=pagination_headers,
+        )
+
+    async def _get_pr_files(self, request):
+        """Serve a page of the PR files."""
+        pull_request = self._get_pr(request)
+        per_page = min(
+            int(request.query.get('per_page', 30)), FILES_PAGE_SIZE,
+        )
+        page = int(request.query.get('page', 1))
+        files_page = pull_request.changed_files[
+            (page - 1) * per_page:page * per_page
+        ]
+        return web.json_response([f.to_files_api() for f in files_page])
+
+    async def _get_pr_diff(self, request):
+        """Serve the PR diff."""
+        return web.Response(
+            body=self._get_pr(request).diff,
+            content_type='text/x-diff',
+        )
+
+    async def _create_check_run(self, request):
+        """Pretend to create a check run."""
+        check_run = await request.json()
+        check_run_id = next(self._check_run_ids)
+        self._check_run_heads[check_run_id] = (
+            self._get_repo(request).slug, check_run['head_sha'],
+        )
+        self._record_check_run(check_run_id, check_run)
+        return web.json_response(
+            {
+                'id': check_run_id,
+                'check_suite': {'id': 1},
+                **check_run,
+            },
+            status=201,
+        )
+
+    async def _update_check_run(self, request):
+        """Pretend to update a check run."""
+        check_run = await request.json()
+        check_run_id = int(request.match_info['check_run_id'])
+        self._record_check_run(check_run_id, check_run)
+        return web.json_response({
+            'id': check_run_id,
+            **check_run,
+        })
+
+    async def _add_labels(self, request):
+        """Pretend to label the PR."""
+        labels = (await request.json())['labels']
+        return web.json_response([{'name': label} for label in labels])
@@ -1 +1,29 @@
 """Cronicler robot watching all the news being recorded as change notes!."""
+
+import signal
+
+from .app_identity import APP_NAME, APP_URL
+
+
+async def build_server():
+    """Make the web app for gunicorn to serve in multiple processes.
+
+    It's meant for ``gunicorn chronographer:build_server
+    --worker-class aiohttp.GunicornWebWorker``.
+    """
+    # NOTE: The aiohttp worker keeps the SIGCHLD handler of the gunicorn
+    # NOTE: arbiter, which reaps any child process before its output is
+    # NOTE: read. Including the `git` calls the version lookup makes.
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    # pylint: disable=import-outside-toplevel
+    from octomachinery.utils.versiontools import get_version_from_scm_tag
+
+    from . import event_handlers  # noqa: F401; pylint: disable=unused-import
+    from .server import build_server as build_app_server
+
+    return await build_app_server(
+        name=APP_NAME,
+        version=get_version_from_scm_tag(root='..', relative_to=__file__),
+        url=APP_URL,
+    )
@@ -1,13 +1,14 @@
 """Cronicler robot runner."""
 
-from octomachinery.app.server.runner import run as run_app
 from octomachinery.utils.versiontools import get_version_from_scm_tag
 
+from .app_identity import APP_NAME, APP_URL
 from . import event_handlers  # noqa: F401; pylint: disable=unused-import
+from .server import run as run_app
 
 
 __name__ == '__main__' and run_app(  # pylint: disable=expression-not-assigned
-    name='Chronographer-Bot',
+    name=APP_NAME,
     version=get_version_from_scm_tag(root='..', relative_to=__file__),
-    url='https://github.com/apps/chronographer',
+    url=APP_URL,
 )
@@ -0,0 +1,8 @@
+"""The identity the GitHub App introduces itself with."""
+
+
+APP_NAME = 'Chronographer-Bot'
+"""The name the GitHub App introduces itself with."""
+
+APP_URL = 'https://github.com/apps/chronographer'
+"""The public page of the GitHub App."""
@@ -0,0 +1,321 @@
+"""Re-evaluation of all the open pull requests of a repository.
+
+Run it with ``python -m chronographer.bulk_evaluation``.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import typing
+
+from gidgethub.sansio import Event
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+from octomachinery.github.models.events import GitHubEvent
+
+from .caching import make_cache
+from .file_utils import get_chronographer_config
+from .github_app import GitHubApp, make_http_session
+
+
+logger = logging.getLogger(__name__)
+
+
+BULK_EVALUATION_CONCURRENCY = int(
+    os.getenv('CHRONOGRAPHER_BULK_EVALUATION_CONCURRENCY', '2'),
+)
+"""How many open PRs of a repository to re-evaluate at once."""
+
+BULK_EVALUATION_PROGRESS_TTL = 24 * 60 * 60
+"""Seconds to remember the PRs re-evaluated by an unfinished job for."""
+
+_BULK_EVALUATION_PROGRESS = make_cache(
+    maxsize=1024,
+    ttl=BULK_EVALUATION_PROGRESS_TTL,
+    name='bulk_evaluation_progress',
+)
+"""The PR numbers re-evaluated so far, keyed by the repo and config."""
+
+
+PullRequestEvaluator = typing.Callable[
+    [Event, typing.Mapping[str, typing.Any]],
+    typing.Awaitable[typing.Any],
+]
+"""A coroutine function evaluating a PR in the context of an event."""
+
+
+def _make_config_fingerprint(
+        repo_config: typing.Mapping[str, typing.Any],
+) -> str:
+    """Identify the repository config contents."""
+    return hashlib.sha256(
+        json.dumps(repo_config, sort_keys=True, default=str).encode(),
+    ).hexdigest()
+
+
+# pylint: disable-next=too-many-arguments
+async def reevaluate_open_pull_requests(
+        *,
+        repository: typing.Mapping[str, typing.Any],
+        installation_id: int | None,
+        trigger: str,
+        evaluate: PullRequestEvaluator,
+        concurrency: int = BULK_EVALUATION_CONCURRENCY,
+        restart: bool = False,
+) -> int:
+    """Re-evaluate the open PRs of the repository, oldest first.
+
+    The installation client must be in the runtime context already.
+    The repository config is loaded once upfront. The PRs are listed
+    page by page and evaluated at most ``concurrency`` at a time, the
+    listing waiting for a free slot. The PRs done are remembered
+    against the config so that a job interrupted midway resumes where
+    it's stopped unless ``restart`` is requested. They are forgotten
+    once the job completes. A PR failing to evaluate is logged and
+    retried by the next job. Return the number of the PRs evaluated.
+    """
+    # NOTE: Running in a task of its own keeps the runtime context
+    # NOTE: changes from leaking into the caller.
+    return await asyncio.create_task(
+        _reevaluate_open_pull_requests(
+            repository=repository,
+            installation_id=installation_id,
+            trigger=trigger,
+            evaluate=evaluate,
+            concurrency=concurrency,
+            restart=restart,
+        ),
+    )
+
+
+# pylint: disable-next=too-many-arguments,too-many-locals
+async def _reevaluate_open_pull_requests(
+        *,
+        repository: typing.Mapping[str, typing.Any],
+        installation_id: int | None,
+        trigger: str,
+        evaluate: PullRequestEvaluator,
+        concurrency: int,
+        restart: bool,
+) -> int:
+    """Re-evaluate the open PRs within the current runtime context."""
+    repo_slug = repository['full_name']
+    event = Event(
+        {
+            'action': 'reevaluate',
+            'installation': {'id': installation_id},
+            'repository': repository,
+        },
+        event=trigger,
+        delivery_id=f'bulk-evaluation-{repo_slug}',
+    )
+    # pylint: disable=assigning-non-slot
+    RUNTIME_CONTEXT.github_event = GitHubEvent(trigger, event.data)
+
+    repo_config = await get_chronographer_config(
+        ref=repository['default_branch'],
+    )
+    progress_key = (
+        installation_id, repo_slug, _make_config_fingerprint(repo_config),
+    )
+    pr_numbers_done = (
+        set() if restart
+        else set(_BULK_EVALUATION_PROGRESS.get(progress_key, ()))
+    )
+    if pr_numbers_done:
+        logger.info(
+            'Resuming the re-evaluation of the open PRs of %s, '
+            '%d of them are done already',
+            repo_slug, len(pr_numbers_done),
+        )
+
+    evaluation_slots = asyncio.Semaphore(concurrency)
+    evaluated_count = 0
+
+    async def evaluate_in_slot(pull_request):
+        nonlocal evaluated_count
+        try:
+            await evaluate(event, pull_request)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(
+                'Failed to re-evaluate %s#%d',
+                repo_slug, pull_request['number'],
+            )
+        else:
+            evaluated_count += 1
+            pr_numbers_done.add(pull_request['number'])
+            _BULK_EVALUATION_PROGRESS.set(
+                progress_key, frozenset(pr_numbers_done),
+            )
+        finally:
+            evaluation_slots.release()
+
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    async with asyncio.TaskGroup() as evaluations:
+        async for pull_request in gh_api.getiter(
+                f'/repos/{repo_slug}/pulls'
+                '?state=open&sort=created&direction=asc&per_page=100',
+        ):
+            if pull_request['number'] in pr_numbers_done:
+                continue
+
+            await evaluation_slots.acquire()
+            evaluations.create_task(evaluate_in_slot(pull_request))
+
+    # NOTE: The progress only matters to the interrupted jobs. Keeping
+    # NOTE: it would make the next job with the same config, e.g. after
+    # NOTE: a revert, skip all the PRs evaluated under a different one.
+    _BULK_EVALUATION_PROGRESS.invalidate(progress_key)
+    logger.info(
+        'Re-evaluated %d open PRs of %s on %s',
+        evaluated_count, repo_slug, trigger,
+    )
+    return evaluated_count
+
+
+_BACKGROUND_JOBS: set[asyncio.Task] = set()
+"""The re-evaluation jobs started by the webhook events, still running."""
+
+
+async def start_reevaluation(job: typing.Awaitable[typing.Any]) -> None:
+    """Run the re-evaluation job without holding up the event handling.
+
+    The job keeps a copy of the current runtime context. Its failures
+    are logged. The GitHub Action runs end along with the event
+    handling so the job is waited for there.
+    """
+    if RUNTIME_CONTEXT.IS_GITHUB_ACTION:
+        await job
+        return
+
+    job_task = asyncio.ensure_future(job)
+    _BACKGROUND_JOBS.add(job_task)
+    job_task.add_done_callback(_forget_reevaluation)
+
+
+def _forget_reevaluation(job_task: asyncio.Task) -> None:
+    """Drop the finished background job, reporting its failure."""
+    _BACKGROUND_JOBS.discard(job_task)
+    if not job_task.cancelled() and job_task.exception():
+        logger.error(
+            'Failed to re-evaluate the open PRs in the background',
+            exc_info=job_task.exception(),
+        )
+
+
+async def reevaluate_installed_repositories(
+        *,
+        installation_id: int,
+        repositories: typing.Iterable[typing.Mapping[str, typing.Any]],
+        trigger: str,
+        evaluate: PullRequestEvaluator,
+) -> None:
+    """Re-evaluate the open PRs of the newly accessible repositories.
+
+    The installation events only carry the repository names so the
+    full repository objects are fetched first.
+    """
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    for repository in repositories:
+        await reevaluate_open_pull_requests(
+            repository=await gh_api.getitem(
+                f'/repos/{repository["full_name"]}',
+            ),
+            installation_id=installation_id,
+            trigger=trigger,
+            evaluate=evaluate,
+        )
+
+
+async def reevaluate_repositories(
+        repo_slugs: typing.Iterable[str],
+        *,
+        github_app: GitHubApp,
+        evaluate: PullRequestEvaluator,
+        concurrency: int = BULK_EVALUATION_CONCURRENCY,
+        restart: bool = False,
+) -> None:
+    """Re-evaluate the open PRs of the repositories one by one."""
+    for repo_slug in repo_slugs:
+        installation_id = (
+            await github_app.api_client.getitem(
+                f'/repos/{repo_slug}/installation',
+            )
+        )['id']
+        app_installation = await github_app.get_installation_by_id(
+            installation_id,
+        )
+        # pylint: disable=assigning-non-slot
+        RUNTIME_CONTEXT.IS_GITHUB_ACTION = False
+        RUNTIME_CONTEXT.app_installation_client = app_installation.api_client
+        await reevaluate_open_pull_requests(
+            repository=await app_installation.api_client.getitem(
+                f'/repos/{repo_slug}',
+            ),
+            installation_id=installation_id,
+            trigger='cli',
+            evaluate=evaluate,
+            concurrency=concurrency,
+            restart=restart,
+        )
+
+
+def _parse_args(argv: typing.Sequence[str]) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m chronographer.bulk_evaluation',
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument(
+        'repo_slugs', nargs='+', metavar='OWNER/REPO',
+        help='the repositories to re-evaluate the open PRs of',
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=BULK_EVALUATION_CONCURRENCY,
+        help='how many PRs to re-evaluate at once (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--restart', action='store_true',
+        help='re-evaluate the PRs done by an interrupted run too',
+    )
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    """Re-evaluate the repositories the arguments list."""
+    # pylint: disable=import-outside-toplevel
+    from octomachinery.utils.versiontools import get_version_from_scm_tag
+
+    from .app_identity import APP_NAME, APP_URL
+    from .pr_evaluation import process_pull_request
+    from .server import load_config
+
+    config = load_config(
+        name=APP_NAME,
+        version=get_version_from_scm_tag(root='..', relative_to=__file__),
+        url=APP_URL,
+    )
+    async with make_http_session() as aiohttp_client_session:
+        await reevaluate_repositories(
+            args.repo_slugs,
+            github_app=GitHubApp(
+                config.github,
+                http_session=aiohttp_client_session,
+            ),
+            evaluate=process_pull_request,
+            concurrency=args.concurrency,
+            restart=args.restart,
+        )
+
+
+def main(argv: typing.Sequence[str] | None = None) -> None:
+    """Re-evaluate the open PRs of the repositories given."""
+    asyncio.run(_run(_parse_args(sys.argv[1:] if argv is None else argv)))
+
+
+# pylint: disable=expression-not-assigned
+__name__ == '__main__' and main()
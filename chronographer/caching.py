@@ -0,0 +1,340 @@
+"""In-process caching primitives."""
+
+from collections import OrderedDict, namedtuple
+import logging
+import os
+import pickle
+import sqlite3
+import time
+import typing
+
+
+logger = logging.getLogger(__name__)
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+"""Cache statistics shaped like :func:`functools.lru_cache` ones."""
+
+
+_MISSING = object()
+"""Sentinel telling apart cache misses from cached falsy values."""
+
+SHARED_CACHE_PATH = os.getenv('CHRONOGRAPHER_SHARED_CACHE_PATH')
+"""The SQLite database the worker processes share the caches through."""
+
+SHARED_CACHE_BUSY_TIMEOUT = 0.05
+"""Seconds to wait for the shared cache locked by another process."""
+
+_NAMED_CACHES: dict[str, 'LRUCache | SQLiteCache'] = {}
+"""The caches worth reporting, keyed by their names."""
+
+
+class LRUCache:
+    """A bounded least-recently-used mapping with entry expiration.
+
+    Entries older than ``ttl`` seconds are treated as missing. When
+    the cache grows beyond ``maxsize`` entries, the least recently
+    used ones are evicted.
+    """
+
+    def __init__(
+            self,
+            *,
+            maxsize: int,
+            ttl: float | None = None,
+            name: str | None = None,
+    ) -> None:
+        """Initialize an empty cache, registering it if it's named."""
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: OrderedDict[
+            typing.Hashable, tuple[float, typing.Any],
+        ] = OrderedDict()
+        self.hits = 0
+        """Number of lookups served from the cache."""
+        self.misses = 0
+        """Number of lookups that found nothing usable."""
+
+        if name is not None:
+            _NAMED_CACHES[name] = self
+
+    def __len__(self) -> int:
+        """Return the number of entries currently stored."""
+        return len(self._entries)
+
+    def info(self) -> CacheInfo:
+        """Report the cache statistics."""
+        return CacheInfo(self.hits, self.misses, self._maxsize, len(self))
+
+    def __getitem__(self, key: typing.Hashable) -> typing.Any:
+        """Return a fresh cached value or raise :exc:`KeyError`."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Store the value, evicting the stalest entries if needed."""
+        self.set(key, value)
+
+    def get(
+            self, key: typing.Hashable, default: typing.Any = None,
+    ) -> typing.Any:
+        """Return a fresh cached value or ``default``."""
+        stored_at, value = self._entries.get(key, (None, _MISSING))
+        if value is not _MISSING and self._is_expired(stored_at):
+            del self._entries[key]
+            value = _MISSING
+
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Store the value, evicting the stalest entries if needed."""
+        self._entries[key] = time.monotonic(), value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: typing.Hashable) -> bool:
+        """Drop the entry and report whether it was there."""
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Drop all the entries."""
+        self._entries.clear()
+
+    def _is_expired(self, stored_at: float) -> bool:
+        """Check whether an entry stored at the given time is stale."""
+        return (
+            self._ttl is not None
+            and time.monotonic() - stored_at > self._ttl
+        )
+
+
+class SQLiteCache:  # pylint: disable=too-many-instance-attributes
+    """A bounded mapping with entry expiration shared between processes.
+
+    It mirrors the :class:`LRUCache` interface, keeping the entries
+    pickled in an SQLite database in WAL mode so that concurrent
+    readers never wait for the writers. The cache name separates its
+    entries from those of the other caches in the same database. The
+    oldest stored entries beyond ``maxsize`` are evicted once per every
+    tenth of ``maxsize`` writes made by a process, so the cache may grow
+    past it a bit in between. The hit and miss counters are per process.
+
+    The database is accessed from the event loop, so rather than
+    stalling all the events, a database locked by another process for
+    longer than :data:`SHARED_CACHE_BUSY_TIMEOUT` is treated as a cache
+    miss and the writes to it are skipped.
+    """
+
+    def __init__(
+            self,
+            *,
+            path: str,
+            maxsize: int,
+            ttl: float | None = None,
+            name: str,
+    ) -> None:
+        """Initialize a cache backed by the database at ``path``."""
+        self._path = path
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._name = name
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+        self._eviction_interval = max(maxsize // 10, 1)
+        self._writes_since_eviction = 0
+        self.hits = 0
+        """Number of lookups served from the cache."""
+        self.misses = 0
+        """Number of lookups that found nothing usable."""
+
+        _NAMED_CACHES[name] = self
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Return the database connection of the current process."""
+        # NOTE: Connections must not cross `fork()` and the web server
+        # NOTE: workers are forked after the modules are imported.
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(
+                self._path,
+                timeout=SHARED_CACHE_BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                'cache TEXT NOT NULL, key TEXT NOT NULL, '
+                'stored_at REAL NOT NULL, value BLOB NOT NULL, '
+                'PRIMARY KEY (cache, key))',
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_entries_age '
+                'ON cache_entries (cache, stored_at)',
+            )
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def __len__(self) -> int:
+        """Return the number of entries currently stored.
+
+        If the database stays locked, the cache is reported empty.
+        """
+        try:
+            (entries_count,), = self._db.execute(
+                'SELECT COUNT(*) FROM cache_entries WHERE cache = ?',
+                (self._name,),
+            )
+        except sqlite3.OperationalError as db_error:
+            logger.warning(
+                'Failed to count the entries of the %s shared cache: %s',
+                self._name, db_error,
+            )
+            return 0
+        return entries_count
+
+    def info(self) -> CacheInfo:
+        """Report the cache statistics."""
+        return CacheInfo(self.hits, self.misses, self._maxsize, len(self))
+
+    def __getitem__(self, key: typing.Hashable) -> typing.Any:
+        """Return a fresh cached value or raise :exc:`KeyError`."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Store the value, evicting the oldest entries if it's time to."""
+        self.set(key, value)
+
+    def get(
+            self, key: typing.Hashable, default: typing.Any = None,
+    ) -> typing.Any:
+        """Return a fresh cached value or ``default``."""
+        try:
+            row = self._db.execute(
+                'SELECT stored_at, value FROM cache_entries '
+                'WHERE cache = ? AND key = ?',
+                (self._name, repr(key)),
+            ).fetchone()
+        except sqlite3.OperationalError as db_error:
+            logger.warning(
+                'Failed to read the %s shared cache: %s', self._name, db_error,
+            )
+            row = None
+        if row is None or self._is_expired(row[0]):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return pickle.loads(row[1])
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        """Store the value, evicting the oldest entries if it's time to."""
+        self._writes_since_eviction += 1
+        is_eviction_due = (
+            self._writes_since_eviction >= self._eviction_interval
+        )
+        try:
+            with self._db:
+                self._db.execute('BEGIN IMMEDIATE')
+                self._db.execute(
+                    'INSERT OR REPLACE INTO cache_entries '
+                    'VALUES (?, ?, ?, ?)',
+                    (
+                        self._name, repr(key), time.time(),
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    ),
+                )
+                if is_eviction_due:
+                    self._db.execute(
+                        'DELETE FROM cache_entries '
+                        'WHERE cache = ? AND key IN ('
+                        'SELECT key FROM cache_entries WHERE cache = ? '
+                        'ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                        (self._name, self._name, self._maxsize),
+                    )
+            if is_eviction_due:
+                self._writes_since_eviction = 0
+        except sqlite3.OperationalError as db_error:
+            logger.warning(
+                'Failed to write to the %s shared cache: %s',
+                self._name, db_error,
+            )
+
+    def invalidate(self, key: typing.Hashable) -> bool:
+        """Drop the entry and report whether it was there.
+
+        If the database stays locked, the entry is left to expire.
+        """
+        try:
+            with self._db:
+                return self._db.execute(
+                    'DELETE FROM cache_entries WHERE cache = ? AND key = ?',
+                    (self._name, repr(key)),
+                ).rowcount > 0
+        except sqlite3.OperationalError as db_error:
+            logger.warning(
+                'Failed to invalidate an entry of the %s shared cache: %s',
+                self._name, db_error,
+            )
+            return False
+
+    def clear(self) -> None:
+        """Drop all the entries.
+
+        If the database stays locked, the entries are left to expire.
+        """
+        try:
+            with self._db:
+                self._db.execute(
+                    'DELETE FROM cache_entries WHERE cache = ?',
+                    (self._name,),
+                )
+        except sqlite3.OperationalError as db_error:
+            logger.warning(
+                'Failed to clear the %s shared cache: %s',
+                self._name, db_error,
+            )
+
+    def _is_expired(self, stored_at: float) -> bool:
+        """Check whether an entry stored at the given time is stale."""
+        return self._ttl is not None and time.time() - stored_at > self._ttl
+
+
+def make_cache(
+        *,
+        maxsize: int,
+        ttl: float | None = None,
+        name: str,
+) -> LRUCache | SQLiteCache:
+    """Make a cache shared between the processes if configured.
+
+    Only picklable values with keys that have a stable :func:`repr`
+    may be stored in the caches made this way.
+    """
+    if SHARED_CACHE_PATH:
+        return SQLiteCache(
+            path=SHARED_CACHE_PATH, maxsize=maxsize, ttl=ttl, name=name,
+        )
+    return LRUCache(maxsize=maxsize, ttl=ttl, name=name)
+
+
+def iter_named_caches() -> typing.Iterator[
+        tuple[str, LRUCache | SQLiteCache],
+]:
+    """Iterate over the named caches along with their names."""
+    return iter(tuple(_NAMED_CACHES.items()))
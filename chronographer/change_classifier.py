@@ -0,0 +1,188 @@
+"""Single-pass classification of the files changed in pull requests."""
+
+import os
+import typing
+
+from .caching import CacheInfo, LRUCache
+from .diff_sources import FileEntry
+
+
+FALLBACK_CHANGELOG_FILENAME = 'NEWS.rst'
+"""The changelog file name used when towncrier config lacks one."""
+
+MATCHER_CACHE_SIZE = int(
+    os.getenv('CHRONOGRAPHER_MATCHER_CACHE_SIZE', '256'),
+)
+"""How many compiled path and fragment matchers to keep around."""
+
+_PREFIX_END = ''
+"""The trie node key marking the end of a prefix.
+
+Paths are walked a character at a time so it never clashes with one.
+"""
+
+_PATH_FILTER_CACHE = LRUCache(
+    maxsize=MATCHER_CACHE_SIZE, name='path_filter',
+)
+"""Compiled path filters keyed by the include and exclude prefixes."""
+
+
+class PathPrefixTrie:
+    """A set of path prefixes, checked against a path in one walk.
+
+    Unlike testing every prefix in turn, the lookup cost only depends
+    on the path length and not on the number of prefixes.
+    """
+
+    def __init__(self, prefixes: typing.Iterable[str]) -> None:
+        """Index the prefixes character by character."""
+        self._root: dict[str, dict] = {}
+        for prefix in prefixes:
+            node = self._root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[_PREFIX_END] = {}
+
+    def __bool__(self) -> bool:
+        """Tell whether there are any prefixes at all."""
+        return bool(self._root)
+
+    def matches(self, path: str) -> bool:
+        """Check whether the path starts with any of the prefixes."""
+        node = self._root
+        if _PREFIX_END in node:
+            return True
+
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if _PREFIX_END in node:
+                return True
+
+        return False
+
+
+class PathFilter:  # pylint: disable=too-few-public-methods
+    """A matcher of the paths calling for a change note."""
+
+    def __init__(
+            self,
+            include_paths: typing.Iterable[str],
+            exclude_paths: typing.Iterable[str],
+    ) -> None:
+        """Build the tries out of the path prefixes."""
+        self._include = PathPrefixTrie(include_paths)
+        self._exclude = PathPrefixTrie(exclude_paths)
+
+    def is_relevant(self, path: str) -> bool:
+        """Check whether changing the path calls for a change note."""
+        if self._include and not self._include.matches(path):
+            return False
+
+        return not self._exclude.matches(path)
+
+
+def get_path_filter(
+        config_paths: typing.Mapping[str, typing.Any],
+) -> PathFilter:
+    """Return a path filter for the config, compiling it once."""
+    config_fingerprint = (
+        # NOTE: Empty YAML keys come through as `None`.
+        tuple(config_paths.get('include') or ()),
+        tuple(config_paths.get('exclude') or ()),
+    )
+    path_filter = _PATH_FILTER_CACHE.get(config_fingerprint)
+    if path_filter is None:
+        path_filter = _PATH_FILTER_CACHE[config_fingerprint] = PathFilter(
+            *config_fingerprint,
+        )
+    return path_filter
+
+
+def path_filter_cache_info() -> CacheInfo:
+    """Report how well the compiled path filters get reused."""
+    return _PATH_FILTER_CACHE.info()
+
+
+class ChangesClassifier:
+    """An accumulator of everything the PR evaluation needs to know.
+
+    The changed files are fed to it one by one, as they arrive, so
+    that a single walk over them is enough.
+    """
+
+    def __init__(
+            self,
+            *,
+            tc_fragment_re: typing.Pattern[str],
+            config_paths: typing.Mapping[str, typing.Any],
+            towncrier_config: typing.Mapping[str, typing.Any],
+    ) -> None:
+        """Initialize a classifier that hasn't seen any changes yet."""
+        self._tc_fragment_re = tc_fragment_re
+        self._path_filter = get_path_filter(config_paths)
+        self._changelog_filename = (
+            towncrier_config.get('filename', '')
+            or FALLBACK_CHANGELOG_FILENAME
+        )
+
+        self.news_fragments_added: list[FileEntry] = []
+        """The news fragments the PR adds."""
+        self.is_changelog_relevant = False
+        """Whether any of the changes call for a change note."""
+        self.changelog_file_added = False
+        """Whether the PR adds lines to the changelog file."""
+        self.any_change_fragments_removed = False
+        """Whether the PR removes any news fragments."""
+
+    def add(self, file_entry: FileEntry) -> None:
+        """Take the changed file into account."""
+        if file_entry.is_added_file or file_entry.is_removed_file:
+            is_fragment = bool(self._tc_fragment_re.search(file_entry.path))
+            if is_fragment and file_entry.is_added_file:
+                self.news_fragments_added.append(file_entry)
+            if is_fragment and file_entry.is_removed_file:
+                self.any_change_fragments_removed = True
+
+        if (
+                not self.changelog_file_added
+                and file_entry.path == self._changelog_filename
+        ):
+            self.changelog_file_added = bool(file_entry.added)
+
+        if not self.is_changelog_relevant:
+            self.is_changelog_relevant = self._path_filter.is_relevant(
+                file_entry.path,
+            )
+
+    def classify(
+            self,
+            diff: typing.Iterable[FileEntry],
+    ) -> 'ChangesClassifier':
+        """Take all the changed files into account."""
+        for file_entry in diff:
+            self.add(file_entry)
+        return self
+
+    @property
+    def is_release(self) -> bool:
+        """Tell whether the PR looks like a release one.
+
+        Those add to the changelog file and remove the old fragments.
+        """
+        return self.any_change_fragments_removed and self.changelog_file_added
+
+    @property
+    def news_fragments_required(self) -> bool:
+        """Tell whether the PR needs a change note."""
+        return self.is_changelog_relevant and not self.is_release
+
+    @property
+    def is_verdict_reached(self) -> bool:
+        """Tell whether the rest of the changes may be skipped.
+
+        Once a news fragment is added and a file calling for a change
+        note is spotted, the rest of the diff cannot change the outcome.
+        """
+        return bool(self.news_fragments_added) and self.is_changelog_relevant
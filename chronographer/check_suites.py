@@ -0,0 +1,117 @@
+"""Evaluation of the pull requests sharing a check suite."""
+
+import asyncio
+import logging
+import os
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+
+from .file_utils import get_chronographer_config, get_towncrier_config
+from .graphql_loader import CONTEXT_LOADER
+from .pr_evaluation import get_evaluation_settings
+from .verdicts import get_verdict, make_verdict_key
+
+
+logger = logging.getLogger(__name__)
+
+
+CHECK_SUITE_CONCURRENCY = int(
+    os.getenv('CHRONOGRAPHER_CHECK_SUITE_CONCURRENCY', '4'),
+)
+"""How many PRs sharing a check suite to evaluate at once."""
+
+_PR_FIELDS_NEEDED = frozenset({'issue_url', 'labels', 'user'})
+"""The PR object fields missing from the check suite payloads."""
+
+
+async def evaluate_check_suite_pull_requests(event, check_suite, *, evaluate):
+    """Evaluate all the PRs the check suite is attached to.
+
+    Several PRs share the suite when they are opened from the same
+    branch. They are passed to ``evaluate`` concurrently, at most
+    :data:`CHECK_SUITE_CONCURRENCY` at a time, after loading the
+    configs they have in common once.
+    """
+    repo_slug = event.data['repository']['full_name']
+    pull_requests = check_suite['pull_requests']
+    if not pull_requests:
+        logger.info(
+            'The %s event for %s lists no pull requests to evaluate',
+            event.event, repo_slug,
+        )
+        return
+
+    if CONTEXT_LOADER != 'graphql':
+        # NOTE: Warming up the caches spares the concurrent evaluations
+        # NOTE: from requesting the same configs all at once.
+        await warm_up_config_caches(event, pull_requests)
+
+    evaluation_slots = asyncio.Semaphore(CHECK_SUITE_CONCURRENCY)
+
+    async def evaluate_when_possible(pull_request):
+        async with evaluation_slots:
+            await evaluate(
+                event,
+                await get_full_pull_request(repo_slug, pull_request),
+            )
+
+    evaluation_outcomes = await asyncio.gather(
+        *map(evaluate_when_possible, pull_requests),
+        return_exceptions=True,
+    )
+    for pull_request, evaluation_outcome in zip(
+            pull_requests, evaluation_outcomes,
+    ):
+        if isinstance(evaluation_outcome, Exception):
+            logger.error(
+                'Failed to evaluate %s#%d on %s event',
+                repo_slug, pull_request['number'], event.event,
+                exc_info=evaluation_outcome,
+            )
+
+
+async def warm_up_config_caches(event, pull_requests):
+    """Load the configs the PRs of the check suite are evaluated by.
+
+    The towncrier config is skipped when the verdicts on all the PRs
+    are known already since their evaluations won't need it.
+    """
+    repo_slug = event.data['repository']['full_name']
+    repo_config = await get_chronographer_config(
+        ref=event.data['repository']['default_branch'],
+    )
+    paths_config, name_settings = get_evaluation_settings(repo_config)
+    are_verdicts_known = all(
+        get_verdict(
+            make_verdict_key(
+                repo_slug=repo_slug,
+                pull_request=pull_request,
+                paths_config=paths_config,
+                name_settings=name_settings,
+            ),
+        ) is not None
+        for pull_request in pull_requests
+    )
+    if are_verdicts_known:
+        return
+
+    await get_towncrier_config(
+        towncrier_config_filename=paths_config.get(
+            'towncrier-config-filename',
+        ),
+        ref=pull_requests[0]['head']['sha'],
+    )
+
+
+async def get_full_pull_request(repo_slug, pull_request):
+    """Fetch the PR unless the object at hand has all the fields needed.
+
+    The check suites only list the minimal PR objects.
+    """
+    if _PR_FIELDS_NEEDED <= pull_request.keys():
+        return pull_request
+
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    return await gh_api.getitem(
+        f'/repos/{repo_slug}/pulls/{pull_request["number"]:d}',
+    )
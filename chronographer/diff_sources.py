@@ -0,0 +1,401 @@
+"""Sources of the files changed in pull requests."""
+
+import asyncio
+import inspect
+import logging
+import math
+import os
+import re
+import typing
+
+import attr
+from gidgethub import sansio
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+
+
+logger = logging.getLogger(__name__)
+
+
+DIFF_SOURCE = os.getenv('CHRONOGRAPHER_DIFF_SOURCE', 'diff')
+"""The way of retrieving the changed files: ``diff`` or ``files-api``."""
+
+FILES_API_CONCURRENCY = int(
+    os.getenv('CHRONOGRAPHER_FILES_API_CONCURRENCY', '5'),
+)
+"""How many pages of the PR files to request simultaneously."""
+
+FILES_API_PAGE_SIZE = 100
+"""The maximum number of files GitHub returns per PR files page."""
+
+FILES_API_MAX_FILES = 3000
+"""The maximum number of files GitHub lists for a single PR."""
+
+DIFF_CHUNK_SIZE = 64 * 1024
+"""How many bytes of the diff to read from the network at once."""
+
+DIFF_LINE_PREFIX_LENGTH = 4096
+"""How many leading bytes of each diff line to look at.
+
+Anything beyond that is skipped without being buffered, which keeps
+memory flat on lines of minified or generated files.
+"""
+
+DEV_NULL = b'/dev/null'
+"""The path diffs use in place of the side of an absent file."""
+
+_C_ESCAPE_REGEX = re.compile(rb'\\([0-7]{3}|.)')
+"""An escape sequence in a C-style quoted string."""
+
+_C_ESCAPED_CHARS = {
+    b'a': b'\a',
+    b'b': b'\b',
+    b'f': b'\f',
+    b'n': b'\n',
+    b'r': b'\r',
+    b't': b'\t',
+    b'v': b'\v',
+}
+"""The bytes the letter escape sequences stand for."""
+
+
+@attr.dataclass(frozen=True)
+class FileEntry:
+    """A summary of a file changed in a pull request."""
+
+    path: str
+    """The path of the file after the change."""
+    is_added_file: bool = False
+    """Whether the file is new."""
+    is_removed_file: bool = False
+    """Whether the file has been deleted."""
+    added: int = 0
+    """The number of lines added to the file."""
+
+    @classmethod
+    def from_files_api(
+            cls,
+            pr_file: typing.Mapping[str, typing.Any],
+    ) -> 'FileEntry':
+        """Make a file entry out of a PR files API response item."""
+        return cls(
+            path=pr_file['filename'],
+            is_added_file=pr_file['status'] == 'added',
+            is_removed_file=pr_file['status'] == 'removed',
+            added=pr_file.get('additions', 0),
+        )
+
+    @classmethod
+    def from_graphql(
+            cls,
+            pr_file: typing.Mapping[str, typing.Any],
+    ) -> 'FileEntry':
+        """Make a file entry out of a GraphQL ``PullRequestChangedFile``."""
+        return cls(
+            path=pr_file['path'],
+            is_added_file=pr_file['changeType'] == 'ADDED',
+            is_removed_file=pr_file['changeType'] == 'DELETED',
+            added=pr_file['additions'],
+        )
+
+
+@attr.dataclass
+class _DiffFileHeader:
+    """A mutable accumulator of a streamed diff file header."""
+
+    path: str
+    is_added_file: bool = False
+    is_removed_file: bool = False
+    added: int = 0
+    source_path: bytes | None = None
+
+    def set_target_path(self, target_path: bytes) -> None:
+        """Derive the file path and status from the ``+++`` line."""
+        is_target_absent = target_path.startswith(DEV_NULL)
+        is_source_absent = (
+            self.source_path is not None
+            and self.source_path.startswith(DEV_NULL)
+        )
+        self.is_added_file = self.is_added_file or is_source_absent
+        self.is_removed_file = self.is_removed_file or is_target_absent
+        self.path = _strip_diff_path_prefix(
+            self.source_path
+            if is_target_absent and self.source_path is not None
+            else target_path,
+        )
+
+    def to_file_entry(self) -> FileEntry:
+        """Freeze the accumulated header into a file entry."""
+        return FileEntry(
+            path=self.path,
+            is_added_file=self.is_added_file,
+            is_removed_file=self.is_removed_file,
+            added=self.added,
+        )
+
+
+VerdictTracker = typing.Callable[[FileEntry], bool]
+"""A callback telling whether the rest of the changes may be skipped."""
+
+
+async def get_pr_changed_files(
+        *,
+        repo_slug: str,
+        pull_request: typing.Mapping[str, typing.Any],
+        is_verdict_reached: (
+            VerdictTracker | typing.Awaitable[VerdictTracker] | None
+        ) = None,
+) -> list[FileEntry]:
+    """Retrieve the files changed in the PR from the configured source.
+
+    When ``is_verdict_reached`` is provided, the diff source calls it
+    with every entry and stops reading as soon as it returns true.
+    It can also be an awaitable resolving to such a callback, in which
+    case the diff source awaits it once the download is under way.
+
+    The PRs changing more files than the files API lists are read from
+    the diff regardless of the configured source, so that the verdict
+    is never reached on a partial list.
+    """
+    if DIFF_SOURCE == 'files-api':
+        if pull_request.get('changed_files', 0) <= FILES_API_MAX_FILES:
+            pr_files = await _get_pr_files_from_api(
+                repo_slug=repo_slug,
+                pull_request=pull_request,
+            )
+            if len(pr_files) < FILES_API_MAX_FILES:
+                return pr_files
+
+        logger.warning(
+            'The files API may not list all the files changed in %s#%d, '
+            'streaming the diff instead',
+            repo_slug, pull_request['number'],
+        )
+
+    return await _get_pr_files_from_diff(
+        repo_slug=repo_slug,
+        pull_request=pull_request,
+        is_verdict_reached=is_verdict_reached,
+    )
+
+
+async def _make_auth_headers(gh_api, *, accept: str) -> dict[str, str]:
+    """Compose the HTTP headers the installation client would send."""
+    token = gh_api._token  # pylint: disable=protected-access
+    if inspect.iscoroutinefunction(token):
+        token = await token()
+    return sansio.create_headers(
+        gh_api.requester, accept=accept, oauth_token=str(token),
+    )
+
+
+async def _get_pr_files_from_diff(
+        *,
+        repo_slug: str,
+        pull_request: typing.Mapping[str, typing.Any],
+        is_verdict_reached: (
+            VerdictTracker | typing.Awaitable[VerdictTracker] | None
+        ),
+) -> list[FileEntry]:
+    """Stream the PR diff, only keeping the per-file summaries.
+
+    The hunk bodies are skipped on the fly so neither the diff text
+    nor a complete parsed patch ever sits in memory. The download is
+    aborted once ``is_verdict_reached`` is satisfied.
+    """
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    diff_url = pull_request.get('diff_url') or (
+        f'https://github.com/{repo_slug}'
+        f'/pull/{pull_request["number"]:d}.diff'
+    )
+
+    logger.debug('Streaming the diff from %s', diff_url)
+    pr_files = []
+    # pylint: disable-next=protected-access
+    async with gh_api._session.get(
+            diff_url,
+            headers=await _make_auth_headers(
+                gh_api, accept='application/vnd.github.v3.diff',
+            ),
+            raise_for_status=True,
+    ) as diff_response:
+        if inspect.isawaitable(is_verdict_reached):
+            is_verdict_reached = await is_verdict_reached
+        diff_lines = _iter_line_prefixes(
+            diff_response.content.iter_chunked(DIFF_CHUNK_SIZE),
+        )
+        async for file_entry in iter_diff_file_entries(diff_lines):
+            pr_files.append(file_entry)
+            if is_verdict_reached is not None and is_verdict_reached(
+                    file_entry,
+            ):
+                logger.info(
+                    'Stopped reading the diff early after %d files',
+                    len(pr_files),
+                )
+                break
+
+    logger.info('The diff has %d changed files', len(pr_files))
+    return pr_files
+
+
+async def _iter_line_prefixes(
+        chunks: typing.AsyncIterable[bytes],
+) -> typing.AsyncIterator[bytes]:
+    """Split a byte stream into lines, capping their length."""
+    line_prefix = bytearray()
+    async for chunk in chunks:
+        line_start = 0
+        while True:
+            line_end = chunk.find(b'\n', line_start)
+            room_left = DIFF_LINE_PREFIX_LENGTH - len(line_prefix)
+            if line_end == -1:
+                line_prefix += chunk[line_start:line_start + room_left]
+                break
+
+            line_prefix += chunk[
+                line_start:min(line_end, line_start + room_left)
+            ]
+            yield bytes(line_prefix)
+            line_prefix.clear()
+            line_start = line_end + 1
+
+    if line_prefix:
+        yield bytes(line_prefix)
+
+
+def _unescape_c_char(escape_match: re.Match) -> bytes:
+    """Turn a C escape sequence into the byte it stands for."""
+    escaped_char = escape_match.group(1)
+    if escaped_char.isdigit():
+        return bytes((int(escaped_char, 8),))
+    return _C_ESCAPED_CHARS.get(escaped_char, escaped_char)
+
+
+def _unquote_diff_path(diff_path: bytes) -> bytes:
+    """Undo the C-style quoting Git applies to the unusual paths.
+
+    Those with non-ASCII characters have them escaped as octal bytes.
+    """
+    if len(diff_path) < 2 or not (
+            diff_path.startswith(b'"') and diff_path.endswith(b'"')
+    ):
+        return diff_path
+
+    return _C_ESCAPE_REGEX.sub(_unescape_c_char, diff_path[1:-1])
+
+
+def _strip_diff_path_prefix(diff_path: bytes) -> str:
+    """Turn a ``a/path`` or ``b/path`` diff path into a repo path."""
+    diff_path = _unquote_diff_path(
+        diff_path.rstrip(b'\r').split(b'\t', 1)[0],
+    )
+    return diff_path[2:].decode(errors='replace')
+
+
+def _parse_diff_git_header(diff_header: bytes) -> str:
+    """Extract the path from a ``diff --git a/path b/path`` line."""
+    diff_paths = diff_header[len(b'diff --git '):].rstrip(b'\r')
+    if diff_paths.endswith(b'"'):
+        # NOTE: The quotes within a quoted path are escaped, so the
+        # NOTE: last one preceded by a space starts the target path.
+        return _strip_diff_path_prefix(
+            diff_paths[diff_paths.rfind(b' "') + 1:],
+        )
+
+    # NOTE: The same path is repeated twice unless the file is renamed,
+    # NOTE: which allows telling where it splits even with spaces in it.
+    path_length = (len(diff_paths) - len(b'a/ b/')) // 2
+    if diff_paths[2:2 + path_length] == diff_paths[-path_length:]:
+        return diff_paths[-path_length:].decode(errors='replace')
+
+    return _strip_diff_path_prefix(diff_paths.rpartition(b' ')[-1])
+
+
+async def iter_diff_file_entries(
+        diff_lines: typing.AsyncIterable[bytes],
+) -> typing.AsyncIterator[FileEntry]:
+    """Summarize each file of a unified Git diff as it streams by.
+
+    Only the extended headers are parsed. Within hunks, the lines are
+    merely counted when they are additions.
+    """
+    # pylint: disable=too-many-branches
+    file_header = None
+    is_in_hunks = False
+    async for diff_line in diff_lines:
+        if diff_line.startswith(b'diff --git '):
+            if file_header is not None:
+                yield file_header.to_file_entry()
+            file_header = _DiffFileHeader(
+                path=_parse_diff_git_header(diff_line),
+            )
+            is_in_hunks = False
+        elif file_header is None:
+            continue  # Skip anything preceding the first file
+        elif is_in_hunks:
+            if diff_line.startswith(b'+'):
+                file_header.added += 1
+        elif diff_line.startswith(b'@@'):
+            is_in_hunks = True
+        elif diff_line.startswith(b'new file mode'):
+            file_header.is_added_file = True
+        elif diff_line.startswith(b'deleted file mode'):
+            file_header.is_removed_file = True
+        elif diff_line.startswith(b'rename to '):
+            file_header.path = _unquote_diff_path(
+                diff_line[len(b'rename to '):].rstrip(b'\r'),
+            ).decode(errors='replace')
+        elif diff_line.startswith(b'--- '):
+            file_header.source_path = diff_line[len(b'--- '):]
+        elif diff_line.startswith(b'+++ '):
+            file_header.set_target_path(diff_line[len(b'+++ '):])
+
+    if file_header is not None:
+        yield file_header.to_file_entry()
+
+
+async def _get_pr_files_from_api(
+        *,
+        repo_slug: str,
+        pull_request: typing.Mapping[str, typing.Any],
+) -> list[FileEntry]:
+    """List the PR files page by page via GitHub API.
+
+    When the PR payload tells how many files changed, all the pages
+    are requested concurrently. Otherwise, they are followed one by
+    one.
+    """
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    pr_files_uri = (
+        f'/repos/{repo_slug}/pulls/{pull_request["number"]:d}/files'
+        f'?per_page={FILES_API_PAGE_SIZE:d}'
+    )
+
+    changed_files_count = pull_request.get('changed_files')
+    if changed_files_count is None:
+        return [
+            FileEntry.from_files_api(pr_file)
+            async for pr_file in gh_api.getiter(pr_files_uri)
+        ]
+
+    pages_count = math.ceil(changed_files_count / FILES_API_PAGE_SIZE)
+    pages_semaphore = asyncio.Semaphore(FILES_API_CONCURRENCY)
+
+    async def get_page(page_number):
+        async with pages_semaphore:
+            return await gh_api.getitem(f'{pr_files_uri}&page={page_number:d}')
+
+    pr_files_pages = await asyncio.gather(
+        *(get_page(page_number) for page_number in range(1, pages_count + 1)),
+    )
+    pr_files = [
+        FileEntry.from_files_api(pr_file)
+        for pr_files_page in pr_files_pages
+        for pr_file in pr_files_page
+    ]
+    logger.info(
+        'Retrieved %d changed files in %d pages',
+        len(pr_files), pages_count,
+    )
+    return pr_files
@@ -1,51 +1,29 @@
 """Webhook event handlers."""
-from datetime import datetime
-from io import StringIO
+import functools
 import logging
-import re
-
-import attr
-from unidiff import PatchSet
+import os
 
 from octomachinery.app.routing import process_event, process_event_actions
 from octomachinery.app.routing.decorators import process_webhook_payload
 from octomachinery.app.runtime.context import RUNTIME_CONTEXT
-from octomachinery.github.models.checks_api_requests import (
-    NewCheckRequest, UpdateCheckRequest,
-    to_gh_query,
-)
 
+from .check_suites import evaluate_check_suite_pull_requests
 from .file_utils import (
+    CHRONOGRAPHER_CONFIG_PATHS,
     get_chronographer_config,
-    get_towncrier_config,
-)
-from .labels import (
-    LABEL_PROVIDED,
-    LABEL_SKIP,
+    invalidate_chronographer_config,
 )
-
-try:
-    from towncrier._settings import _default_types as _towncrier_default_types
-    FALLBACK_CHANGE_TYPES = tuple(_towncrier_default_types)
-except ImportError:
-    FALLBACK_CHANGE_TYPES = (
-        'bugfix',
-        'doc',
-        'feature',
-        'misc',
-        'removal',
-        'trivial',
-        'vendor',
-    )
+from .pr_evaluation import get_configured_labels, process_pull_request
+from .scheduling import CoalescingScheduler
 
 
 logger = logging.getLogger(__name__)
 
 
-CHECKS_SUMMARY_EPILOGUE_INTRO = """
-Please, refer to the following document for more details on how to
-craft a great change note for inclusion with your pull request:
-"""
+PR_EVALUATIONS = CoalescingScheduler(
+    debounce_window=float(os.getenv('CHRONOGRAPHER_DEBOUNCE_WINDOW', '3')),
+)
+"""Pull request evaluations keyed by repository and PR number."""
 
 
 @process_event('ping')
@@ -76,7 +54,7 @@ async def on_install(
         action,  # pylint: disable=unused-argument
         installation,
         sender,  # pylint: disable=unused-argument
-        repositories=None,  # pylint: disable=unused-argument
+        repositories=None,
 ):
     """React to GitHub App integration installation webhook event."""
     logger.info(
@@ -87,6 +65,99 @@ async def on_install(
         'installation=%s',
         RUNTIME_CONTEXT.app_installation,
     )
+    # NOTE: The bulk evaluation brings in the GitHub App client stack.
+    # NOTE: Deferring that keeps it out of the Action runs on the PRs.
+    # pylint: disable-next=import-outside-toplevel
+    from .bulk_evaluation import (
+        reevaluate_installed_repositories,
+        start_reevaluation,
+    )
+
+    await start_reevaluation(
+        reevaluate_installed_repositories(
+            installation_id=installation['id'],
+            repositories=repositories or (),
+            trigger='installation',
+            evaluate=evaluate_pull_request,
+        ),
+    )
+
+
+@process_event('installation_repositories', action='added')
+@process_webhook_payload
+async def on_install_repositories(
+        *,
+        installation,
+        repositories_added,
+        **_payload,
+):
+    """Evaluate the open PRs of the repositories added to the install."""
+    # pylint: disable-next=import-outside-toplevel
+    from .bulk_evaluation import (
+        reevaluate_installed_repositories,
+        start_reevaluation,
+    )
+
+    await start_reevaluation(
+        reevaluate_installed_repositories(
+            installation_id=installation['id'],
+            repositories=repositories_added,
+            trigger='installation_repositories',
+            evaluate=evaluate_pull_request,
+        ),
+    )
+
+
+@process_event('push')
+@process_webhook_payload
+async def on_push(
+        *,
+        ref,
+        repository,
+        commits=(),
+        installation=None,
+        **_payload,
+):
+    """Invalidate the cached config when the default branch changes it."""
+    repo_default_branch = repository['default_branch']
+    if ref != f'refs/heads/{repo_default_branch}':
+        return
+
+    touched_paths = {
+        path
+        for commit in commits
+        for change_kind in ('added', 'modified', 'removed')
+        for path in commit.get(change_kind, ())
+    }
+    if touched_paths.isdisjoint(CHRONOGRAPHER_CONFIG_PATHS):
+        return
+
+    repo_slug = repository['full_name']
+    invalidated = invalidate_chronographer_config(
+        installation_id=(installation or {}).get('id'),
+        repo_slug=repo_slug,
+        ref=repo_default_branch,
+    )
+    logger.info(
+        'The config of %s changed on `%s`, %s the cached copy',
+        repo_slug,
+        repo_default_branch,
+        'dropping' if invalidated else 'there was no',
+    )
+    # pylint: disable-next=import-outside-toplevel
+    from .bulk_evaluation import (
+        reevaluate_open_pull_requests,
+        start_reevaluation,
+    )
+
+    await start_reevaluation(
+        reevaluate_open_pull_requests(
+            repository=repository,
+            installation_id=(installation or {}).get('id'),
+            trigger='push',
+            evaluate=evaluate_pull_request,
+        ),
+    )
 
 
 @process_event_actions(
@@ -99,419 +170,79 @@ async def on_install(
 )
 @process_event_actions('check_run', {'rerequested'})
 @process_event_actions('check_suite', {'rerequested'})
-# pylint: disable=too-many-locals
 async def on_pr(event):
-    """React to GitHub App pull request webhook event."""
-    event_repository = event.data['repository']
-    repo_slug = event_repository['full_name']
-    check_runs_base_uri = f'/repos/{repo_slug}/check-runs'
+    """React to GitHub App pull request webhook event.
+
+    The bursts of events hitting the same PR are coalesced so that
+    only the most recent state gets evaluated.
+    """
+    repo_slug = event.data['repository']['full_name']
     if event.event == 'pull_request':
         pull_request = event.data['pull_request']
-    elif event.event == 'check_run':
-        pull_request = (
-            event.data['check_run']['check_suite']['pull_requests'][0]
-        )
-    elif event.event == 'check_suite':
-        pull_request = (
-            event.data['check_suite']['pull_requests'][0]
-        )
-    pr_author = pull_request['user']
-    pr_labels = {label['name'] for label in pull_request['labels']}
-    diff_url = (
-        f'https://github.com/{repo_slug}'
-        f'/pull/{pull_request["number"]:d}.diff'
-    )
-    head_branch = pull_request['head']['ref']
-    head_sha = pull_request['head']['sha']
-    repo_default_branch = event_repository['default_branch']
-
-    gh_api = RUNTIME_CONTEXT.app_installation_client
-
-    repo_config = await get_chronographer_config(ref=repo_default_branch)
-    paths_config = repo_config.get(
-        'paths',
-        {'towncrier-config-filename': None},
-    )
-    action_hints_config = repo_config.get('action-hints', {})
-    checks_api_name = repo_config.get(
-        'branch-protection-check-name',
-        'Timeline protection',
-    )
-    checks_summary_title_prefix = action_hints_config.get(
-        'check-title-prefix',
-        f'{checks_api_name!s}: ',
-    )
-
-    checks_summary_epilogue = ''
-
-    inline_markdown = action_hints_config.get('inline-markdown')
-    if inline_markdown is not None:
-        checks_summary_epilogue += '\n'.join(('', '', inline_markdown))
-
-    external_docs_url = action_hints_config.get('external-docs-url')
-    if external_docs_url is not None:
-        checks_summary_epilogue += ''.join((
-            CHECKS_SUMMARY_EPILOGUE_INTRO,
-            external_docs_url,
-        ))
-
-    labels_config = repo_config.get('labels', {})
-    fragment_provided_label = labels_config.get(
-        'fragment-provided',
-        LABEL_PROVIDED,
-    )
-    repo_skip_label = labels_config.get('skip-changelog', LABEL_SKIP)
-
-    logger.info(
-        'Checking if `%s` label is present among these PR labels: `%s`.',
-        repo_skip_label,
-        ', '.join(pr_labels) or 'NO LABELS',
-    )
-    if repo_skip_label in pr_labels:
-        logger.info(
-            'Skipping PR event because the `%s` label is present',
-            repo_skip_label,
-        )
-        await gh_api.post(
-            check_runs_base_uri,
-            preview_api_version='antiope',
-            data=to_gh_query(
-                NewCheckRequest(
-                    head_branch, head_sha,
-                    name=checks_api_name,
-                    status='completed',
-                    started_at=f'{datetime.utcnow().isoformat()}Z',
-                    completed_at=f'{datetime.utcnow().isoformat()}Z',
-                    conclusion='neutral',
-                    output={
-                        'title':
-                            f'{checks_summary_title_prefix!s}'
-                            'Nothing to do — change note not required',
-                        'text': f'Labels: {", ".join(pr_labels)}',
-                        'summary':
-                            'Heeeeey!'
-                            '\n\n'
-                            f'This PR has the `{repo_skip_label}` label '
-                            'meaning that the maintainers do not expect a '
-                            'change note in this pull request but you are '
-                            'still welcome to add one if you feel like it may '
-                            'be useful in the user-facing 📝 changelog.'
-                            f'{checks_summary_epilogue!s}',
-                    },
-                ),
-            ),
-        )
-        return  # Interrupt the webhook event processing
-
-    if is_blacklisted(pr_author, repo_config.get('exclude', {})):
-        logger.info(
-            'Skipping this event because %s is blacklisted',
-            pr_author['login'],
-        )
-        await gh_api.post(
-            check_runs_base_uri,
-            preview_api_version='antiope',
-            data=to_gh_query(
-                NewCheckRequest(
-                    head_branch, head_sha,
-                    name=checks_api_name,
-                    status='completed',
-                    started_at=f'{datetime.utcnow().isoformat()}Z',
-                    completed_at=f'{datetime.utcnow().isoformat()}Z',
-                    conclusion='neutral',
-                    output={
-                        'title':
-                        f'{checks_summary_title_prefix!s}Nothing to do',
-                        'text':
-                            'The author of this change '
-                            f"({pr_author['login']!s}) "
-                            'is ignored because it is excluded '
-                            'via the repository config.',
-                        'summary':
-                            'Heeeeey!'
-                            "We've got an inclusive and welcoming community "
-                            'here.\n\n'
-                            'All robots 🤖 are welcome to send PRs, '
-                            'no strings attached! '
-                            'This change does not need to be recorded '
-                            'to our chronicles.'
-                            '\n\n'
-                            '![Helloooo!]('
-                            'https://www.goodfreephotos.com/albums'
-                            '/vector-images/blue-robot-vector-art.png)'
-                            f'{checks_summary_epilogue!s}',
-                    },
-                ),
-            ),
-        )
-        return  # Interrupt the webhook event processing
-
-    resp = await gh_api.post(
-        check_runs_base_uri,
-        preview_api_version='antiope',
-        data=to_gh_query(
-            NewCheckRequest(
-                head_branch, head_sha,
-                name=checks_api_name,
-                status='queued',
-                started_at=f'{datetime.utcnow().isoformat()}Z',
-            ),
-        ),
-    )
-    logger.info(
-        'Check suite ID is %s',
-        resp['check_suite']['id'],
-    )
-    logger.info(
-        'Check run ID is %s',
-        resp['id'],
-    )
-    check_runs_updates_uri = f'{check_runs_base_uri}/{resp["id"]:d}'
+        if not await is_label_change_relevant(event):
+            logger.info(
+                'Skipping %s#%d because the `%s` label does not affect '
+                'the outcome',
+                repo_slug, pull_request['number'],
+                event.data['label']['name'],
+            )
+            return
 
-    logger.info("Here's the diff URL: %s", diff_url)
-    diff_text = await gh_api.getitem(
-        diff_url,
-    )
-    logger.info("Here's the diff text: %s", diff_text)
-    diff = PatchSet(StringIO(diff_text))
-    logger.info("Here's the diff object: %r", diff)
-
-    default_branch = head_sha or repo_default_branch
-    towncrier_config = await get_towncrier_config(
-        towncrier_config_filename=paths_config.get(
-            'towncrier-config-filename',
-            None,
-        ),
-        ref=default_branch,
-    ) or {}
+        await evaluate_pull_request(event, pull_request)
+        return
 
-    update_check_req = UpdateCheckRequest(
-        name=checks_api_name,
-        status='in_progress',
+    check_suite = (
+        event.data['check_run']['check_suite']
+        if event.event == 'check_run'
+        else event.data['check_suite']
     )
-    resp = await gh_api.patch(
-        check_runs_updates_uri,
-        preview_api_version='antiope',
-        data=to_gh_query(update_check_req),
+    await evaluate_check_suite_pull_requests(
+        event, check_suite,
+        evaluate=evaluate_pull_request,
     )
 
-    enforce_name_key = (
-        'enforce-name' if 'enforce-name' in repo_config
-        else 'enforce_name'
-    )
-    _tc_fragment_re = await compile_towncrier_fragments_regex(
-        name_settings=repo_config.get(enforce_name_key, {}),
-        towncrier_config=towncrier_config,
-    )
 
-    news_fragments_added = [
-        f for f in diff
-        if f.is_added_file and _tc_fragment_re.search(f.path)
-    ]
-    logger.info(
-        'News fragments are %s',
-        'present' if news_fragments_added
-        else 'absent',
-    )
+async def evaluate_pull_request(event, pull_request):
+    """Evaluate the PR once the burst of events hitting it settles."""
+    evaluate = functools.partial(process_pull_request, event, pull_request)
+    if RUNTIME_CONTEXT.IS_GITHUB_ACTION:
+        # NOTE: Actions process exactly one event per run so there is
+        # NOTE: nothing to coalesce.
+        await evaluate()
+        return
 
-    if news_fragments_added and fragment_provided_label is not None:
-        labels_url = f'{pull_request["issue_url"]}/labels'
-        await gh_api.post(
-            labels_url,
-            preview_api_version='symmetra',
-            data={
-                'labels': [
-                    fragment_provided_label,
-                ],
-            },
-        )
-
-    news_fragments_required = requires_changelog(
-        diff,
-        _tc_fragment_re,
-        paths_config,
-        towncrier_config=towncrier_config,
+    await PR_EVALUATIONS.run_coalesced(
+        (event.data['repository']['full_name'], pull_request['number']),
+        pull_request['head']['sha'],
+        evaluate,
     )
 
-    report_success = not news_fragments_required or news_fragments_added
-
-    update_check_req = attr.evolve(
-        update_check_req,
-        status='completed',
-        conclusion='success' if news_fragments_added else
-        'neutral' if not news_fragments_required else 'failure',
-        completed_at=f'{datetime.utcnow().isoformat()}Z',
-        output={
-            # Fragments added
-            'title': f'{checks_summary_title_prefix!s}Good to go',
-            'text':
-                'The following news fragments found: '
-                f'{news_fragments_added!r}'
-                '\n\n'
-                f'Pattern: {_tc_fragment_re}',
-            'summary':
-                'Great! This change has been recorded to the chronicles'
-                '\n\n'
-                '![You are good at keeping records! '
-                'Image source: Unsplash ID=bByhWydZLW0]'
-                '(https://source.unsplash.com/bByhWydZLW0/1600x500)'
-                f'{checks_summary_epilogue!s}',
-        } if report_success else {
-            # Fragments not added and not required either
-            'title':
-                f'{checks_summary_title_prefix!s}'
-                'Nothing to do — change note not required',
-            'summary':
-                'This PR looks like a release preparation meaning that '
-                'it removes the existing change notes and adds them to '
-                'the user-facing 📝 changelog.'
-                '\n\n'
-                'Normally, such changes do not expect a change notes '
-                'so you do not need to worry about adding one.'
-                f'{checks_summary_epilogue!s}',
-        } if not news_fragments_required else {
-            # Fragments not added but are expected
-            'title':
-                f'{checks_summary_title_prefix!s}'
-                'History fragments missing',
-            'text': f'No files matching {_tc_fragment_re} pattern added',
-            'summary':
-                'Oops... This change does not have a record in the '
-                'archives. Just as if it never happened!'
-                '\n\n'
-                '![Keeping chronicles is important! '
-                'Image source: Unsplash ID=VSE71nAZhU8]'
-                '(https://source.unsplash.com/VSE71nAZhU8/1600x500)'
-                f'{checks_summary_epilogue!s}',
-        },
-    )
-    resp = await gh_api.patch(
-        check_runs_updates_uri,
-        preview_api_version='antiope',
-        data=to_gh_query(update_check_req),
-    )
 
-    logger.info('got %s event', event.event)
-    logger.info('gh_api=%s', gh_api)
+async def is_label_change_relevant(event):
+    """Check whether the PR event may change the evaluation outcome.
 
+    Only the label actions are ever irrelevant. Adding or removing the
+    skip label flips the verdict. Removing the fragment provided label
+    gets it added back while adding it is normally the echo of the bot
+    labeling the PR itself. Other labels don't matter at all.
+    """
+    if event.data['action'] not in {'labeled', 'unlabeled'}:
+        return True
 
-async def compile_towncrier_fragments_regex(name_settings, towncrier_config):
-    """Create fragments check regex based on the towncrier config."""
-    fallback_base_dir = 'news'
-
-    # e.g. ``.rst``:
-    fragment_filename_suffix = re.escape(name_settings.get('suffix', ''))
+    changed_label = event.data.get('label')
+    if changed_label is None:
+        return True
 
-    base_dir = (
-        towncrier_config.get('directory', '').rstrip('/')
-        or fallback_base_dir
+    repo_config = await get_chronographer_config(
+        ref=event.data['repository']['default_branch'],
     )
-    change_types = (
-        tuple(t['directory'] for t in towncrier_config.get('type', ()))
-        or FALLBACK_CHANGE_TYPES
+    repo_skip_label, fragment_provided_label = get_configured_labels(
+        repo_config,
     )
+    if changed_label['name'] == repo_skip_label:
+        return True
 
-    # Ref:
-    # * github.com/hawkowl/towncrier/blob/ecd438c/src/towncrier/_builder.py#L58
-    return re.compile(
-        (
-            r'{base_dir}/{file_pattern}'
-            r'(?P<fragment_type>{fragment_types})'
-            r'{number_pattern}'
-            r'{suffix_pattern}'
-            r'{postfix_pattern}'
-            r'$'
-        ).format(
-            base_dir=base_dir,
-            file_pattern=r'(?P<issue_number>[^\./]+)\.',  # should we enforce?
-            fragment_types=r'|'.join(change_types),
-            number_pattern=r'(\.\d+)?',  # better be a number
-            suffix_pattern=r'(\.[^\./]+)*',
-            postfix_pattern=fragment_filename_suffix,
-        ),
+    return (
+        event.data['action'] == 'unlabeled'
+        and changed_label['name'] == fragment_provided_label
     )
-
-
-def is_blacklisted(actor, blacklist):
-    """Find out if the given actor is blacklisted."""
-    bot_suffix_length = 5
-    username = actor['login']
-    blacklist_bots = blacklist.get('bots', True)
-    if blacklist_bots and actor['type'] == 'Bot':
-        username = username[:-bot_suffix_length]  # Strip off ``[bot]`` suffix
-        try:
-            return username in blacklist_bots
-        except TypeError:
-            return True
-
-    blacklist_humans = blacklist.get('humans', False)
-    if blacklist_humans and actor['type'] == 'User':
-        try:
-            return username in blacklist_humans
-        except TypeError:
-            return True
-
-    return False
-
-
-def is_a_release_pr(diff, tc_fragment_re, towncrier_config):
-    """Detect whether the current PR is a release.
-
-    The heuristic is simply checking if the PR has additions to the
-    changelog file combined with removal of the old change fragments.
-    """
-    fallback_changelog_filename = 'NEWS.rst'
-
-    changelog_filename = (
-        towncrier_config.get('filename', '')
-        or fallback_changelog_filename
-    )
-
-    any_change_fragments_removed = False
-    changelog_file_added = False
-
-    for file_entry in diff:
-        if not changelog_file_added and file_entry.path == changelog_filename:
-            changelog_file_added = bool(file_entry.added)
-
-        if (
-                not any_change_fragments_removed
-                and file_entry.is_removed_file
-                and tc_fragment_re.search(file_entry.path)
-        ):
-            any_change_fragments_removed = True
-
-        if any_change_fragments_removed and changelog_file_added:
-            return True
-
-    return False
-
-
-def requires_changelog(diff, tc_fragment_re, config_paths, towncrier_config):
-    """Check whether a changelog fragment is needed for the changes."""
-    is_release = is_a_release_pr(
-        diff, tc_fragment_re, towncrier_config=towncrier_config,
-    )
-    if is_release:
-        return False
-
-    file_paths = (f.path for f in diff)
-
-    include_paths = config_paths.get('include', [])
-    exclude_paths = config_paths.get('exclude', [])
-
-    paths_gen = (p for p in file_paths)
-
-    if include_paths:
-        paths_gen = (
-            p for p in paths_gen
-            if any(p.startswith(i) for i in include_paths)
-        )
-
-    if exclude_paths:
-        paths_gen = (
-            p for p in paths_gen
-            if not any(p.startswith(e) for e in exclude_paths)
-        )
-
-    return next(paths_gen, False) is not False
@@ -1,32 +1,299 @@
 """Utility helpers for getting files from App/Action installations."""
 
+from base64 import b64decode
 import contextlib
+import copy
+from http import HTTPStatus
+import logging
+import os
 import tomllib
 import typing
 
 import gidgethub
+import yaml
 
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
 from octomachinery.app.runtime.installation_utils import (
     get_installation_config,
     read_file_contents_from_repo,
 )
 
+from .caching import CacheInfo, LRUCache, make_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+CHRONOGRAPHER_CONFIG_PATHS = frozenset({
+    '.github/chronographer.yml',
+    '.github/config.yml',
+})
+"""Repository paths that the chronographer config is read from."""
+
+TOWNCRIER_CONFIG_CANDIDATES = 'towncrier.toml', 'pyproject.toml'
+"""Files looked up for the towncrier config, in the order of priority."""
+
+_CHRONOGRAPHER_CONFIG_CACHE = make_cache(
+    maxsize=int(os.getenv('CHRONOGRAPHER_CONFIG_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('CHRONOGRAPHER_CONFIG_CACHE_TTL', '60')),
+    name='chronographer_config',
+)
+"""Parsed chronographer configs keyed by installation, repo and ref."""
+
+_TOWNCRIER_CONFIG_CACHE = make_cache(
+    maxsize=int(os.getenv('CHRONOGRAPHER_TOWNCRIER_CACHE_SIZE', '4096')),
+    name='towncrier_config',
+)
+"""Parsed towncrier config files keyed by their Git blob SHA.
+
+The keys address immutable contents so the entries never go stale.
+"""
+
+
+_CONTENTS_HTTP_CACHE = make_cache(
+    maxsize=int(os.getenv('CHRONOGRAPHER_HTTP_CACHE_SIZE', '4096')),
+    name='contents_http',
+)
+"""Contents API responses with their ETags, as GidgetHub stores them."""
+
+_PARSED_CONTENTS_CACHE = LRUCache(
+    maxsize=int(os.getenv('CHRONOGRAPHER_HTTP_CACHE_SIZE', '4096')),
+    name='parsed_contents',
+)
+"""Contents API responses paired with their parsed objects by URL."""
+
+
+def towncrier_config_cache_info() -> CacheInfo:
+    """Report the towncrier config cache hits and misses."""
+    return _TOWNCRIER_CONFIG_CACHE.info()
+
+
+def load_towncrier_config_blob(
+        *,
+        blob_sha: str,
+        blob_text: str,
+) -> typing.Mapping[str, typing.Any]:
+    """Parse the towncrier config blob unless it's been parsed before."""
+    towncrier_config = _TOWNCRIER_CONFIG_CACHE.get(blob_sha)
+    if towncrier_config is None:
+        towncrier_config = tomllib.loads(blob_text)
+        _TOWNCRIER_CONFIG_CACHE.set(blob_sha, towncrier_config)
+
+    return towncrier_config
+
+
+def _get_revalidating_api_client():
+    """Return an installation client sending conditional requests.
+
+    It shares the token and the HTTP session with the installation
+    client of the current event but remembers the response ETags.
+    """
+    github_api = copy.copy(RUNTIME_CONTEXT.app_installation_client)
+    # pylint: disable-next=protected-access
+    github_api._cache = _CONTENTS_HTTP_CACHE
+    return github_api
+
+
+async def _get_contents_from_api(
+        api_path: str,
+        parse: typing.Callable[[typing.Any], typing.Any],
+) -> typing.Any:
+    """Fetch and parse a contents API resource, revalidating it.
+
+    GitHub replies to the conditional requests with HTTP 304 when
+    the resource has not changed. Such replies don't count against
+    the rate limit and GidgetHub hands back the very same response
+    object it has stored before, in which case the previously parsed
+    object is reused as is. Missing resources are reported as
+    ``None``.
+    """
+    github_api = _get_revalidating_api_client()
+    try:
+        response = await github_api.getitem(api_path)
+    except gidgethub.BadRequest as http_bad_req:
+        if http_bad_req.status_code == HTTPStatus.NOT_FOUND:
+            return None
+
+        raise
+
+    known_response, parsed_response = _PARSED_CONTENTS_CACHE.get(
+        api_path, (None, None),
+    )
+    # NOTE: Responses coming from a shared cache are fresh copies so
+    # NOTE: they are compared by value. The objects coming from the
+    # NOTE: in-process cache have their items compared by identity.
+    if known_response != response:
+        parsed_response = parse(response)
+        _PARSED_CONTENTS_CACHE.set(api_path, (response, parsed_response))
+
+    return parsed_response
+
+
+def _make_contents_api_path(
+        file_path: str,
+        ref: typing.Optional[str],
+) -> str:
+    """Compose a contents API path of the current repository."""
+    repo_slug = RUNTIME_CONTEXT.github_event.payload['repository']['full_name']
+    api_file_path = f'/{file_path}' if file_path else ''
+    api_query_params = f'?ref={ref}' if ref else ''
+    return f'/repos/{repo_slug}/contents{api_file_path}{api_query_params}'
+
+
+def _decode_file_contents(
+        contents_response: typing.Any,
+) -> typing.Optional[str]:
+    """Extract the text of a file from a contents API response."""
+    file_found = (
+        isinstance(contents_response, dict)
+        and contents_response.get('encoding') == 'base64'
+        and 'content' in contents_response
+    )
+    if not file_found:
+        return None
+
+    return b64decode(contents_response['content']).decode()
+
+
+def _index_dir_entries(
+        contents_response: typing.Any,
+) -> typing.Mapping[str, typing.Mapping[str, typing.Any]]:
+    """Map the directory entries from a contents API response by name."""
+    if not isinstance(contents_response, list):  # Not a directory?
+        return {}
+
+    return {entry['name']: entry for entry in contents_response}
+
+
+def _parse_yaml_file(
+        contents_response: typing.Any,
+) -> typing.Mapping[str, typing.Any]:
+    """Parse a YAML file from a contents API response."""
+    file_contents = _decode_file_contents(contents_response)
+    if file_contents is None:
+        return {}
+
+    return yaml.safe_load(file_contents)
+
+
+async def _get_dir_listing_from_api(
+        dir_path: str,
+        ref: typing.Optional[str],
+) -> typing.Mapping[str, typing.Mapping[str, typing.Any]]:
+    """List the repository directory entries by name using GitHub API."""
+    return await _get_contents_from_api(
+        _make_contents_api_path(dir_path, ref),
+        parse=_index_dir_entries,
+    ) or {}
+
+
+async def _get_installation_config(
+        *,
+        config_name: str = 'config.yml',
+        ref: typing.Optional[str] = None,
+) -> typing.Mapping[str, typing.Any]:
+    """Get a config object from the current installation.
+
+    Unlike its octomachinery counterpart, it revalidates the
+    previously fetched config instead of downloading it again.
+    """
+    if RUNTIME_CONTEXT.IS_GITHUB_ACTION and ref is None:
+        return await get_installation_config(config_name=config_name)
+
+    return await _get_contents_from_api(
+        _make_contents_api_path(f'.github/{config_name}', ref),
+        parse=_parse_yaml_file,
+    ) or {}
+
+
+async def _resolve_blob_sha(
+        file_path: str,
+        ref: typing.Optional[str],
+        *,
+        dir_listings: typing.MutableMapping[
+            str, typing.Mapping[str, typing.Mapping[str, typing.Any]],
+        ],
+) -> str | None:
+    """Find the Git blob SHA of a file by listing its parent directory.
+
+    The listings are memoized in ``dir_listings`` so that sibling
+    candidates cost one request.
+    """
+    dir_path, _sep, file_name = file_path.rpartition('/')
+    if dir_path not in dir_listings:
+        dir_listings[dir_path] = await _get_dir_listing_from_api(dir_path, ref)
+
+    dir_entry = dir_listings[dir_path].get(file_name, {})
+    return dir_entry.get('sha') if dir_entry.get('type') == 'file' else None
+
+
+async def _read_blob_contents_from_api(blob_sha: str) -> str:
+    """Read the Git blob contents using GitHub API."""
+    github_api = RUNTIME_CONTEXT.app_installation_client
+    repo_slug = RUNTIME_CONTEXT.github_event.payload['repository']['full_name']
+
+    blob_response = await github_api.getitem(
+        f'/repos/{repo_slug}/git/blobs/{blob_sha}',
+    )
+    return b64decode(blob_response['content']).decode()
+
 
 async def parse_towncrier_config(
         *,
         towncrier_config_filename: str | None,
         ref: typing.Optional[str] = None,
 ) -> typing.Mapping[str, typing.Any]:
-    """Fetch and parse a toml config file contents as dict."""
+    """Fetch and parse a toml config file contents as dict.
+
+    The parsed documents are memoized by the Git blob SHA of the
+    file so that the byte-identical configs shared by many refs are
+    only downloaded and parsed once.
+    """
     towncrier_config_candidates = (
         (towncrier_config_filename,) if towncrier_config_filename is not None
-        else ('towncrier.toml', 'pyproject.toml')
+        else TOWNCRIER_CONFIG_CANDIDATES
     )
+    if RUNTIME_CONTEXT.IS_GITHUB_ACTION and ref is None:
+        return await _parse_towncrier_config_from_checkout(
+            towncrier_config_candidates,
+        )
+
+    dir_listings: dict[
+        str, typing.Mapping[str, typing.Mapping[str, typing.Any]],
+    ] = {}
+    for config_filename in towncrier_config_candidates:
+        with contextlib.suppress(gidgethub.BadRequest):
+            blob_sha = await _resolve_blob_sha(
+                config_filename, ref,
+                dir_listings=dir_listings,
+            )
+            if blob_sha is not None:  # File not found in the repo?
+                break
+    else:
+        return {}
+
+    towncrier_config = _TOWNCRIER_CONFIG_CACHE.get(blob_sha)
+    if towncrier_config is None:
+        towncrier_config = tomllib.loads(
+            await _read_blob_contents_from_api(blob_sha),
+        )
+        _TOWNCRIER_CONFIG_CACHE.set(blob_sha, towncrier_config)
+
+    logger.debug(
+        'Towncrier config cache stats: %s',
+        towncrier_config_cache_info(),
+    )
+    return towncrier_config
+
+
+async def _parse_towncrier_config_from_checkout(
+        towncrier_config_candidates: typing.Iterable[str],
+) -> typing.Mapping[str, typing.Any]:
+    """Parse the first towncrier config found in the Action checkout."""
     for config_filename in towncrier_config_candidates:
         with contextlib.suppress(gidgethub.BadRequest):
             config_content = await read_file_contents_from_repo(
                 file_path=config_filename,
-                ref=ref,
             )
             if config_content is not None:  # File not found in the repo?
                 break
@@ -49,6 +316,44 @@ async def get_towncrier_config(
     return pyproject_toml.get('tool', {}).get('towncrier')
 
 
+def _make_chronographer_config_cache_key(
+        *,
+        installation_id: int | None,
+        repo_slug: str,
+        ref: typing.Optional[str],
+) -> tuple[int | None, str, str | None]:
+    """Compose a config cache key for the given repository ref."""
+    return installation_id, repo_slug, ref
+
+
+def _get_event_chronographer_config_cache_key(
+        ref: typing.Optional[str],
+) -> tuple[int | None, str, str | None]:
+    """Compose a config cache key for the event being processed."""
+    event_payload = RUNTIME_CONTEXT.github_event.payload
+    return _make_chronographer_config_cache_key(
+        installation_id=event_payload.get('installation', {}).get('id'),
+        repo_slug=event_payload['repository']['full_name'],
+        ref=ref,
+    )
+
+
+def invalidate_chronographer_config(
+        *,
+        installation_id: int | None,
+        repo_slug: str,
+        ref: typing.Optional[str],
+) -> bool:
+    """Forget the cached chronographer config of the repository ref."""
+    return _CHRONOGRAPHER_CONFIG_CACHE.invalidate(
+        _make_chronographer_config_cache_key(
+            installation_id=installation_id,
+            repo_slug=repo_slug,
+            ref=ref,
+        ),
+    )
+
+
 async def get_chronographer_config(
         *,
         ref: typing.Optional[str] = None,
@@ -56,14 +361,52 @@ async def get_chronographer_config(
     """Return chronographer config ``.github/chronographer.yml`` object.
 
     If the file is not there, fall back to ``.github/config.yml``
+
+    The result is memoized per installation, repository and ref for
+    a limited time. Pushes changing the config are expected to
+    invalidate it via :func:`invalidate_chronographer_config`.
     """
+    repo_config = get_cached_chronographer_config(ref=ref)
+    if repo_config is None:
+        repo_config = await _fetch_chronographer_config(ref=ref)
+        remember_chronographer_config(repo_config, ref=ref)
+
+    return repo_config
+
+
+def get_cached_chronographer_config(
+        *,
+        ref: typing.Optional[str] = None,
+) -> typing.Mapping[str, typing.Any] | None:
+    """Return the memoized chronographer config or ``None``."""
+    return _CHRONOGRAPHER_CONFIG_CACHE.get(
+        _get_event_chronographer_config_cache_key(ref),
+    )
+
+
+def remember_chronographer_config(
+        repo_config: typing.Mapping[str, typing.Any],
+        *,
+        ref: typing.Optional[str] = None,
+) -> None:
+    """Memoize the chronographer config however it's been loaded."""
+    _CHRONOGRAPHER_CONFIG_CACHE.set(
+        _get_event_chronographer_config_cache_key(ref), repo_config,
+    )
+
+
+async def _fetch_chronographer_config(
+        *,
+        ref: typing.Optional[str] = None,
+) -> typing.Mapping[str, typing.Any]:
+    """Retrieve the chronographer config from the repository."""
     try:
-        return await get_installation_config(
+        return await _get_installation_config(
             config_name='chronographer.yml',
             ref=ref,
         )
     except gidgethub.BadRequest:
         pass
 
-    config_json = await get_installation_config(ref=ref)
+    config_json = await _get_installation_config(ref=ref)
     return config_json.get('chronographer', {})
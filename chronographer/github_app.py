@@ -0,0 +1,236 @@
+"""GitHub App wrappers talking to a configurable API endpoint."""
+
+import asyncio
+from datetime import datetime, timezone
+import logging
+import os
+
+from aiohttp import ClientSession, TCPConnector
+
+from octomachinery.github.api.app_client import (
+    GitHubApp as _GitHubAppBase,
+)
+from octomachinery.github.api.raw_client import RawGitHubAPI
+from octomachinery.github.api.tokens import GitHubOAuthToken
+from octomachinery.github.entities.app_installation import (
+    GitHubAppInstallation as _GitHubAppInstallationBase,
+)
+from octomachinery.github.models import (
+    GitHubAppInstallation as GitHubAppInstallationModel,
+)
+from octomachinery.utils.asynctools import amap, dict_to_kwargs_cb
+
+from .caching import LRUCache
+from .metrics import make_github_api_trace_config
+from .rate_limiting import RateLimitedGitHubAPI, get_rate_limiter
+
+
+logger = logging.getLogger(__name__)
+
+
+GITHUB_API_URL = os.getenv(
+    'CHRONOGRAPHER_GITHUB_API_URL',
+    'https://api.github.com',
+)
+"""The GitHub API root, overridable for hitting a stub API."""
+
+HTTP_POOL_SIZE = int(os.getenv('CHRONOGRAPHER_HTTP_POOL_SIZE', '100'))
+"""The most connections to keep open at once, ``0`` for no limit."""
+
+HTTP_POOL_SIZE_PER_HOST = int(
+    os.getenv('CHRONOGRAPHER_HTTP_POOL_SIZE_PER_HOST', '0'),
+)
+"""The most connections to keep open to a single host at once."""
+
+HTTP_KEEPALIVE_TIMEOUT = float(
+    os.getenv('CHRONOGRAPHER_HTTP_KEEPALIVE_TIMEOUT', '60'),
+)
+"""Seconds to keep the idle connections open for reuse."""
+
+HTTP_DNS_CACHE_TTL = 300
+"""Seconds to remember the resolved host addresses for."""
+
+INSTALLATION_TOKEN_REFRESH_MARGIN = float(
+    os.getenv('CHRONOGRAPHER_INSTALLATION_TOKEN_REFRESH_MARGIN', '300'),
+)
+"""Seconds before the expiry to start renewing an installation token."""
+
+INSTALLATION_TOKEN_MIN_VALIDITY = 30
+"""Seconds a token must stay valid for to be used without waiting."""
+
+INSTALLATIONS_TO_REMEMBER = 10_000
+"""How many installations to keep along with their tokens."""
+
+INSTALLATION_METADATA_TTL = 24 * 60 * 60
+"""Seconds to trust the installation metadata for before fetching it."""
+
+
+def make_http_session() -> ClientSession:
+    """Make the HTTP client session shared by all the API clients.
+
+    Its connections are kept alive between the requests so that the
+    steady stream of events reuses them instead of going through new
+    TLS handshakes.
+    """
+    return ClientSession(
+        connector=TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        ),
+        trace_configs=[make_github_api_trace_config()],
+    )
+
+
+def _log_token_refresh_failure(token_refresh: asyncio.Task) -> None:
+    """Report the background token refresh nobody has waited for."""
+    if not token_refresh.cancelled() and token_refresh.exception():
+        logger.error(
+            'Failed to renew an installation token ahead of time',
+            exc_info=token_refresh.exception(),
+        )
+
+
+class GitHubAppInstallation(_GitHubAppInstallationBase):
+    """A GitHub App Installation with rate-limited clients."""
+
+    _token_refresh: asyncio.Task | None = None
+    """The installation token request in flight, if any."""
+
+    @property
+    def api_client(self):  # noqa: D401
+        """The GitHub App Installation client."""
+        # pylint: disable=protected-access
+        return RateLimitedGitHubAPI(
+            token=self._refresh_api_token,
+            session=self.app._http_session,
+            user_agent=self.app._config.user_agent,
+            base_url=GITHUB_API_URL,
+            rate_limiter=get_rate_limiter(self._metadata.id),
+        )
+
+    async def _refresh_api_token(self):
+        """Return the installation token, renewing it ahead of time.
+
+        Once the token is within :data:`INSTALLATION_TOKEN_REFRESH_MARGIN`
+        of its expiry, a new one is requested in the background while
+        the current one keeps being used. The requests only wait for it
+        when the token is about to expire. All the concurrent callers
+        share a single token request.
+        """
+        token_validity = self._get_token_validity()
+        if token_validity < INSTALLATION_TOKEN_REFRESH_MARGIN:
+            token_refresh = self._start_token_refresh()
+            if token_validity < INSTALLATION_TOKEN_MIN_VALIDITY:
+                # NOTE: Shielding keeps a cancelled request from
+                # NOTE: cancelling the refresh the others wait for.
+                await asyncio.shield(token_refresh)
+
+        return GitHubOAuthToken(self._token.token)
+
+    def _get_token_validity(self) -> float:
+        """Return the seconds left until the token expires."""
+        if self._token is None:
+            return 0
+
+        return (
+            self._token.expires_at - datetime.now(timezone.utc)
+        ).total_seconds()
+
+    def _start_token_refresh(self) -> asyncio.Task:
+        """Request a new token unless it's being requested already."""
+        if self._token_refresh is None:
+            self._token_refresh = asyncio.create_task(self._renew_token())
+            self._token_refresh.add_done_callback(_log_token_refresh_failure)
+        return self._token_refresh
+
+    async def _renew_token(self) -> None:
+        """Replace the token with a new one."""
+        try:
+            self._token = await self.get_token()
+        finally:
+            self._token_refresh = None
+
+
+class GitHubApp(_GitHubAppBase):
+    """A GitHub App with clients bound to the API root.
+
+    The installations are remembered along with their tokens so that
+    the events don't have to look them up again.
+    """
+
+    def __attrs_post_init__(self) -> None:
+        """Initialize the cache of the installations seen."""
+        super().__attrs_post_init__()
+        # pylint: disable=attribute-defined-outside-init
+        self._installations = LRUCache(
+            maxsize=INSTALLATIONS_TO_REMEMBER,
+            ttl=INSTALLATION_METADATA_TTL,
+        )
+        self._installation_lookups: dict[int, asyncio.Task] = {}
+
+    @property
+    def api_client(self):  # noqa: D401
+        """The GitHub App client with an async CM interface."""
+        return RawGitHubAPI(
+            token=self.gh_jwt,
+            session=self._http_session,
+            user_agent=self._config.user_agent,
+            base_url=GITHUB_API_URL,
+        )
+
+    async def get_installation_by_id(self, install_id):
+        """Retrieve an installation with access tokens via API.
+
+        The installations seen before are reused along with the tokens
+        they hold. The concurrent lookups of the same installation share
+        a single request.
+        """
+        installation = self._installations.get(install_id)
+        if installation is not None:
+            return installation
+
+        installation_lookup = self._installation_lookups.get(install_id)
+        if installation_lookup is None:
+            installation_lookup = asyncio.create_task(
+                self._fetch_installation(install_id),
+            )
+            self._installation_lookups[install_id] = installation_lookup
+        return await asyncio.shield(installation_lookup)
+
+    async def _fetch_installation(self, install_id):
+        """Look the installation up and remember it."""
+        try:
+            installation = GitHubAppInstallation(
+                await dict_to_kwargs_cb(GitHubAppInstallationModel)(
+                    await self.api_client.getitem(
+                        '/app/installations/{installation_id}',
+                        url_vars={'installation_id': install_id},
+                        preview_api_version='machine-man',
+                    ),
+                ),
+                self,
+            )
+        finally:
+            del self._installation_lookups[install_id]
+
+        self._installations.set(install_id, installation)
+        return installation
+
+    async def get_installations(self):
+        """Retrieve all installations with access tokens via API."""
+        installations = {
+            install.id: GitHubAppInstallation(install, self)
+            async for install in amap(
+                dict_to_kwargs_cb(GitHubAppInstallationModel),
+                self.api_client.getiter(
+                    '/app/installations',
+                    preview_api_version='machine-man',
+                ),
+            )
+        }
+        for install_id, installation in installations.items():
+            if self._installations.get(install_id) is None:
+                self._installations.set(install_id, installation)
+        return installations
@@ -0,0 +1,254 @@
+"""Loader of the PR evaluation context via GraphQL."""
+
+import logging
+import os
+import typing
+
+import attr
+import gidgethub
+import yaml
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+
+from .diff_sources import FileEntry
+from .file_utils import (
+    TOWNCRIER_CONFIG_CANDIDATES,
+    get_cached_chronographer_config,
+    load_towncrier_config_blob,
+    remember_chronographer_config,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTEXT_LOADER = os.getenv('CHRONOGRAPHER_CONTEXT_LOADER', 'rest')
+"""The way of retrieving the PR context: ``rest`` or ``graphql``."""
+
+_BLOB_FIELDS = 'oid text isTruncated'
+
+PR_CONTEXT_QUERY = '''
+query (
+  $owner: String!, $name: String!,
+  $chronographerConfig: String!, $legacyConfig: String!,
+  $towncrierToml: String!, $pyprojectToml: String!,
+  $withRepoConfig: Boolean!
+) {
+  repository(owner: $owner, name: $name) {
+    chronographerConfig: object(expression: $chronographerConfig)
+    @include(if: $withRepoConfig) {
+      ... on Blob { %(blob_fields)s }
+    }
+    legacyConfig: object(expression: $legacyConfig)
+    @include(if: $withRepoConfig) {
+      ... on Blob { %(blob_fields)s }
+    }
+    towncrierToml: object(expression: $towncrierToml) {
+      ... on Blob { %(blob_fields)s }
+    }
+    pyprojectToml: object(expression: $pyprojectToml) {
+      ... on Blob { %(blob_fields)s }
+    }
+  }
+}
+''' % {'blob_fields': _BLOB_FIELDS}
+"""A query for all the config candidates at once."""
+
+PR_FILES_QUERY = '''
+query (
+  $owner: String!, $name: String!, $number: Int!, $filesCursor: String
+) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      files(first: 100, after: $filesCursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path changeType additions }
+      }
+    }
+  }
+}
+'''
+"""A query for a page of the PR changed files."""
+
+_TOWNCRIER_CONFIG_ALIASES = dict(
+    zip(TOWNCRIER_CONFIG_CANDIDATES, ('towncrierToml', 'pyprojectToml')),
+)
+"""GraphQL query aliases of the towncrier config candidates."""
+
+
+class GraphQLLoadingError(LookupError):
+    """The PR context could not be loaded via GraphQL."""
+
+
+@attr.dataclass(frozen=True)
+class PRContext:  # pylint: disable=too-few-public-methods
+    """The configs needed for evaluating the PR, loaded in one go."""
+
+    repo_config: typing.Mapping[str, typing.Any]
+    """The chronographer config from the default branch."""
+    towncrier_files: typing.Mapping[
+        str, typing.Mapping[str, typing.Any] | None,
+    ]
+    """Parsed towncrier config candidates, ``None`` for missing ones."""
+
+    def get_towncrier_config(
+            self,
+            towncrier_config_filename: str | None,
+    ) -> typing.Mapping[str, typing.Any] | None:
+        """Pick the towncrier config the REST API loader would return.
+
+        :raises LookupError: if the file hasn't been loaded
+        """
+        towncrier_config_candidates = (
+            (towncrier_config_filename,)
+            if towncrier_config_filename is not None
+            else TOWNCRIER_CONFIG_CANDIDATES
+        )
+        for config_filename in towncrier_config_candidates:
+            towncrier_file = self.towncrier_files[config_filename]
+            if towncrier_file is not None:
+                return towncrier_file.get('tool', {}).get('towncrier')
+
+        return None
+
+
+async def _query(query: str, **query_vars) -> typing.Mapping[str, typing.Any]:
+    """Run a GraphQL query with the installation client."""
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    try:
+        response = await gh_api.post(
+            '/graphql',
+            data={'query': query, 'variables': query_vars},
+        )
+    except gidgethub.HTTPException as http_exc:
+        raise GraphQLLoadingError(http_exc) from http_exc
+
+    if response.get('errors') or not response.get('data'):
+        raise GraphQLLoadingError(response.get('errors'))
+
+    return response['data']['repository']
+
+
+def _get_blob_text(blob: typing.Mapping[str, typing.Any] | None) -> str | None:
+    """Return the blob text or ``None`` if there's no such blob.
+
+    :raises GraphQLLoadingError: if the blob text is unavailable
+    """
+    if not blob:
+        return None
+
+    if blob.get('isTruncated') or blob.get('text') is None:
+        raise GraphQLLoadingError(f'Blob {blob.get("oid")} text is missing')
+
+    return blob['text']
+
+
+def _parse_repo_config(
+        repository: typing.Mapping[str, typing.Any],
+) -> typing.Mapping[str, typing.Any]:
+    """Pick the chronographer config with a fallback to ``config.yml``."""
+    config_text = _get_blob_text(repository['chronographerConfig'])
+    if config_text is not None:
+        return yaml.safe_load(config_text) or {}
+
+    legacy_config_text = _get_blob_text(repository['legacyConfig'])
+    if legacy_config_text is None:
+        return {}
+
+    return (yaml.safe_load(legacy_config_text) or {}).get('chronographer', {})
+
+
+def _parse_towncrier_files(
+        repository: typing.Mapping[str, typing.Any],
+) -> dict[str, typing.Mapping[str, typing.Any] | None]:
+    """Parse the towncrier config candidates that could be retrieved."""
+    towncrier_files = {}
+    for config_filename, query_alias in _TOWNCRIER_CONFIG_ALIASES.items():
+        try:
+            config_text = _get_blob_text(repository[query_alias])
+        except GraphQLLoadingError:
+            continue  # Leave it for the REST API fallback to deal with
+
+        towncrier_files[config_filename] = None if config_text is None else (
+            load_towncrier_config_blob(
+                blob_sha=repository[query_alias]['oid'],
+                blob_text=config_text,
+            )
+        )
+    return towncrier_files
+
+
+async def load_pr_context(
+        *,
+        repo_slug: str,
+        repo_default_branch: str,
+        pull_request: typing.Mapping[str, typing.Any],
+) -> PRContext:
+    """Load all the configs the PR evaluation may need in one query.
+
+    The changed files are left for :func:`load_pr_changed_files` so
+    that the PRs skipped based on the config don't pay for them. The
+    chronographer config shares the cache with the REST API loader and
+    is only requested if it's not there. The towncrier configs are
+    parsed once per Git blob SHA, same as with the REST API.
+
+    :raises GraphQLLoadingError: if GraphQL API fails to provide it
+    """
+    repo_owner, _sep, repo_name = repo_slug.partition('/')
+    head_sha = pull_request['head']['sha']
+    repo_config = get_cached_chronographer_config(ref=repo_default_branch)
+    repository = await _query(
+        PR_CONTEXT_QUERY,
+        owner=repo_owner,
+        name=repo_name,
+        chronographerConfig=f'{repo_default_branch}:.github/chronographer.yml',
+        legacyConfig=f'{repo_default_branch}:.github/config.yml',
+        towncrierToml=f'{head_sha}:towncrier.toml',
+        pyprojectToml=f'{head_sha}:pyproject.toml',
+        withRepoConfig=repo_config is None,
+    )
+    if repo_config is None:
+        repo_config = _parse_repo_config(repository)
+        remember_chronographer_config(repo_config, ref=repo_default_branch)
+
+    logger.info('Loaded the PR configs via GraphQL')
+    return PRContext(
+        repo_config=repo_config,
+        towncrier_files=_parse_towncrier_files(repository),
+    )
+
+
+async def load_pr_changed_files(
+        *,
+        repo_slug: str,
+        pull_request: typing.Mapping[str, typing.Any],
+) -> list[FileEntry]:
+    """List the PR changed files a hundred per query.
+
+    :raises GraphQLLoadingError: if GraphQL API fails to provide them
+    """
+    repo_owner, _sep, repo_name = repo_slug.partition('/')
+    changed_files: list[FileEntry] = []
+    files_cursor = None
+    while True:
+        pr_files = (
+            await _query(
+                PR_FILES_QUERY,
+                owner=repo_owner,
+                name=repo_name,
+                number=pull_request['number'],
+                filesCursor=files_cursor,
+            )
+        )['pullRequest']['files']
+        changed_files.extend(
+            FileEntry.from_graphql(f) for f in pr_files['nodes']
+        )
+        if not pr_files['pageInfo']['hasNextPage']:
+            break
+
+        files_cursor = pr_files['pageInfo']['endCursor']
+
+    logger.info(
+        'Loaded %d changed files of the PR via GraphQL', len(changed_files),
+    )
+    return changed_files
@@ -0,0 +1,379 @@
+"""Audit the merged pull requests of a local clone against a config.
+
+Run it with ``python -m chronographer.history_audit``.
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+import tomllib
+import typing
+
+import attr
+import yaml
+
+from .change_classifier import ChangesClassifier
+from .diff_sources import FileEntry
+from .file_utils import TOWNCRIER_CONFIG_CANDIDATES
+
+
+COMMITS_PER_CHUNK = 256
+"""How many merge commits a worker process diffs in one ``git`` call."""
+
+_GIT_SHOW_FORMAT = '%x00%x00%H%x00%s'
+"""The commit header marking the start of each commit in the output."""
+
+CHRONOGRAPHER_CONFIG_CANDIDATES = (
+    '.github/chronographer.yml',
+    '.github/config.yml',
+)
+"""Files looked up for the chronographer config, in the order of priority."""
+
+LEGACY_CONFIG_FILENAME = 'config.yml'
+"""The shared config file keeping the chronographer one in a section."""
+
+_WORKER_CONTEXT: dict[str, typing.Any] = {}
+"""The compiled config a worker process evaluates the commits against."""
+
+
+@attr.dataclass(frozen=True)
+class CommitVerdict:  # pylint: disable=too-few-public-methods
+    """How the config would have judged a merged pull request."""
+
+    commit: str
+    """The merge commit SHA."""
+    subject: str
+    """The merge commit subject line."""
+    conclusion: str
+    """The check run conclusion: ``success``, ``neutral`` or ``failure``."""
+    news_fragments: tuple[str, ...]
+    """The paths of the news fragments added."""
+    is_release: bool
+    """Whether the changes look like a release preparation."""
+    changed_files_count: int
+    """How many files the pull request changed."""
+
+
+def _run_git(repo_path: pathlib.Path, *git_args: str) -> str:
+    """Run a git command in the clone and return its output."""
+    return subprocess.run(
+        ('git', '-C', str(repo_path), '-c', 'core.quotePath=false', *git_args),
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+
+def list_merge_commits(
+        repo_path: pathlib.Path,
+        *,
+        revision: str,
+        max_count: int | None,
+) -> list[str]:
+    """List the merge commits of the mainline, newest first."""
+    max_count_args = () if max_count is None else (f'--max-count={max_count}',)
+    return _run_git(
+        repo_path,
+        'rev-list', '--merges', '--first-parent', *max_count_args, revision,
+    ).split()
+
+
+def parse_merge_diffs(
+        git_show_output: str,
+) -> typing.Iterator[tuple[str, str, list[FileEntry]]]:
+    """Read the changed files of each commit out of ``git show``.
+
+    The output is expected to list the ``--raw`` lines of the commit
+    followed by its ``--numstat`` lines for the same files in the same
+    order. The renamed and copied files are neither added nor removed,
+    just like GitHub reports them.
+    """
+    for commit_output in git_show_output.split('\0\0')[1:]:
+        commit_header, _sep, commit_diff = commit_output.partition('\n')
+        commit_sha, _sep, subject = commit_header.partition('\0')
+        raw_statuses, line_additions = [], []
+        for diff_line in commit_diff.splitlines():
+            if diff_line.startswith(':'):
+                file_meta, *file_paths = diff_line.split('\t')
+                raw_statuses.append((file_meta.split()[-1][0], file_paths[-1]))
+            elif diff_line:
+                added, _deleted, _path = diff_line.split('\t', 2)
+                line_additions.append(int(added) if added.isdigit() else 0)
+
+        yield commit_sha, subject, [
+            FileEntry(
+                path=file_path,
+                is_added_file=file_status == 'A',
+                is_removed_file=file_status == 'D',
+                added=added,
+            )
+            for (file_status, file_path), added
+            in zip(raw_statuses, line_additions)
+        ]
+
+
+def judge_changes(
+        commit_sha: str,
+        subject: str,
+        diff: typing.Sequence[FileEntry],
+) -> CommitVerdict:
+    """Evaluate the commit changes like a pull request would be."""
+    pr_changes = ChangesClassifier(
+        tc_fragment_re=_WORKER_CONTEXT['tc_fragment_re'],
+        config_paths=_WORKER_CONTEXT['paths_config'],
+        towncrier_config=_WORKER_CONTEXT['towncrier_config'],
+    ).classify(diff)
+    return CommitVerdict(
+        commit=commit_sha,
+        subject=subject,
+        conclusion='success' if pr_changes.news_fragments_added
+        else 'neutral' if not pr_changes.news_fragments_required
+        else 'failure',
+        news_fragments=tuple(
+            file_entry.path for file_entry in pr_changes.news_fragments_added
+        ),
+        is_release=pr_changes.is_release,
+        changed_files_count=len(diff),
+    )
+
+
+def _init_worker(
+        repo_path: pathlib.Path,
+        repo_config: typing.Mapping[str, typing.Any],
+        towncrier_config: typing.Mapping[str, typing.Any],
+) -> None:
+    """Compile the config once per worker process."""
+    # pylint: disable-next=import-outside-toplevel
+    from .pr_evaluation import compile_towncrier_fragments_regex
+
+    enforce_name_key = (
+        'enforce-name' if 'enforce-name' in repo_config
+        else 'enforce_name'
+    )
+    _WORKER_CONTEXT.update(
+        repo_path=repo_path,
+        paths_config=repo_config.get(
+            'paths',
+            {'towncrier-config-filename': None},
+        ),
+        towncrier_config=towncrier_config,
+        tc_fragment_re=asyncio.run(
+            compile_towncrier_fragments_regex(
+                name_settings=repo_config.get(enforce_name_key, {}),
+                towncrier_config=towncrier_config,
+            ),
+        ),
+    )
+
+
+def audit_commits(commit_shas: typing.Sequence[str]) -> list[CommitVerdict]:
+    """Judge the merge commits by their changes to the first parent."""
+    verdicts_by_commit = {
+        commit_sha: judge_changes(commit_sha, subject, diff)
+        for commit_sha, subject, diff in parse_merge_diffs(
+            _run_git(
+                _WORKER_CONTEXT['repo_path'],
+                'show', '-m', '--first-parent', '--raw', '--numstat',
+                f'--format={_GIT_SHOW_FORMAT}', *commit_shas,
+            ),
+        )
+    }
+    return [
+        verdicts_by_commit[commit_sha]
+        for commit_sha in commit_shas
+        if commit_sha in verdicts_by_commit
+    ]
+
+
+def audit_history(
+        repo_path: pathlib.Path,
+        *,
+        repo_config: typing.Mapping[str, typing.Any],
+        towncrier_config: typing.Mapping[str, typing.Any],
+        commit_shas: typing.Sequence[str],
+        jobs: int | None,
+) -> typing.Iterator[CommitVerdict]:
+    """Judge the commits in a pool of processes, keeping their order."""
+    commit_chunks = [
+        commit_shas[chunk_start:chunk_start + COMMITS_PER_CHUNK]
+        for chunk_start in range(0, len(commit_shas), COMMITS_PER_CHUNK)
+    ]
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(repo_path, repo_config, towncrier_config),
+    ) as executor:
+        for chunk_verdicts in executor.map(audit_commits, commit_chunks):
+            yield from chunk_verdicts
+
+
+def load_repo_config(
+        repo_path: pathlib.Path,
+        config_path: pathlib.Path | None,
+) -> typing.Mapping[str, typing.Any]:
+    """Read the given chronographer config or the one of the clone."""
+    config_candidates = (
+        (config_path,) if config_path is not None
+        else tuple(
+            repo_path / candidate_path
+            for candidate_path in CHRONOGRAPHER_CONFIG_CANDIDATES
+        )
+    )
+    for config_candidate in config_candidates:
+        if not config_candidate.is_file():
+            continue
+
+        repo_config = yaml.safe_load(config_candidate.read_text()) or {}
+        if config_candidate.name == LEGACY_CONFIG_FILENAME:
+            return repo_config.get('chronographer') or {}
+
+        return repo_config
+
+    return {}
+
+
+def load_towncrier_config(
+        repo_path: pathlib.Path,
+        towncrier_config_path: pathlib.Path | None,
+        repo_config: typing.Mapping[str, typing.Any],
+) -> typing.Mapping[str, typing.Any]:
+    """Read the given towncrier config or the one of the clone."""
+    towncrier_config_filename = repo_config.get('paths', {}).get(
+        'towncrier-config-filename',
+    )
+    config_candidates = (
+        (towncrier_config_path,) if towncrier_config_path is not None
+        else tuple(
+            repo_path / candidate_path
+            for candidate_path in (
+                (towncrier_config_filename,)
+                if towncrier_config_filename is not None
+                else TOWNCRIER_CONFIG_CANDIDATES
+            )
+        )
+    )
+    for config_candidate in config_candidates:
+        if config_candidate.is_file():
+            return tomllib.loads(
+                config_candidate.read_text(),
+            ).get('tool', {}).get('towncrier') or {}
+
+    return {}
+
+
+def _print_verdict(verdict: CommitVerdict, *, as_json: bool) -> None:
+    """Print the verdict as soon as it's known."""
+    if as_json:
+        print(json.dumps(attr.asdict(verdict)), flush=True)
+        return
+
+    print(
+        f'{verdict.commit[:12]}  {verdict.conclusion:<7}  '
+        f'{"release" if verdict.is_release else "       "}  '
+        f'{verdict.subject}',
+        flush=True,
+    )
+
+
+def _print_summary(
+        conclusions: typing.Mapping[str, int],
+        releases_count: int,
+        audit_duration: float,
+) -> None:
+    """Report the aggregate stats of the audit."""
+    commits_count = sum(conclusions.values())
+    print(
+        f'commits:      {commits_count:d} in {audit_duration:.2f}s '
+        f'({commits_count / max(audit_duration, 1e-9):.0f}/s)',
+        file=sys.stderr,
+    )
+    for conclusion in ('success', 'neutral', 'failure'):
+        conclusion_count = conclusions[conclusion]
+        print(
+            f'{conclusion + ":":<14}{conclusion_count:d} '
+            f'({conclusion_count / max(commits_count, 1) * 100:.1f}%)',
+            file=sys.stderr,
+        )
+    print(f'releases:     {releases_count:d}', file=sys.stderr)
+
+
+def _parse_args(argv: typing.Sequence[str]) -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog='python -m chronographer.history_audit',
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument(
+        'repo_path', nargs='?', type=pathlib.Path, default=pathlib.Path(),
+        help='the local clone to audit (default: the current directory)',
+    )
+    parser.add_argument(
+        '--config', type=pathlib.Path,
+        help='the chronographer config to audit '
+        '(default: the one in the clone)',
+    )
+    parser.add_argument(
+        '--towncrier-config', type=pathlib.Path,
+        help='the TOML file with the towncrier config to audit '
+        '(default: the one in the clone)',
+    )
+    parser.add_argument(
+        '--revision', default='HEAD',
+        help='the mainline to walk the merges of (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--max-count', type=int,
+        help='how many of the most recent merge commits to audit',
+    )
+    parser.add_argument(
+        '--jobs', type=int, default=os.cpu_count(),
+        help='how many worker processes to run (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--json', action='store_true',
+        help='print the verdicts as JSON lines',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Sequence[str] | None = None) -> None:
+    """Audit the history and report the verdicts as they come."""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    repo_config = load_repo_config(args.repo_path, args.config)
+    towncrier_config = load_towncrier_config(
+        args.repo_path, args.towncrier_config, repo_config,
+    )
+
+    audit_started_at = time.perf_counter()
+    conclusions: collections.Counter[str] = collections.Counter()
+    releases_count = 0
+    for verdict in audit_history(
+            args.repo_path,
+            repo_config=repo_config,
+            towncrier_config=towncrier_config,
+            commit_shas=list_merge_commits(
+                args.repo_path,
+                revision=args.revision,
+                max_count=args.max_count,
+            ),
+            jobs=args.jobs,
+    ):
+        _print_verdict(verdict, as_json=args.json)
+        conclusions[verdict.conclusion] += 1
+        releases_count += verdict.is_release
+
+    _print_summary(
+        conclusions, releases_count,
+        time.perf_counter() - audit_started_at,
+    )
+
+
+# pylint: disable=expression-not-assigned
+__name__ == '__main__' and main()
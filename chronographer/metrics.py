@@ -0,0 +1,190 @@
+"""Prometheus metrics of the webhook processing."""
+
+import contextlib
+import re
+import time
+import typing
+
+from aiohttp import TraceConfig
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from yarl import URL
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+
+from .caching import iter_named_caches
+
+
+_ID_SEGMENT_RE = re.compile(r'^(\d+|[\da-f]{40})(\.\w+)?$')
+"""A path segment holding a number or a commit SHA."""
+
+_OPEN_ENDED_RESOURCES = frozenset({'contents', 'git', 'compare'})
+"""API resources followed by arbitrary paths or refs."""
+
+WEBHOOK_EVENTS = Counter(
+    'chronographer_webhook_events',
+    'Webhook events received, by type and delivery outcome.',
+    ('event', 'status'),
+)
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'chronographer_webhook_queue_depth',
+    'Acknowledged webhook events waiting for or undergoing handling.',
+)
+
+PR_STAGE_DURATION = Histogram(
+    'chronographer_pr_stage_duration_seconds',
+    'Time spent in each stage of the pull request evaluation.',
+    ('stage',),
+)
+
+PR_CONCLUSIONS = Counter(
+    'chronographer_pr_evaluations',
+    'Completed pull request evaluations, by check run conclusion.',
+    ('conclusion',),
+)
+
+GITHUB_API_DURATION = Histogram(
+    'chronographer_github_api_request_duration_seconds',
+    'GitHub API response latency, by endpoint and status.',
+    ('method', 'endpoint', 'status'),
+)
+
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    'chronographer_github_rate_limit_remaining',
+    'Requests left in the GitHub API rate limit window.',
+    ('installation', 'resource'),
+)
+
+GITHUB_API_THROTTLING = Counter(
+    'chronographer_github_api_throttled_seconds',
+    'Time the GitHub API requests were held back to respect rate limits.',
+    ('resource', 'reason'),
+)
+
+GITHUB_API_DEFERRED_REQUESTS = Counter(
+    'chronographer_github_api_deferred_requests',
+    'Optional GitHub API requests skipped to save the rate limit quota.',
+    ('resource',),
+)
+
+GITHUB_API_SKIPPED_WRITES = Counter(
+    'chronographer_github_api_skipped_writes',
+    'GitHub API writes skipped as they would not change anything.',
+    ('kind',),
+)
+
+
+def measure_stage(stage: str) -> typing.ContextManager:
+    """Time the enclosed PR evaluation stage."""
+    return PR_STAGE_DURATION.labels(stage).time()
+
+
+def normalize_endpoint(url: URL) -> str:
+    """Turn a request URL into a low-cardinality endpoint template."""
+    path_segments = url.path.strip('/').split('/')
+    if path_segments[0] == 'repos':
+        path_segments[1:3] = '{owner}', '{repo}'
+    elif path_segments[2:3] == ['pull']:
+        # NOTE: The web URLs of the PR diffs are addressed as
+        # NOTE: ``{owner}/{repo}/pull/...`` right away.
+        path_segments[0:2] = '{owner}', '{repo}'
+
+    endpoint_segments = []
+    for path_segment in path_segments:
+        if _ID_SEGMENT_RE.match(path_segment):
+            path_segment = _ID_SEGMENT_RE.sub(r'{id}\2', path_segment)
+        endpoint_segments.append(path_segment)
+        if path_segment in _OPEN_ENDED_RESOURCES:
+            endpoint_segments.append('...')
+            break
+
+    return '/' + '/'.join(endpoint_segments)
+
+
+def _get_installation_label() -> str:
+    """Tell which installation the API quota belongs to."""
+    with contextlib.suppress(LookupError, AttributeError, TypeError):
+        return str(RUNTIME_CONTEXT.github_event.payload['installation']['id'])
+    return 'app'
+
+
+async def _on_request_start(_session, trace_ctx, _params) -> None:
+    """Remember when the request has been sent."""
+    trace_ctx.started_at = time.perf_counter()
+
+
+async def _on_request_end(_session, trace_ctx, params) -> None:
+    """Record the API response latency and the rate limit quota."""
+    GITHUB_API_DURATION.labels(
+        params.method,
+        normalize_endpoint(params.url),
+        params.response.status,
+    ).observe(time.perf_counter() - trace_ctx.started_at)
+
+    rate_limit_remaining = params.response.headers.get('X-RateLimit-Remaining')
+    if rate_limit_remaining is not None:
+        GITHUB_RATE_LIMIT_REMAINING.labels(
+            _get_installation_label(),
+            params.response.headers.get('X-RateLimit-Resource', 'core'),
+        ).set(int(rate_limit_remaining))
+
+
+async def _on_request_exception(_session, trace_ctx, params) -> None:
+    """Record the latency of the requests that failed to complete."""
+    GITHUB_API_DURATION.labels(
+        params.method,
+        normalize_endpoint(params.url),
+        type(params.exception).__name__,
+    ).observe(time.perf_counter() - trace_ctx.started_at)
+
+
+def make_github_api_trace_config() -> TraceConfig:
+    """Make an HTTP client tracer feeding the GitHub API metrics."""
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+
+class CacheCollector(Collector):  # pylint: disable=too-few-public-methods
+    """A collector reporting the in-process cache statistics."""
+
+    def collect(self) -> typing.Iterator[
+            CounterMetricFamily | GaugeMetricFamily,
+    ]:
+        """Take a snapshot of the named caches."""
+        lookups = CounterMetricFamily(
+            'chronographer_cache_lookups',
+            'Cache lookups, by cache and result.',
+            labels=('cache', 'result'),
+        )
+        hit_ratio = GaugeMetricFamily(
+            'chronographer_cache_hit_ratio',
+            'Share of the cache lookups served from the cache.',
+            labels=('cache',),
+        )
+        size = GaugeMetricFamily(
+            'chronographer_cache_size',
+            'Entries currently stored in the cache.',
+            labels=('cache',),
+        )
+        for cache_name, cache in iter_named_caches():
+            cache_info = cache.info()
+            lookups_count = cache_info.hits + cache_info.misses
+            lookups.add_metric((cache_name, 'hit'), cache_info.hits)
+            lookups.add_metric((cache_name, 'miss'), cache_info.misses)
+            hit_ratio.add_metric(
+                (cache_name,),
+                cache_info.hits / lookups_count if lookups_count else 0,
+            )
+            size.add_metric((cache_name,), cache_info.currsize)
+
+        yield lookups
+        yield hit_ratio
+        yield size
+
+
+REGISTRY.register(CacheCollector())
@@ -0,0 +1,806 @@
+"""Evaluation of the pull request changes and its reporting."""
+
+import asyncio
+import contextlib
+from datetime import datetime
+import functools
+import logging
+import os
+import re
+
+from octomachinery.app.runtime.context import RUNTIME_CONTEXT
+
+from .caching import LRUCache
+from .change_classifier import (
+    MATCHER_CACHE_SIZE,
+    ChangesClassifier,
+    get_path_filter,
+)
+from .diff_sources import get_pr_changed_files
+from .file_utils import get_chronographer_config, get_towncrier_config
+from .graphql_loader import (
+    CONTEXT_LOADER,
+    GraphQLLoadingError,
+    load_pr_changed_files,
+    load_pr_context,
+)
+from .labels import (
+    LABEL_PROVIDED,
+    LABEL_SKIP,
+)
+from .metrics import (
+    GITHUB_API_SKIPPED_WRITES,
+    PR_CONCLUSIONS,
+    measure_stage,
+)
+from .rate_limiting import OptionalRequestDeferred
+from .reconciliation import (
+    is_check_run_reported,
+    is_label_missing,
+    remember_check_run,
+)
+from .verdicts import (
+    PRVerdict,
+    get_verdict,
+    make_verdict_key,
+    remember_verdict,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+FALLBACK_CHANGE_TYPES = (
+    'bugfix',
+    'doc',
+    'feature',
+    'misc',
+    'removal',
+    'trivial',
+    'vendor',
+)
+"""The change types to expect when towncrier is not importable."""
+
+
+CHECKS_SUMMARY_EPILOGUE_INTRO = """
+Please, refer to the following document for more details on how to
+craft a great change note for inclusion with your pull request:
+"""
+
+_FRAGMENTS_REGEX_CACHE = LRUCache(
+    maxsize=MATCHER_CACHE_SIZE, name='fragments_regex',
+)
+"""Compiled news fragments patterns keyed by the config fingerprint."""
+
+CHECK_RUN_LATENCY_BUDGET = float(
+    os.getenv('CHRONOGRAPHER_CHECK_RUN_LATENCY_BUDGET', '2'),
+)
+"""Seconds to evaluate the PR in before reporting it as in progress."""
+
+
+def get_evaluation_settings(repo_config):
+    """Return the config sections the PR changes are evaluated by."""
+    paths_config = repo_config.get(
+        'paths',
+        {'towncrier-config-filename': None},
+    )
+    enforce_name_key = (
+        'enforce-name' if 'enforce-name' in repo_config
+        else 'enforce_name'
+    )
+    return paths_config, repo_config.get(enforce_name_key, {})
+
+
+def get_configured_labels(repo_config):
+    """Return the skip and the fragment provided label names."""
+    labels_config = repo_config.get('labels', {})
+    return (
+        labels_config.get('skip-changelog', LABEL_SKIP),
+        labels_config.get('fragment-provided', LABEL_PROVIDED),
+    )
+
+
+# pylint: disable=too-many-locals
+async def process_pull_request(event, pull_request):
+    """Evaluate the PR state and report it via Checks API."""
+    # NOTE: The Checks API models take a while to import. Deferring
+    # NOTE: that keeps them out of the Action runs that never get here.
+    # pylint: disable-next=import-outside-toplevel
+    from octomachinery.github.models.checks_api_requests import (
+        NewCheckRequest, UpdateCheckRequest,
+        to_gh_query,
+    )
+
+    event_repository = event.data['repository']
+    repo_slug = event_repository['full_name']
+    check_runs_base_uri = f'/repos/{repo_slug}/check-runs'
+    pr_author = pull_request['user']
+    pr_labels = {label['name'] for label in pull_request['labels']}
+    head_branch = pull_request['head']['ref']
+    head_sha = pull_request['head']['sha']
+    repo_default_branch = event_repository['default_branch']
+
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+
+    repo_config, pr_context = await load_pr_configs(
+        repo_slug=repo_slug,
+        repo_default_branch=repo_default_branch,
+        pull_request=pull_request,
+    )
+    action_hints_config = repo_config.get('action-hints', {})
+    checks_api_name = repo_config.get(
+        'branch-protection-check-name',
+        'Timeline protection',
+    )
+    checks_summary_title_prefix = action_hints_config.get(
+        'check-title-prefix',
+        f'{checks_api_name!s}: ',
+    )
+    check_run_key = repo_slug, head_sha, checks_api_name
+    rerequested = event.data['action'] == 'rerequested'
+
+    checks_summary_epilogue = ''
+
+    inline_markdown = action_hints_config.get('inline-markdown')
+    if inline_markdown is not None:
+        checks_summary_epilogue += '\n'.join(('', '', inline_markdown))
+
+    external_docs_url = action_hints_config.get('external-docs-url')
+    if external_docs_url is not None:
+        checks_summary_epilogue += ''.join((
+            CHECKS_SUMMARY_EPILOGUE_INTRO,
+            external_docs_url,
+        ))
+
+    repo_skip_label, fragment_provided_label = get_configured_labels(
+        repo_config,
+    )
+
+    logger.info(
+        'Checking if `%s` label is present among these PR labels: `%s`.',
+        repo_skip_label,
+        ', '.join(pr_labels) or 'NO LABELS',
+    )
+    if repo_skip_label in pr_labels:
+        logger.info(
+            'Skipping PR event because the `%s` label is present',
+            repo_skip_label,
+        )
+        PR_CONCLUSIONS.labels('neutral').inc()
+        await report_check_run(
+            check_runs_base_uri, check_run_key,
+            head_branch=head_branch,
+            rerequested=rerequested,
+            status='completed',
+            started_at=f'{datetime.utcnow().isoformat()}Z',
+            completed_at=f'{datetime.utcnow().isoformat()}Z',
+            conclusion='neutral',
+            output={
+                'title':
+                    f'{checks_summary_title_prefix!s}'
+                    'Nothing to do — change note not required',
+                'text': f'Labels: {", ".join(sorted(pr_labels))}',
+                'summary':
+                    'Heeeeey!'
+                    '\n\n'
+                    f'This PR has the `{repo_skip_label}` label '
+                    'meaning that the maintainers do not expect a '
+                    'change note in this pull request but you are '
+                    'still welcome to add one if you feel like it may '
+                    'be useful in the user-facing 📝 changelog.'
+                    f'{checks_summary_epilogue!s}',
+            },
+        )
+        return  # Interrupt the webhook event processing
+
+    if is_blacklisted(pr_author, repo_config.get('exclude', {})):
+        logger.info(
+            'Skipping this event because %s is blacklisted',
+            pr_author['login'],
+        )
+        PR_CONCLUSIONS.labels('neutral').inc()
+        await report_check_run(
+            check_runs_base_uri, check_run_key,
+            head_branch=head_branch,
+            rerequested=rerequested,
+            status='completed',
+            started_at=f'{datetime.utcnow().isoformat()}Z',
+            completed_at=f'{datetime.utcnow().isoformat()}Z',
+            conclusion='neutral',
+            output={
+                'title':
+                f'{checks_summary_title_prefix!s}Nothing to do',
+                'text':
+                    'The author of this change '
+                    f"({pr_author['login']!s}) "
+                    'is ignored because it is excluded '
+                    'via the repository config.',
+                'summary':
+                    'Heeeeey!'
+                    "We've got an inclusive and welcoming community "
+                    'here.\n\n'
+                    'All robots 🤖 are welcome to send PRs, '
+                    'no strings attached! '
+                    'This change does not need to be recorded '
+                    'to our chronicles.'
+                    '\n\n'
+                    '![Helloooo!]('
+                    'https://www.goodfreephotos.com/albums'
+                    '/vector-images/blue-robot-vector-art.png)'
+                    f'{checks_summary_epilogue!s}',
+            },
+        )
+        return  # Interrupt the webhook event processing
+
+    paths_config, name_settings = get_evaluation_settings(repo_config)
+
+    started_at = f'{datetime.utcnow().isoformat()}Z'
+    changes_fetch = asyncio.create_task(
+        get_pr_verdict(
+            repo_slug=repo_slug,
+            pull_request=pull_request,
+            paths_config=paths_config,
+            name_settings=name_settings,
+            ref=head_sha or repo_default_branch,
+            pr_context=pr_context,
+        ),
+    )
+    check_runs_updates_uri = None
+    try:
+        await asyncio.wait(
+            {changes_fetch},
+            timeout=CHECK_RUN_LATENCY_BUDGET,
+        )
+        if not changes_fetch.done():
+            logger.info(
+                'The evaluation takes longer than %s seconds, '
+                'reporting it as in progress',
+                CHECK_RUN_LATENCY_BUDGET,
+            )
+            with measure_stage('check_run_write'):
+                resp = await gh_api.post(
+                    check_runs_base_uri,
+                    preview_api_version='antiope',
+                    data=to_gh_query(
+                        NewCheckRequest(
+                            head_branch, head_sha,
+                            name=checks_api_name,
+                            status='in_progress',
+                            started_at=started_at,
+                        ),
+                    ),
+                )
+            logger.info(
+                'Check suite ID is %s',
+                resp['check_suite']['id'],
+            )
+            logger.info(
+                'Check run ID is %s',
+                resp['id'],
+            )
+            check_runs_updates_uri = f'{check_runs_base_uri}/{resp["id"]:d}'
+
+        pr_verdict = await changes_fetch
+    finally:
+        changes_fetch.cancel()
+
+    news_fragments_added = list(pr_verdict.news_fragments_added)
+    news_fragments_required = pr_verdict.news_fragments_required
+    _tc_fragment_re = pr_verdict.fragments_pattern
+
+    if news_fragments_added and is_label_missing(
+            fragment_provided_label, pr_labels,
+    ):
+        labels_url = f'{pull_request["issue_url"]}/labels'
+        try:
+            with measure_stage('label_write'):
+                await gh_api.post(
+                    labels_url,
+                    preview_api_version='symmetra',
+                    data={
+                        'labels': [
+                            fragment_provided_label,
+                        ],
+                    },
+                )
+        except OptionalRequestDeferred as deferred_exc:
+            logger.info(
+                'Not adding the `%s` label: %s',
+                fragment_provided_label, deferred_exc,
+            )
+    elif news_fragments_added and fragment_provided_label is not None:
+        logger.info(
+            'The `%s` label is in place already', fragment_provided_label,
+        )
+        GITHUB_API_SKIPPED_WRITES.labels('label').inc()
+
+    report_success = not news_fragments_required or news_fragments_added
+    news_fragments_listing = ', '.join(
+        news_fragment.path for news_fragment in news_fragments_added
+    )
+    if not pr_verdict.is_diff_complete:
+        news_fragments_listing += (
+            ' and maybe more, the rest of the diff has not been read'
+        )
+
+    check_run_outcome = {
+        'status': 'completed',
+        'conclusion': 'success' if news_fragments_added else
+        'neutral' if not news_fragments_required else 'failure',
+        'completed_at': f'{datetime.utcnow().isoformat()}Z',
+        'output': {
+            # Fragments added
+            'title': f'{checks_summary_title_prefix!s}Good to go',
+            'text':
+                'The following news fragments found: '
+                f'{news_fragments_listing!s}'
+                '\n\n'
+                f'Pattern: {_tc_fragment_re}',
+            'summary':
+                'Great! This change has been recorded to the chronicles'
+                '\n\n'
+                '![You are good at keeping records! '
+                'Image source: Unsplash ID=bByhWydZLW0]'
+                '(https://source.unsplash.com/bByhWydZLW0/1600x500)'
+                f'{checks_summary_epilogue!s}',
+        } if report_success else {
+            # Fragments not added and not required either
+            'title':
+                f'{checks_summary_title_prefix!s}'
+                'Nothing to do — change note not required',
+            'summary':
+                'This PR looks like a release preparation meaning that '
+                'it removes the existing change notes and adds them to '
+                'the user-facing 📝 changelog.'
+                '\n\n'
+                'Normally, such changes do not expect a change notes '
+                'so you do not need to worry about adding one.'
+                f'{checks_summary_epilogue!s}',
+        } if not news_fragments_required else {
+            # Fragments not added but are expected
+            'title':
+                f'{checks_summary_title_prefix!s}'
+                'History fragments missing',
+            'text': f'No files matching {_tc_fragment_re} pattern added',
+            'summary':
+                'Oops... This change does not have a record in the '
+                'archives. Just as if it never happened!'
+                '\n\n'
+                '![Keeping chronicles is important! '
+                'Image source: Unsplash ID=VSE71nAZhU8]'
+                '(https://source.unsplash.com/VSE71nAZhU8/1600x500)'
+                f'{checks_summary_epilogue!s}',
+        },
+    }
+    with measure_stage('check_run_write'):
+        if check_runs_updates_uri is None:
+            # The evaluation has been quick so the check run gets created
+            # right in its final state:
+            await report_check_run(
+                check_runs_base_uri, check_run_key,
+                head_branch=head_branch,
+                rerequested=rerequested,
+                started_at=started_at,
+                **check_run_outcome,
+            )
+        else:
+            await gh_api.patch(
+                check_runs_updates_uri,
+                preview_api_version='antiope',
+                data=to_gh_query(
+                    UpdateCheckRequest(
+                        name=checks_api_name,
+                        **check_run_outcome,
+                    ),
+                ),
+            )
+            remember_check_run(
+                check_run_key,
+                (check_run_outcome['conclusion'], check_run_outcome['output']),
+            )
+    PR_CONCLUSIONS.labels(check_run_outcome['conclusion']).inc()
+
+    logger.info(
+        'Evaluated %s#%d at %s on %s event: '
+        'conclusion=%s changed_files=%d%s news_fragments=%d',
+        repo_slug, pull_request['number'], head_sha, event.event,
+        check_run_outcome['conclusion'], pr_verdict.changed_files_count,
+        '' if pr_verdict.is_diff_complete else '+',
+        len(news_fragments_added),
+        extra={
+            'repo_slug': repo_slug,
+            'pr_number': pull_request['number'],
+            'head_sha': head_sha,
+            'github_event': event.event,
+            'conclusion': check_run_outcome['conclusion'],
+            'changed_files_count': pr_verdict.changed_files_count,
+            'is_diff_complete': pr_verdict.is_diff_complete,
+            'news_fragments_count': len(news_fragments_added),
+        },
+    )
+
+
+async def load_pr_configs(*, repo_slug, repo_default_branch, pull_request):
+    """Load the repository config and the PR context if enabled.
+
+    The PR context is ``None`` unless it's been loaded via GraphQL.
+    """
+    if CONTEXT_LOADER == 'graphql':
+        try:
+            with measure_stage('context_load'):
+                pr_context = await load_pr_context(
+                    repo_slug=repo_slug,
+                    repo_default_branch=repo_default_branch,
+                    pull_request=pull_request,
+                )
+        except GraphQLLoadingError as loading_err:
+            logger.warning(
+                'Falling back to REST API because loading '
+                'the PR context via GraphQL failed: %s',
+                loading_err,
+            )
+        else:
+            return pr_context.repo_config, pr_context
+
+    with measure_stage('config_fetch'):
+        repo_config = await get_chronographer_config(
+            ref=repo_default_branch,
+        )
+    return repo_config, None
+
+
+async def report_check_run(
+        check_runs_base_uri,
+        check_run_key,
+        *,
+        head_branch,
+        rerequested,
+        **check_run_fields,
+):
+    """Create a completed check run unless the latest one is the same.
+
+    The rerequested checks are reported anew regardless.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from octomachinery.github.models.checks_api_requests import (
+        NewCheckRequest,
+        to_gh_query,
+    )
+
+    check_run_state = (
+        check_run_fields['conclusion'], check_run_fields['output'],
+    )
+    repo_slug, head_sha, checks_api_name = check_run_key
+    if not rerequested and is_check_run_reported(
+            check_run_key, check_run_state,
+    ):
+        logger.info(
+            'The `%s` check run of %s at %s is up to date already',
+            checks_api_name, repo_slug, head_sha,
+        )
+        GITHUB_API_SKIPPED_WRITES.labels('check_run').inc()
+        return
+
+    gh_api = RUNTIME_CONTEXT.app_installation_client
+    await gh_api.post(
+        check_runs_base_uri,
+        preview_api_version='antiope',
+        data=to_gh_query(
+            NewCheckRequest(
+                head_branch, head_sha,
+                name=checks_api_name,
+                **check_run_fields,
+            ),
+        ),
+    )
+    remember_check_run(check_run_key, check_run_state)
+
+
+async def get_pr_verdict(  # pylint: disable=too-many-arguments
+        *,
+        repo_slug,
+        pull_request,
+        paths_config,
+        name_settings,
+        ref,
+        pr_context=None,
+):
+    """Evaluate the PR changes unless it's been done before.
+
+    The verdicts are remembered by the head and base commits and the
+    config so that the repeated events for the same PR state, like
+    rerequested checks or the skip label removal, don't fetch the diff
+    again.
+    """
+    verdict_key = make_verdict_key(
+        repo_slug=repo_slug,
+        pull_request=pull_request,
+        paths_config=paths_config,
+        name_settings=name_settings,
+    )
+    pr_verdict = get_verdict(verdict_key)
+    if pr_verdict is not None:
+        logger.info(
+            'Reusing the verdict reached for %s#%d at %s before',
+            repo_slug, pull_request['number'], pull_request['head']['sha'],
+        )
+        return pr_verdict
+
+    (
+        towncrier_config, tc_fragment_re, diff, is_diff_complete,
+    ) = await fetch_pr_changes(
+        repo_slug=repo_slug,
+        pull_request=pull_request,
+        paths_config=paths_config,
+        name_settings=name_settings,
+        ref=ref,
+        pr_context=pr_context,
+    )
+    with measure_stage('evaluate'):
+        news_fragments_added, news_fragments_required = evaluate_pr_changes(
+            diff,
+            tc_fragment_re,
+            paths_config,
+            towncrier_config=towncrier_config,
+        )
+
+    pr_verdict = PRVerdict(
+        news_fragments_added=tuple(news_fragments_added),
+        news_fragments_required=news_fragments_required,
+        fragments_pattern=tc_fragment_re,
+        changed_files_count=len(diff),
+        is_diff_complete=is_diff_complete,
+    )
+    remember_verdict(verdict_key, pr_verdict)
+    return pr_verdict
+
+
+async def fetch_pr_changes(  # pylint: disable=too-many-arguments
+        *,
+        repo_slug,
+        pull_request,
+        paths_config,
+        name_settings,
+        ref,
+        pr_context=None,
+):
+    """Retrieve the towncrier config and the PR diff concurrently.
+
+    Return the towncrier config, the news fragments pattern derived
+    from it, the changed files and whether they are all of them. The
+    diff download starts right away and only waits for the pattern
+    before reading the changes, stopping once the verdict is reached.
+    If either of the requests fails, the other one gets cancelled.
+
+    The configs preloaded into ``pr_context`` aren't requested again
+    and the changed files are then listed via GraphQL too.
+    """
+    towncrier_config_filename = paths_config.get(
+        'towncrier-config-filename',
+        None,
+    )
+
+    async def get_fragments_pattern():
+        towncrier_config = None
+        if pr_context is not None:
+            with contextlib.suppress(LookupError):
+                towncrier_config = pr_context.get_towncrier_config(
+                    towncrier_config_filename,
+                ) or {}
+        if towncrier_config is None:
+            with measure_stage('towncrier_config_fetch'):
+                towncrier_config = await get_towncrier_config(
+                    towncrier_config_filename=towncrier_config_filename,
+                    ref=ref,
+                ) or {}
+        tc_fragment_re = await compile_towncrier_fragments_regex(
+            name_settings=name_settings,
+            towncrier_config=towncrier_config,
+        )
+        return towncrier_config, tc_fragment_re
+
+    is_diff_complete = True
+
+    async def get_verdict_tracker():
+        towncrier_config, tc_fragment_re = await fragments_pattern_fetch
+        is_verdict_reached = make_verdict_tracker(
+            tc_fragment_re, paths_config, towncrier_config,
+        )
+
+        def track_verdict(file_entry):
+            nonlocal is_diff_complete
+            is_diff_complete = not is_verdict_reached(file_entry)
+            return not is_diff_complete
+
+        return track_verdict
+
+    async def get_changed_files():
+        if pr_context is not None:
+            try:
+                with measure_stage('diff_fetch'):
+                    return await load_pr_changed_files(
+                        repo_slug=repo_slug,
+                        pull_request=pull_request,
+                    )
+            except GraphQLLoadingError as loading_err:
+                logger.warning(
+                    'Falling back to REST API because listing '
+                    'the PR files via GraphQL failed: %s',
+                    loading_err,
+                )
+
+        with measure_stage('diff_fetch'):
+            return await get_pr_changed_files(
+                repo_slug=repo_slug,
+                pull_request=pull_request,
+                is_verdict_reached=fetch_stage.create_task(
+                    get_verdict_tracker(),
+                ),
+            )
+
+    async with asyncio.TaskGroup() as fetch_stage:
+        fragments_pattern_fetch = fetch_stage.create_task(
+            get_fragments_pattern(),
+        )
+        diff_fetch = fetch_stage.create_task(get_changed_files())
+
+    towncrier_config, tc_fragment_re = fragments_pattern_fetch.result()
+    diff = diff_fetch.result()
+    # NOTE: The entry reaching the verdict may happen to be the last one
+    # NOTE: which is only known when the event tells the files count.
+    is_diff_complete = is_diff_complete or (
+        len(diff) == pull_request.get('changed_files')
+    )
+    return towncrier_config, tc_fragment_re, diff, is_diff_complete
+
+
+def evaluate_pr_changes(diff, tc_fragment_re, config_paths, towncrier_config):
+    """Check whether the PR changes need and have change notes.
+
+    Return the added news fragments and whether they are required.
+    """
+    pr_changes = ChangesClassifier(
+        tc_fragment_re=tc_fragment_re,
+        config_paths=config_paths,
+        towncrier_config=towncrier_config,
+    ).classify(diff)
+    logger.info(
+        'News fragments are %s',
+        'present' if pr_changes.news_fragments_added
+        else 'absent',
+    )
+
+    return (
+        pr_changes.news_fragments_added,
+        pr_changes.news_fragments_required,
+    )
+
+
+async def compile_towncrier_fragments_regex(name_settings, towncrier_config):
+    """Create fragments check regex based on the towncrier config."""
+    fallback_base_dir = 'news'
+
+    # e.g. ``.rst``:
+    fragment_filename_suffix = re.escape(name_settings.get('suffix', ''))
+
+    base_dir = (
+        towncrier_config.get('directory', '').rstrip('/')
+        or fallback_base_dir
+    )
+    change_types = (
+        tuple(t['directory'] for t in towncrier_config.get('type', ()))
+        or get_default_change_types()
+    )
+
+    return _compile_fragments_regex(
+        base_dir, change_types, fragment_filename_suffix,
+    )
+
+
+@functools.cache
+def get_default_change_types():
+    """Return the change types towncrier expects unless told otherwise.
+
+    Importing towncrier takes a noticeable share of the Action startup
+    time so it's only done once a config without custom types shows up.
+    """
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        from towncrier._settings import _default_types
+    except ImportError:
+        return FALLBACK_CHANGE_TYPES
+
+    return tuple(_default_types)
+
+
+def _compile_fragments_regex(base_dir, change_types, fragment_filename_suffix):
+    """Compile the fragments regex once per config fingerprint."""
+    config_fingerprint = base_dir, change_types, fragment_filename_suffix
+    tc_fragment_re = _FRAGMENTS_REGEX_CACHE.get(config_fingerprint)
+    if tc_fragment_re is not None:
+        return tc_fragment_re
+
+    # Ref:
+    # * github.com/hawkowl/towncrier/blob/ecd438c/src/towncrier/_builder.py#L58
+    tc_fragment_re = _FRAGMENTS_REGEX_CACHE[config_fingerprint] = re.compile(
+        (
+            r'{base_dir}/{file_pattern}'
+            r'(?P<fragment_type>{fragment_types})'
+            r'{number_pattern}'
+            r'{suffix_pattern}'
+            r'{postfix_pattern}'
+            r'$'
+        ).format(
+            base_dir=base_dir,
+            file_pattern=r'(?P<issue_number>[^\./]+)\.',  # should we enforce?
+            fragment_types=r'|'.join(change_types),
+            number_pattern=r'(\.\d+)?',  # better be a number
+            suffix_pattern=r'(\.[^\./]+)*',
+            postfix_pattern=fragment_filename_suffix,
+        ),
+    )
+    return tc_fragment_re
+
+
+def is_blacklisted(actor, blacklist):
+    """Find out if the given actor is blacklisted."""
+    bot_suffix_length = 5
+    username = actor['login']
+    blacklist_bots = blacklist.get('bots', True)
+    if blacklist_bots and actor['type'] == 'Bot':
+        username = username[:-bot_suffix_length]  # Strip off ``[bot]`` suffix
+        try:
+            return username in blacklist_bots
+        except TypeError:
+            return True
+
+    blacklist_humans = blacklist.get('humans', False)
+    if blacklist_humans and actor['type'] == 'User':
+        try:
+            return username in blacklist_humans
+        except TypeError:
+            return True
+
+    return False
+
+
+def is_a_release_pr(diff, tc_fragment_re, towncrier_config):
+    """Detect whether the current PR is a release.
+
+    The heuristic is simply checking if the PR has additions to the
+    changelog file combined with removal of the old change fragments.
+    """
+    return ChangesClassifier(
+        tc_fragment_re=tc_fragment_re,
+        config_paths={},
+        towncrier_config=towncrier_config,
+    ).classify(diff).is_release
+
+
+def is_changelog_relevant(path, config_paths):
+    """Check whether changing the path calls for a change note."""
+    return get_path_filter(config_paths).is_relevant(path)
+
+
+def make_verdict_tracker(tc_fragment_re, config_paths, towncrier_config):
+    """Make a diff entries callback telling when the outcome is known."""
+    pr_changes = ChangesClassifier(
+        tc_fragment_re=tc_fragment_re,
+        config_paths=config_paths,
+        towncrier_config=towncrier_config,
+    )
+
+    def is_verdict_reached(file_entry):
+        pr_changes.add(file_entry)
+        return pr_changes.is_verdict_reached
+
+    return is_verdict_reached
+
+
+def requires_changelog(diff, tc_fragment_re, config_paths, towncrier_config):
+    """Check whether a changelog fragment is needed for the changes."""
+    return ChangesClassifier(
+        tc_fragment_re=tc_fragment_re,
+        config_paths=config_paths,
+        towncrier_config=towncrier_config,
+    ).classify(diff).news_fragments_required
@@ -0,0 +1,282 @@
+"""Pacing of the GitHub API requests within the installation quotas."""
+
+import asyncio
+import contextlib
+import enum
+from http import HTTPStatus
+import logging
+import os
+import time
+import typing
+
+import attr
+from yarl import URL
+
+from octomachinery.github.api.raw_client import RawGitHubAPI
+
+from .caching import LRUCache
+from .metrics import GITHUB_API_DEFERRED_REQUESTS, GITHUB_API_THROTTLING
+
+
+logger = logging.getLogger(__name__)
+
+
+RATE_LIMIT_RESERVE = int(os.getenv('CHRONOGRAPHER_RATE_LIMIT_RESERVE', '50'))
+"""Requests of each quota kept for reporting the check run outcomes."""
+
+RATE_LIMIT_PACING_THRESHOLD = float(
+    os.getenv('CHRONOGRAPHER_RATE_LIMIT_PACING_THRESHOLD', '0.2'),
+)
+"""The share of the quota left below which the requests are spread out."""
+
+RATE_LIMIT_MAX_WAIT = float(
+    os.getenv('CHRONOGRAPHER_RATE_LIMIT_MAX_WAIT', '60'),
+)
+"""Seconds to hold a request back for before checking the quota again."""
+
+RATE_LIMITED_RETRIES = 3
+"""How many times to repeat the requests rejected by the rate limits."""
+
+_RATE_LIMITED_STATUSES = frozenset({
+    HTTPStatus.FORBIDDEN,
+    HTTPStatus.TOO_MANY_REQUESTS,
+})
+"""Response statuses GitHub reports the rate limit violations with."""
+
+
+class RequestPriority(enum.IntEnum):
+    """How important it is for a request to get through."""
+
+    OPTIONAL = enum.auto()
+    """Nice to have but fine to skip, like adding labels."""
+    NORMAL = enum.auto()
+    """Needed for the evaluation to complete."""
+    CRITICAL = enum.auto()
+    """Reporting the outcome, allowed to spend the reserved quota."""
+
+
+class OptionalRequestDeferred(RuntimeError):
+    """An optional request has been skipped to save the quota."""
+
+
+def get_request_priority(method: str, url: str) -> RequestPriority:
+    """Tell how important the request is by its endpoint."""
+    path = URL(url).path
+    if method == 'GET':
+        return RequestPriority.NORMAL
+    # NOTE: pylint infers the `yarl.URL.path` cached property wrongly.
+    if '/check-runs' in path:  # pylint: disable=unsupported-membership-test
+        return RequestPriority.CRITICAL
+    if path.endswith('/labels'):
+        return RequestPriority.OPTIONAL
+    return RequestPriority.NORMAL
+
+
+def _get_rate_limit_resource(url: str) -> str:
+    """Tell which quota the request to the URL is counted against."""
+    return 'graphql' if URL(url).path.endswith('/graphql') else 'core'
+
+
+@attr.dataclass
+class _Quota:  # pylint: disable=too-few-public-methods
+    """The state of a rate limit resource as last reported by GitHub."""
+
+    limit: int
+    """Requests allowed within the window."""
+    remaining: int
+    """Requests left until the window resets."""
+    resets_at: float
+    """The Unix time of the window reset."""
+    next_slot_at: float = 0
+    """The Unix time the next paced request may be sent at."""
+
+
+class InstallationRateLimiter:
+    """The rate limits of an installation, shared by its clients.
+
+    The quotas are learned from the ``X-RateLimit-*`` response headers.
+    Once less than :data:`RATE_LIMIT_PACING_THRESHOLD` of a quota is
+    left, the requests are spaced evenly over the rest of the window,
+    keeping :data:`RATE_LIMIT_RESERVE` requests for the check run
+    writes. The optional requests are skipped at that point. The
+    ``Retry-After`` of the secondary rate limits holds everything back.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a limiter knowing nothing about the quotas yet."""
+        self._quotas: dict[str, _Quota] = {}
+        self._retry_at = 0.0
+
+    def update(
+            self,
+            resource: str,
+            status: int,
+            headers: typing.Mapping[str, str],
+    ) -> None:
+        """Learn the state of the quotas from an API response."""
+        with contextlib.suppress(KeyError, ValueError):
+            resource = headers.get('X-RateLimit-Resource', resource)
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            resets_at = float(headers['X-RateLimit-Reset'])
+            quota = self._quotas.get(resource)
+            if quota is None or quota.resets_at != resets_at:
+                self._quotas[resource] = _Quota(limit, remaining, resets_at)
+            else:
+                quota.remaining = min(quota.remaining, remaining)
+
+        if status in _RATE_LIMITED_STATUSES:
+            with contextlib.suppress(KeyError, ValueError):
+                self._retry_at = max(
+                    self._retry_at,
+                    time.time() + float(headers['Retry-After']),
+                )
+
+    async def acquire(self, resource: str, priority: RequestPriority) -> None:
+        """Wait until a request may be sent.
+
+        The quotas are checked again every :data:`RATE_LIMIT_MAX_WAIT`
+        seconds at most until the request is let through. Raise
+        :exc:`OptionalRequestDeferred` if an optional one should not be
+        sent at all.
+        """
+        while True:
+            delay, reason = self._get_delay(resource, priority)
+            if reason == 'deferred':
+                GITHUB_API_DEFERRED_REQUESTS.labels(resource).inc()
+                raise OptionalRequestDeferred(
+                    f'Only {self._quotas[resource].remaining} requests are '
+                    f'left in the {resource} quota',
+                )
+
+            if delay <= 0:
+                break
+
+            delay = min(delay, RATE_LIMIT_MAX_WAIT)
+            logger.info(
+                'Holding a %s request back for %.2fs (%s)',
+                priority.name.lower(), delay, reason,
+            )
+            GITHUB_API_THROTTLING.labels(resource, reason).inc(delay)
+            await asyncio.sleep(delay)
+
+        quota = self._quotas.get(resource)
+        if quota is not None:
+            quota.remaining -= 1
+
+    def _get_delay(
+            self,
+            resource: str,
+            priority: RequestPriority,
+    ) -> tuple[float, str | None]:
+        """Compute how long to hold a request back for and why.
+
+        A zero delay lets the request through, taking the paced slot.
+        """
+        now = time.time()
+        quota = self._quotas.get(resource)
+        if quota is not None and quota.resets_at <= now:
+            quota = None  # The window has reset since it's been reported
+
+        is_paced = (
+            quota is not None
+            and priority is not RequestPriority.CRITICAL
+            and quota.remaining <= quota.limit * RATE_LIMIT_PACING_THRESHOLD
+        )
+        delay, reason = 0, None
+        if self._retry_at > now:
+            delay, reason = self._retry_at - now, 'retry_after'
+        elif quota is not None and quota.remaining <= 0:
+            delay, reason = quota.resets_at - now, 'exhausted'
+        elif is_paced and priority is RequestPriority.OPTIONAL:
+            reason = 'deferred'
+        elif is_paced and quota.remaining <= RATE_LIMIT_RESERVE:
+            delay, reason = quota.resets_at - now, 'reserve'
+        elif is_paced and quota.next_slot_at > now:
+            delay, reason = quota.next_slot_at - now, 'pacing'
+        elif is_paced:
+            # NOTE: The request takes the free slot, pushing the next
+            # NOTE: one further so that the rest of the quota lasts
+            # NOTE: until the window resets.
+            quota.next_slot_at = now + (
+                (quota.resets_at - now)
+                / (quota.remaining - RATE_LIMIT_RESERVE)
+            )
+
+        return delay, reason
+
+
+RATE_LIMITERS_TO_REMEMBER = 1024
+"""How many installations to keep the learned quotas of."""
+
+# NOTE: The limiters are shared by the clients of this process so they
+# NOTE: are never stored in the cross-process cache.
+_RATE_LIMITERS = LRUCache(maxsize=RATE_LIMITERS_TO_REMEMBER)
+"""The rate limiters of the installations seen, keyed by their IDs."""
+
+
+def get_rate_limiter(installation_id: int) -> InstallationRateLimiter:
+    """Return the rate limiter of the installation."""
+    rate_limiter = _RATE_LIMITERS.get(installation_id)
+    if rate_limiter is None:
+        rate_limiter = InstallationRateLimiter()
+        _RATE_LIMITERS[installation_id] = rate_limiter
+
+    return rate_limiter
+
+
+def _is_rate_limited(
+        status: int,
+        headers: typing.Mapping[str, str],
+) -> bool:
+    """Check whether the response is a rate limit violation."""
+    return status in _RATE_LIMITED_STATUSES and (
+        'Retry-After' in headers
+        or headers.get('X-RateLimit-Remaining') == '0'
+    )
+
+
+class RateLimitedGitHubAPI(RawGitHubAPI):
+    """An installation client pacing the requests within the quotas.
+
+    The requests rejected due to the rate limits are repeated once the
+    limiter lets them through again.
+    """
+
+    def __init__(
+            self,
+            *args: typing.Any,
+            rate_limiter: InstallationRateLimiter,
+            **kwargs: typing.Any,
+    ) -> None:
+        """Initialize a client sharing the installation rate limiter."""
+        self._rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+
+    async def _request(
+            self,
+            method: str,
+            url: str,
+            headers: typing.Mapping[str, str],
+            body: bytes = b'',
+    ) -> tuple[int, typing.Mapping[str, str], bytes]:
+        """Send the request once the quota allows it."""
+        resource = _get_rate_limit_resource(url)
+        priority = get_request_priority(method, url)
+        for attempt in range(RATE_LIMITED_RETRIES + 1):
+            await self._rate_limiter.acquire(resource, priority)
+            status, response_headers, response_body = await super()._request(
+                method, url, headers, body,
+            )
+            self._rate_limiter.update(resource, status, response_headers)
+            if attempt == RATE_LIMITED_RETRIES or not _is_rate_limited(
+                    status, response_headers,
+            ):
+                break
+
+            logger.warning(
+                'GitHub rejected %s %s due to the rate limits, retrying',
+                method, url,
+            )
+
+        return status, response_headers, response_body
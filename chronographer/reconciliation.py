@@ -0,0 +1,46 @@
+"""Tracking of the state reported to GitHub to skip redundant writes."""
+
+import typing
+
+from .caching import make_cache
+
+
+CHECK_RUNS_TO_REMEMBER = 10_000
+"""How many check run outcomes reported recently to keep track of."""
+
+_REPORTED_CHECK_RUNS = make_cache(
+    maxsize=CHECK_RUNS_TO_REMEMBER,
+    name='reported_check_runs',
+)
+"""The last check run outcomes reported, keyed by the commit and name."""
+
+
+CheckRunKey = tuple[str, str, str]
+"""The repository, the head commit and the name of a check run."""
+
+CheckRunState = tuple[str, typing.Mapping[str, str]]
+"""The conclusion and the output of a completed check run."""
+
+
+def is_label_missing(
+        label: str | None,
+        pr_labels: typing.AbstractSet[str],
+) -> bool:
+    """Check whether the label is enabled but not on the PR yet."""
+    return label is not None and label not in pr_labels
+
+
+def is_check_run_reported(
+        check_run_key: CheckRunKey,
+        check_run_state: CheckRunState,
+) -> bool:
+    """Check whether the latest check run already has this outcome."""
+    return _REPORTED_CHECK_RUNS.get(check_run_key) == check_run_state
+
+
+def remember_check_run(
+        check_run_key: CheckRunKey,
+        check_run_state: CheckRunState,
+) -> None:
+    """Record the outcome of the check run just reported."""
+    _REPORTED_CHECK_RUNS.set(check_run_key, check_run_state)
@@ -0,0 +1,116 @@
+"""Helpers for scheduling the event processing."""
+
+import asyncio
+import logging
+import typing
+
+import attr
+
+
+logger = logging.getLogger(__name__)
+
+
+@attr.dataclass
+class _Evaluation:  # pylint: disable=too-few-public-methods
+    """A scheduled evaluation of the pull request state."""
+
+    head_sha: str
+    """The PR head commit the evaluation is for."""
+    task: asyncio.Task | None = None
+    """The task running the evaluation."""
+    is_started: bool = False
+    """Whether the evaluation made it past the debouncing window."""
+    predecessor: '_Evaluation | None' = None
+    """The last started evaluation of the PR to wait for."""
+
+
+class CoalescingScheduler:  # pylint: disable=too-few-public-methods
+    """A scheduler running only the newest evaluation of each PR.
+
+    Each submission waits for ``debounce_window`` seconds so that the
+    bursts of events hitting the same key get squashed into the most
+    recent one. Evaluations that are still waiting are dropped when
+    superseded. Those already running are cancelled if the newer
+    submission is for a different head commit and are waited for
+    otherwise, so no two evaluations of the same key ever overlap.
+    """
+
+    def __init__(self, *, debounce_window: float) -> None:
+        """Initialize a scheduler with no evaluations."""
+        self._debounce_window = debounce_window
+        self._evaluations: dict[typing.Hashable, _Evaluation] = {}
+
+    async def run_coalesced(
+            self,
+            key: typing.Hashable,
+            head_sha: str,
+            evaluate: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ) -> typing.Any:
+        """Run the evaluation unless it gets superseded in the meantime.
+
+        Return ``None`` if it does.
+        """
+        previous_evaluation = self._evaluations.get(key)
+        # NOTE: A pending evaluation superseded by this one never runs,
+        # NOTE: so the one to wait for is the one it was waiting for.
+        running_evaluation = (
+            previous_evaluation
+            if previous_evaluation is None or previous_evaluation.is_started
+            else previous_evaluation.predecessor
+        )
+        evaluation = _Evaluation(
+            head_sha=head_sha,
+            predecessor=running_evaluation,
+        )
+        evaluation.task = asyncio.create_task(
+            self._debounce_and_evaluate(evaluation, evaluate),
+        )
+        self._evaluations[key] = evaluation
+
+        if previous_evaluation is not None and (
+                not previous_evaluation.is_started
+        ):
+            logger.info(
+                'Cancelling the pending evaluation of %s for %s '
+                'superseded by the one for %s',
+                key, previous_evaluation.head_sha, head_sha,
+            )
+            previous_evaluation.task.cancel()
+
+        if running_evaluation is not None and (
+                running_evaluation.head_sha != head_sha
+        ):
+            logger.info(
+                'Cancelling the running evaluation of %s for %s '
+                'superseded by the one for %s',
+                key, running_evaluation.head_sha, head_sha,
+            )
+            running_evaluation.task.cancel()
+
+        try:
+            await asyncio.wait({evaluation.task})
+        finally:
+            evaluation.task.cancel()
+            if self._evaluations.get(key) is evaluation:
+                del self._evaluations[key]
+
+        if evaluation.task.cancelled():
+            return None
+
+        return evaluation.task.result()
+
+    async def _debounce_and_evaluate(
+            self,
+            evaluation: _Evaluation,
+            evaluate: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ) -> typing.Any:
+        """Wait for the burst to settle and evaluate."""
+        await asyncio.sleep(self._debounce_window)
+
+        if evaluation.predecessor is not None:
+            # The previous evaluation is still running or cancelling:
+            await asyncio.wait({evaluation.predecessor.task})
+            evaluation.predecessor = None
+
+        evaluation.is_started = True
+        return await evaluate()
@@ -0,0 +1,274 @@
+"""The web server receiving webhooks and exposing the metrics."""
+
+import asyncio
+import contextlib
+import functools
+from http import HTTPStatus
+import logging
+import signal
+import sys
+import typing
+
+import anyio
+from aiohttp import web
+import attr
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from octomachinery.app.config import BotAppConfig
+from octomachinery.app.routing import WEBHOOK_EVENTS_ROUTER
+from octomachinery.app.routing.webhooks_dispatcher import (
+    get_event_from_request,
+    route_github_webhook_event,
+)
+from octomachinery.app.server.config import WebServerConfig
+from octomachinery.app.server.machinery import (
+    log_webhook_secret_status,
+    start_tcp_site,
+)
+from octomachinery.utils.asynctools import auto_cleanup_aio_tasks
+
+from .github_app import GitHubApp, make_http_session
+from .metrics import WEBHOOK_EVENTS
+from .webhook_queue import (
+    WebhookQueue,
+    WebhookQueueFull,
+    running_webhook_queue,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+KNOWN_WEBHOOK_EVENTS = frozenset({
+    'check_run',
+    'check_suite',
+    'installation',
+    'installation_repositories',
+    'integration_installation',
+    'ping',
+    'pull_request',
+    'push',
+})
+"""The event names the metrics tell apart, the others being ``unknown``."""
+
+
+async def handle_metrics(_request: web.Request) -> web.Response:
+    """Render the metrics in the Prometheus text format."""
+    return web.Response(
+        body=generate_latest(),
+        headers={'Content-Type': CONTENT_TYPE_LATEST},
+    )
+
+
+async def handle_webhook(
+        request: web.Request,
+        *,
+        github_app: GitHubApp,
+        webhook_secret: str | None,
+        webhook_queue: WebhookQueue | None,
+) -> web.StreamResponse:
+    """Pass the webhook on to the queue or the octomachinery dispatcher."""
+    event_name = request.headers.get('X-GitHub-Event', 'unknown')
+    response_status = HTTPStatus.INTERNAL_SERVER_ERROR
+    try:
+        response = await (
+            # NOTE: The dispatcher decorators turn the request into the
+            # NOTE: event argument, which pylint doesn't follow.
+            # pylint: disable-next=missing-kwoa,too-many-function-args
+            route_github_webhook_event(
+                request,
+                github_app=github_app,
+                webhook_secret=webhook_secret,
+            ) if webhook_queue is None
+            else enqueue_webhook_event(
+                request,
+                webhook_queue=webhook_queue,
+                webhook_secret=webhook_secret,
+            )
+        )
+        response_status = response.status
+    except web.HTTPException as http_exc:
+        response_status = http_exc.status
+        raise
+    finally:
+        # NOTE: The event name header isn't trusted until the signature
+        # NOTE: is verified. Bounding it keeps the arbitrary values from
+        # NOTE: creating new metrics series.
+        is_event_name_reportable = (
+            event_name in KNOWN_WEBHOOK_EVENTS
+            and response_status != HTTPStatus.FORBIDDEN
+        )
+        WEBHOOK_EVENTS.labels(
+            event_name if is_event_name_reportable else 'unknown',
+            int(response_status),
+        ).inc()
+
+    return response
+
+
+async def enqueue_webhook_event(
+        request: web.Request,
+        *,
+        webhook_queue: WebhookQueue,
+        webhook_secret: str | None,
+) -> web.Response:
+    """Acknowledge a valid webhook event once it's been queued."""
+    github_event = await get_event_from_request(request, webhook_secret)
+    try:
+        is_enqueued = webhook_queue.submit(github_event)
+    except WebhookQueueFull as queue_full_exc:
+        logger.warning(
+            'Rejecting the delivery %s: %s',
+            github_event.delivery_id, queue_full_exc,
+        )
+        raise web.HTTPServiceUnavailable(
+            text='The webhook event queue is full, try again later',
+        ) from queue_full_exc
+
+    return web.Response(
+        text='OK: GitHub event queued for processing'
+        if is_enqueued
+        else 'OK: GitHub event has already been received',
+    )
+
+
+def make_web_app(
+        github_app: GitHubApp,
+        webhook_secret: str | None = None,
+        webhook_queue: WebhookQueue | None = None,
+) -> web.Application:
+    """Route the metrics endpoint and the webhooks on any other path."""
+    web_app = web.Application()
+    web_app.router.add_get('/metrics', handle_metrics)
+    web_app.router.add_post(
+        '/{webhook_path:.*}',
+        functools.partial(
+            handle_webhook,
+            github_app=github_app,
+            webhook_secret=webhook_secret,
+            webhook_queue=webhook_queue,
+        ),
+    )
+    return web_app
+
+
+async def wait_for_shutdown_signal() -> None:
+    """Wait until the process is asked to terminate.
+
+    Only the first signal is intercepted so that repeating it still
+    interrupts the app right away.
+    """
+    shutdown_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    shutdown_signals = signal.SIGINT, signal.SIGTERM
+    for signal_number in shutdown_signals:
+        loop.add_signal_handler(signal_number, shutdown_requested.set)
+    try:
+        await shutdown_requested.wait()
+    finally:
+        for signal_number in shutdown_signals:
+            loop.remove_signal_handler(signal_number)
+
+
+async def build_web_app(
+        config: BotAppConfig,
+        event_routers: typing.Iterable[typing.Any],
+) -> web.Application:
+    """Bring up the GitHub App and make the web app serving it.
+
+    The webhook queue is drained and the HTTP client session is closed
+    on the web app cleanup, once it's stopped accepting requests.
+    """
+    log_webhook_secret_status(config.github.webhook_secret)
+    async with contextlib.AsyncExitStack() as exit_stack:
+        aiohttp_client_session = await exit_stack.enter_async_context(
+            make_http_session(),
+        )
+        github_app = GitHubApp(
+            config.github,
+            http_session=aiohttp_client_session,
+            event_routers=event_routers,
+        )
+        await github_app.log_installs_list()
+
+        webhook_queue = await exit_stack.enter_async_context(
+            running_webhook_queue(github_app),
+        )
+        web_app = make_web_app(
+            github_app,
+            config.github.webhook_secret,
+            webhook_queue,
+        )
+
+        web_app_resources = exit_stack.pop_all()
+
+    async def release_resources(_web_app: web.Application) -> None:
+        await web_app_resources.aclose()
+
+    web_app.on_cleanup.append(release_resources)
+    return web_app
+
+
+@auto_cleanup_aio_tasks
+async def run_forever(
+        config: BotAppConfig,
+        event_routers: typing.Iterable[typing.Any],
+) -> None:
+    """Serve the web app until asked to stop."""
+    aiohttp_server_runner = web.AppRunner(
+        await build_web_app(config, event_routers),
+    )
+    await aiohttp_server_runner.setup()
+    await start_tcp_site(config.server, aiohttp_server_runner)
+    try:
+        await wait_for_shutdown_signal()
+    finally:
+        logger.info(' Stopping the server '.center(50, '='))
+        await aiohttp_server_runner.cleanup()
+
+
+def load_config(*, name: str, version: str, url: str) -> BotAppConfig:
+    """Read the app config from the environment and set up logging."""
+    config = BotAppConfig.from_dotenv(
+        app_name=name,
+        app_version=version,
+        app_url=url,
+    )
+
+    logging.basicConfig(
+        level=logging.DEBUG
+        if config.runtime.debug  # pylint: disable=no-member
+        else logging.INFO,
+    )
+    return config
+
+
+async def build_server(
+        *,
+        name: str,
+        version: str,
+        url: str,
+) -> web.Application:
+    """Make the web app for ``aiohttp.GunicornWebWorker`` to serve.
+
+    Each gunicorn worker process builds its own web app, listening on
+    the socket gunicorn has bound.
+    """
+    return await build_web_app(
+        load_config(name=name, version=version, url=url),
+        {WEBHOOK_EVENTS_ROUTER},
+    )
+
+
+def run(*, name: str, version: str, url: str) -> None:
+    """Start up a server using CLI args for host and port."""
+    config = load_config(name=name, version=version, url=url)
+    if len(sys.argv) > 2:
+        config = attr.evolve(
+            config,
+            server=WebServerConfig(*sys.argv[1:3]),
+        )
+
+    with contextlib.suppress(KeyboardInterrupt):
+        anyio.run(run_forever, config, {WEBHOOK_EVENTS_ROUTER})
+    logger.info(' Exiting the app '.center(50, '='))
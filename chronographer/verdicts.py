@@ -0,0 +1,81 @@
+"""Memoized outcomes of the pull request changes evaluation."""
+
+import hashlib
+import json
+import os
+import re
+import typing
+
+import attr
+
+from .caching import make_cache
+from .diff_sources import FileEntry
+
+
+VERDICT_CACHE_SIZE = int(os.getenv('CHRONOGRAPHER_VERDICT_CACHE_SIZE', '4096'))
+"""How many pull request evaluation outcomes to remember."""
+
+_VERDICTS_FORMAT = 2
+"""The evaluation logic revision, bumped to disregard older verdicts."""
+
+_VERDICT_CACHE = make_cache(maxsize=VERDICT_CACHE_SIZE, name='verdicts')
+"""The evaluation outcomes keyed by the commits and the config."""
+
+
+@attr.dataclass(frozen=True)
+class PRVerdict:  # pylint: disable=too-few-public-methods
+    """The outcome of evaluating the changes of a pull request."""
+
+    news_fragments_added: tuple[FileEntry, ...]
+    """The news fragments the PR adds."""
+    news_fragments_required: bool
+    """Whether the PR needs a news fragment."""
+    fragments_pattern: re.Pattern
+    """The pattern the news fragments have been looked up by."""
+    changed_files_count: int
+    """How many changed files have been looked at."""
+    is_diff_complete: bool
+    """Whether all the changed files have been looked at."""
+
+
+VerdictKey = tuple[int, str, str, str, str]
+"""The commits and config fingerprint identifying a verdict."""
+
+
+def make_verdict_key(
+        *,
+        repo_slug: str,
+        pull_request: typing.Mapping[str, typing.Any],
+        paths_config: typing.Mapping[str, typing.Any],
+        name_settings: typing.Mapping[str, typing.Any],
+) -> VerdictKey:
+    """Identify the verdict on the PR state.
+
+    The outcome only depends on the head and base commits and on the
+    repository config sections the evaluation reads. The towncrier
+    config comes from the head commit so it's covered by its SHA.
+    """
+    config_fingerprint = hashlib.sha256(
+        json.dumps(
+            [paths_config, name_settings],
+            sort_keys=True,
+            default=str,
+        ).encode(),
+    ).hexdigest()
+    return (
+        _VERDICTS_FORMAT,
+        repo_slug,
+        pull_request['head']['sha'],
+        pull_request['base']['sha'],
+        config_fingerprint,
+    )
+
+
+def get_verdict(verdict_key: VerdictKey) -> PRVerdict | None:
+    """Look up a verdict reached before."""
+    return _VERDICT_CACHE.get(verdict_key)
+
+
+def remember_verdict(verdict_key: VerdictKey, verdict: PRVerdict) -> None:
+    """Store the verdict for the repeated evaluations to reuse."""
+    _VERDICT_CACHE.set(verdict_key, verdict)
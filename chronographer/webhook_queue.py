@@ -0,0 +1,248 @@
+"""A bounded queue of the webhook events acknowledged ahead of handling."""
+
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import typing
+
+from octomachinery.github.models.events import GitHubWebhookEvent
+from octomachinery.routing.webhooks_dispatcher import route_github_event
+
+from .caching import make_cache
+from .github_app import GitHubApp
+from .metrics import WEBHOOK_QUEUE_DEPTH
+
+
+logger = logging.getLogger(__name__)
+
+
+WEBHOOK_WORKERS = int(os.getenv('CHRONOGRAPHER_WEBHOOK_WORKERS', '0'))
+"""How many events to handle at once; zero disables the queue."""
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv('CHRONOGRAPHER_WEBHOOK_QUEUE_SIZE', '1000'))
+"""How many acknowledged events may wait for handling."""
+
+INSTALLATION_CONCURRENCY = int(
+    os.getenv('CHRONOGRAPHER_INSTALLATION_CONCURRENCY', '4'),
+)
+"""How many events of a single installation to handle at once."""
+
+SHUTDOWN_DRAIN_TIMEOUT = float(
+    os.getenv('CHRONOGRAPHER_SHUTDOWN_DRAIN_TIMEOUT', '30'),
+)
+"""Seconds to keep handling the queued events on shutdown."""
+
+DELIVERY_IDS_TO_REMEMBER = 10_000
+"""How many recent delivery IDs to recognize redeliveries by."""
+
+
+class WebhookQueueFull(RuntimeError):
+    """The queue has no room left for another event."""
+
+
+def _get_installation_id(github_event: GitHubWebhookEvent) -> int | None:
+    """Tell which installation the event belongs to, if any."""
+    with contextlib.suppress(LookupError, TypeError):
+        return github_event.payload['installation']['id']
+    return None
+
+
+class WebhookQueue:  # pylint: disable=too-many-instance-attributes
+    """A pool of workers handling the queued webhook events.
+
+    At most ``maxsize`` events may be pending at any time, counting
+    the ones being handled. Events of an installation that already
+    has ``per_installation_limit`` of them in progress are set aside
+    for the worker finishing one of those to pick up, so that a busy
+    installation never holds up the workers the others could use.
+    Deliveries pending or handled recently are recognized by their IDs
+    and dropped. Those that have failed to dispatch may be redelivered.
+    """
+
+    def __init__(
+            self,
+            *,
+            github_app: GitHubApp,
+            workers: int,
+            maxsize: int,
+            per_installation_limit: int,
+    ) -> None:
+        """Initialize an empty queue with no workers running yet."""
+        self._github_app = github_app
+        self._workers_count = workers
+        self._maxsize = maxsize
+        self._per_installation_limit = per_installation_limit
+
+        self._queue: asyncio.Queue[GitHubWebhookEvent] = asyncio.Queue()
+        self._pending_count = 0
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+        self._in_progress: collections.Counter[int | None] = (
+            collections.Counter()
+        )
+        self._set_aside: collections.defaultdict[
+            int | None, collections.deque[GitHubWebhookEvent],
+        ] = collections.defaultdict(collections.deque)
+        self._pending_delivery_ids: set[str] = set()
+        self._seen_delivery_ids = make_cache(
+            maxsize=DELIVERY_IDS_TO_REMEMBER,
+            name='webhook_deliveries',
+        )
+        self._workers: list[asyncio.Task] = []
+
+    def submit(self, github_event: GitHubWebhookEvent) -> bool:
+        """Enqueue the event unless it's a redelivery.
+
+        Return whether the event has been enqueued. Raise
+        :exc:`WebhookQueueFull` if there's no room left for it.
+        """
+        delivery_id = github_event.delivery_id
+        if (
+                delivery_id in self._pending_delivery_ids
+                or self._seen_delivery_ids.get(delivery_id, False)
+        ):
+            logger.info('Skipping the repeated delivery %s', delivery_id)
+            return False
+
+        if self._pending_count >= self._maxsize:
+            raise WebhookQueueFull(
+                f'{self._pending_count} events are already pending',
+            )
+
+        self._pending_delivery_ids.add(delivery_id)
+        self._pending_count += 1
+        self._all_done.clear()
+        WEBHOOK_QUEUE_DEPTH.set(self._pending_count)
+        self._queue.put_nowait(github_event)
+        return True
+
+    def start(self) -> None:
+        """Spawn the workers."""
+        self._workers = [
+            asyncio.create_task(self._work())
+            for _worker_number in range(self._workers_count)
+        ]
+
+    async def drain(self, timeout: float) -> None:
+        """Finish the pending events and stop the workers.
+
+        Whatever isn't done within ``timeout`` seconds is abandoned.
+        """
+        logger.info(
+            'Draining %d pending webhook events', self._pending_count,
+        )
+        try:
+            await asyncio.wait_for(self._all_done.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                'Abandoning %d webhook events still pending after %ss',
+                self._pending_count, timeout,
+            )
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _work(self) -> None:
+        """Keep handling the queued events."""
+        while True:
+            github_event = await self._queue.get()
+            installation_id = _get_installation_id(github_event)
+            if (
+                    self._in_progress[installation_id]
+                    >= self._per_installation_limit
+            ):
+                self._set_aside[installation_id].append(github_event)
+                continue
+
+            self._in_progress[installation_id] += 1
+            try:
+                await self._handle_installation_events(
+                    installation_id, github_event,
+                )
+            finally:
+                self._in_progress[installation_id] -= 1
+                if not self._in_progress[installation_id]:
+                    del self._in_progress[installation_id]
+
+    async def _handle_installation_events(
+            self,
+            installation_id: int | None,
+            github_event: GitHubWebhookEvent,
+    ) -> None:
+        """Handle the event and those set aside for the installation."""
+        next_event: GitHubWebhookEvent | None = github_event
+        while next_event is not None:
+            try:
+                await self._handle(next_event)
+            finally:
+                self._mark_done()
+
+            set_aside_events = self._set_aside.get(installation_id)
+            next_event = (
+                set_aside_events.popleft() if set_aside_events else None
+            )
+            if set_aside_events is not None and not set_aside_events:
+                del self._set_aside[installation_id]
+
+    async def _handle(self, github_event: GitHubWebhookEvent) -> None:
+        """Dispatch the event in a separate runtime context.
+
+        The delivery is remembered as seen once it's been dispatched.
+        """
+        # NOTE: Running the handlers in their own task gives them a copy
+        # NOTE: of the context vars that `route_github_event()` is free
+        # NOTE: to populate without affecting the other events.
+        try:
+            await asyncio.create_task(
+                route_github_event(
+                    github_event=github_event,
+                    github_app=self._github_app,
+                ),
+            )
+        except Exception:  # pylint: disable=broad-except
+            # NOTE: The dispatcher only logs the failures of the handlers
+            # NOTE: and lets the installation lookup errors through. Those
+            # NOTE: must not take the worker down.
+            logger.exception(
+                'Failed to dispatch the %s event from the delivery %s',
+                github_event.name, github_event.delivery_id,
+            )
+        else:
+            self._seen_delivery_ids[github_event.delivery_id] = True
+        finally:
+            self._pending_delivery_ids.discard(github_event.delivery_id)
+
+    def _mark_done(self) -> None:
+        """Account for an event that's been handled."""
+        self._pending_count -= 1
+        WEBHOOK_QUEUE_DEPTH.set(self._pending_count)
+        if not self._pending_count:
+            self._all_done.set()
+
+
+@contextlib.asynccontextmanager
+async def running_webhook_queue(
+        github_app: GitHubApp,
+) -> typing.AsyncIterator[WebhookQueue | None]:
+    """Run the configured queue, draining it on exit.
+
+    Yield ``None`` if the queue is disabled.
+    """
+    if WEBHOOK_WORKERS <= 0:
+        yield None
+        return
+
+    webhook_queue = WebhookQueue(
+        github_app=github_app,
+        workers=WEBHOOK_WORKERS,
+        maxsize=WEBHOOK_QUEUE_SIZE,
+        per_installation_limit=INSTALLATION_CONCURRENCY,
+    )
+    webhook_queue.start()
+    try:
+        yield webhook_queue
+    finally:
+        await webhook_queue.drain(SHUTDOWN_DRAIN_TIMEOUT)
@@ -0,0 +1,75 @@
+"""Tests of the cache shared between the processes."""
+
+import contextlib
+import sqlite3
+
+import pytest
+
+from chronographer.caching import SQLiteCache
+
+
+@pytest.fixture(name='cache_path')
+def cache_path_fixture(tmp_path):
+    """Return the path of a fresh shared cache database."""
+    return str(tmp_path / 'shared-cache.db')
+
+
+@contextlib.contextmanager
+def _write_locked_database(cache_path):
+    """Keep another connection writing to the database."""
+    locking_connection = sqlite3.connect(cache_path, isolation_level=None)
+    locking_connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    finally:
+        locking_connection.rollback()
+        locking_connection.close()
+
+
+def test_entries_round_trip(cache_path):
+    """Check that the stored values are returned as they were."""
+    cache = SQLiteCache(path=cache_path, maxsize=10, name='round_trip')
+    cache['key'] = {'value': [1, 2]}
+
+    assert cache['key'] == {'value': [1, 2]}
+    assert cache.get('missing') is None
+    assert len(cache) == 1
+
+
+def test_oldest_entries_are_evicted(cache_path):
+    """Check that the cache is trimmed back to ``maxsize`` periodically."""
+    cache = SQLiteCache(path=cache_path, maxsize=10, name='eviction')
+    for key in range(25):
+        cache[key] = key
+
+    assert 10 <= len(cache) <= 11
+    assert cache.get(24) == 24
+    assert cache.get(0) is None
+
+
+def test_locked_database_skips_the_writes(cache_path):
+    """Check that the writes give up on a database locked by another."""
+    cache = SQLiteCache(path=cache_path, maxsize=10, name='locked')
+    cache['key'] = 'value'
+
+    with _write_locked_database(cache_path):
+        cache['another-key'] = 'value'
+        assert not cache.invalidate('key')
+        cache.clear()
+        assert cache.get('key') == 'value'
+        assert len(cache) == 1
+
+    assert cache.get('another-key') is None
+    assert cache.get('key') == 'value'
+
+
+def test_unusable_database_is_a_cache_miss(tmp_path):
+    """Check that every operation degrades gracefully without a database."""
+    cache = SQLiteCache(path=str(tmp_path), maxsize=10, name='unusable')
+
+    cache['key'] = 'value'
+    assert cache.get('key', 'default') == 'default'
+    assert not cache.invalidate('key')
+    cache.clear()
+    assert not cache
+    assert cache.info() == (0, 1, 10, 0)
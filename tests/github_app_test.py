@@ -0,0 +1,126 @@
+"""Tests of the installation tokens renewed ahead of their expiry."""
+# NOTE: The token lookup is checked directly so that the tests don't
+# NOTE: need an API client around it.
+# pylint: disable=protected-access
+
+import asyncio
+import logging
+import time
+
+from octomachinery.github.models import GitHubInstallationAccessToken
+
+from chronographer.github_app import (
+    INSTALLATION_TOKEN_MIN_VALIDITY,
+    INSTALLATION_TOKEN_REFRESH_MARGIN,
+    GitHubAppInstallation,
+)
+
+
+def _make_token(value, *, valid_for):
+    """Make an installation token expiring in ``valid_for`` seconds."""
+    return GitHubInstallationAccessToken(
+        token=value,
+        expires_at=int(time.time() + valid_for),
+        permissions={},
+        repository_selection='all',
+    )
+
+
+class _StubInstallation(GitHubAppInstallation):
+    """An installation handing out the tokens it's been given."""
+
+    def __init__(self, *tokens, token_request_duration=0.01):
+        """Initialize an installation without a token yet."""
+        super().__init__(metadata=None, github_app=None)
+        self.tokens = list(tokens)
+        self.token_request_duration = token_request_duration
+        self.token_requests_count = 0
+
+    async def get_token(self):
+        """Hand out the next token or fail if there's none left."""
+        self.token_requests_count += 1
+        await asyncio.sleep(self.token_request_duration)
+        if not self.tokens:
+            raise LookupError('GitHub refused to issue a token')
+
+        return self.tokens.pop(0)
+
+
+def _get_token_values(installation, requests_count):
+    """Request the token concurrently and return the values received."""
+    async def request_tokens():
+        api_tokens = await asyncio.gather(*(
+            installation._refresh_api_token()
+            for _request_number in range(requests_count)
+        ))
+        if installation._token_refresh is not None:
+            await asyncio.wait({installation._token_refresh})
+        return [str(api_token) for api_token in api_tokens]
+
+    return asyncio.run(request_tokens())
+
+
+def test_first_token_is_requested_once():
+    """Check that the concurrent callers share the first token request."""
+    installation = _StubInstallation(
+        _make_token('first', valid_for=3600),
+        _make_token('second', valid_for=3600),
+    )
+
+    assert _get_token_values(installation, 5) == ['first'] * 5
+    assert installation.token_requests_count == 1
+
+
+def test_fresh_token_is_reused():
+    """Check that no token is requested while the current one is fresh."""
+    installation = _StubInstallation(_make_token('first', valid_for=3600))
+    _get_token_values(installation, 1)
+
+    assert _get_token_values(installation, 3) == ['first'] * 3
+    assert installation.token_requests_count == 1
+
+
+def test_expiring_token_is_renewed_in_background():
+    """Check that a token close to its expiry is used while renewed."""
+    installation = _StubInstallation(
+        _make_token(
+            'expiring',
+            valid_for=(
+                INSTALLATION_TOKEN_MIN_VALIDITY
+                + INSTALLATION_TOKEN_REFRESH_MARGIN
+            ) / 2,
+        ),
+        _make_token('renewed', valid_for=3600),
+    )
+    _get_token_values(installation, 1)
+
+    assert _get_token_values(installation, 3) == ['expiring'] * 3
+    assert installation.token_requests_count == 2
+    assert _get_token_values(installation, 1) == ['renewed']
+
+
+def test_almost_expired_token_is_waited_for():
+    """Check that a token about to expire is never handed out."""
+    installation = _StubInstallation(
+        _make_token('almost-expired', valid_for=1),
+        _make_token('renewed', valid_for=3600),
+    )
+    _get_token_values(installation, 1)
+
+    assert _get_token_values(installation, 3) == ['renewed'] * 3
+    assert installation.token_requests_count == 2
+
+
+def test_failed_background_renewal_is_logged_and_retried(caplog):
+    """Check that a failed renewal keeps the current token in use."""
+    installation = _StubInstallation(
+        _make_token('expiring', valid_for=INSTALLATION_TOKEN_MIN_VALIDITY * 2),
+    )
+    _get_token_values(installation, 1)
+
+    with caplog.at_level(logging.ERROR):
+        assert _get_token_values(installation, 1) == ['expiring']
+        assert 'Failed to renew an installation token' in caplog.text
+
+    assert _get_token_values(installation, 1) == ['expiring']
+    assert installation.token_requests_count == 3
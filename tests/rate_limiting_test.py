@@ -0,0 +1,135 @@
+"""Tests of the pacing of the installation API requests."""
+# NOTE: The delay computation is checked directly so that the tests
+# NOTE: don't have to wait for it.
+# pylint: disable=protected-access
+
+import asyncio
+import time
+
+import pytest
+
+from chronographer import rate_limiting
+from chronographer.rate_limiting import (
+    RATE_LIMIT_RESERVE,
+    InstallationRateLimiter,
+    OptionalRequestDeferred,
+    RequestPriority,
+)
+
+
+WINDOW_LENGTH = 100
+"""Seconds until the quotas reported in the tests reset."""
+
+
+def _make_limiter(remaining, *, limit=5000, resets_in=WINDOW_LENGTH):
+    """Make a limiter having learned the core quota state."""
+    rate_limiter = InstallationRateLimiter()
+    rate_limiter.update(
+        'core', 200,
+        {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(time.time() + resets_in),
+        },
+    )
+    return rate_limiter
+
+
+@pytest.mark.parametrize('priority', tuple(RequestPriority))
+def test_plentiful_quota_lets_requests_through(priority):
+    """Check that nothing is held back with most of the quota left."""
+    rate_limiter = _make_limiter(remaining=4000)
+
+    assert rate_limiter._get_delay('core', priority) == (0, None)
+
+
+def test_unknown_quota_lets_requests_through():
+    """Check that nothing is held back before the quota is reported."""
+    rate_limiter = InstallationRateLimiter()
+
+    assert rate_limiter._get_delay('core', RequestPriority.NORMAL) == (
+        0, None,
+    )
+
+
+def test_exhausted_quota_holds_requests_until_reset():
+    """Check that even the critical requests wait for the window reset."""
+    rate_limiter = _make_limiter(remaining=0)
+
+    delay, reason = rate_limiter._get_delay('core', RequestPriority.CRITICAL)
+
+    assert reason == 'exhausted'
+    assert WINDOW_LENGTH - 1 < delay <= WINDOW_LENGTH
+
+
+def test_reserve_is_kept_for_critical_requests():
+    """Check that only the check run writes may spend the reserve."""
+    rate_limiter = _make_limiter(remaining=RATE_LIMIT_RESERVE)
+
+    delay, reason = rate_limiter._get_delay('core', RequestPriority.NORMAL)
+
+    assert reason == 'reserve'
+    assert WINDOW_LENGTH - 1 < delay <= WINDOW_LENGTH
+    assert rate_limiter._get_delay('core', RequestPriority.CRITICAL) == (
+        0, None,
+    )
+
+
+def test_optional_requests_are_deferred_when_paced():
+    """Check that the optional requests give way once the quota is low."""
+    rate_limiter = _make_limiter(remaining=RATE_LIMIT_RESERVE + 100)
+
+    assert rate_limiter._get_delay('core', RequestPriority.OPTIONAL) == (
+        0, 'deferred',
+    )
+    with pytest.raises(OptionalRequestDeferred):
+        asyncio.run(rate_limiter.acquire('core', RequestPriority.OPTIONAL))
+
+
+def test_paced_requests_are_spread_until_reset():
+    """Check that the rest of the quota is spaced over the window."""
+    rate_limiter = _make_limiter(remaining=RATE_LIMIT_RESERVE + 100)
+
+    assert rate_limiter._get_delay('core', RequestPriority.NORMAL) == (
+        0, None,
+    )
+    delay, reason = rate_limiter._get_delay('core', RequestPriority.NORMAL)
+
+    assert reason == 'pacing'
+    assert WINDOW_LENGTH / 100 - 0.1 < delay <= WINDOW_LENGTH / 100
+
+
+def test_retry_after_holds_every_request_back():
+    """Check that the secondary rate limits stop the critical requests."""
+    rate_limiter = InstallationRateLimiter()
+    rate_limiter.update('core', 403, {'Retry-After': '30'})
+
+    delay, reason = rate_limiter._get_delay('core', RequestPriority.CRITICAL)
+
+    assert reason == 'retry_after'
+    assert 29 < delay <= 30
+
+
+def test_long_wait_checks_the_quota_again(monkeypatch):
+    """Check that a request waits in capped steps until it may go."""
+    monkeypatch.setattr(rate_limiting, 'RATE_LIMIT_MAX_WAIT', 0.01)
+    rate_limiter = InstallationRateLimiter()
+    rate_limiter.update('core', 429, {'Retry-After': '0.05'})
+
+    started_at = time.monotonic()
+    asyncio.run(rate_limiter.acquire('core', RequestPriority.CRITICAL))
+
+    assert time.monotonic() - started_at >= 0.04
+    assert rate_limiter._get_delay('core', RequestPriority.CRITICAL) == (
+        0, None,
+    )
+
+
+def test_limiters_are_shared_per_installation():
+    """Check that the clients of an installation share its limiter."""
+    assert rate_limiting.get_rate_limiter(1) is (
+        rate_limiting.get_rate_limiter(1)
+    )
+    assert rate_limiting.get_rate_limiter(1) is not (
+        rate_limiting.get_rate_limiter(2)
+    )
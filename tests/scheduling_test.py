@@ -0,0 +1,140 @@
+"""Tests of the coalescing of the PR evaluations."""
+
+import asyncio
+
+from chronographer.scheduling import CoalescingScheduler
+
+
+DEBOUNCE_WINDOW = 0.01
+"""Seconds the scheduler under test squashes the bursts within."""
+
+
+def _make_evaluation(evaluated, label, *, duration=0):
+    """Make an evaluation recording its start and end under the label."""
+    async def evaluate():
+        evaluated.append(f'{label} started')
+        await asyncio.sleep(duration)
+        evaluated.append(f'{label} finished')
+        return label
+
+    return evaluate
+
+
+def test_burst_only_evaluates_the_newest():
+    """Check that the superseded pending evaluations never run."""
+    evaluated = []
+
+    async def submit_burst():
+        scheduler = CoalescingScheduler(debounce_window=DEBOUNCE_WINDOW)
+        return await asyncio.gather(*(
+            scheduler.run_coalesced(
+                'org/repo#1', 'sha', _make_evaluation(evaluated, label),
+            )
+            for label in ('first', 'second', 'third')
+        ))
+
+    assert asyncio.run(submit_burst()) == [None, None, 'third']
+    assert evaluated == ['third started', 'third finished']
+
+
+def test_new_head_cancels_the_running_evaluation():
+    """Check that a running evaluation of an outdated head is dropped."""
+    evaluated = []
+
+    async def push_while_evaluating():
+        scheduler = CoalescingScheduler(debounce_window=DEBOUNCE_WINDOW)
+        outdated = asyncio.create_task(
+            scheduler.run_coalesced(
+                'org/repo#1', 'old-sha',
+                _make_evaluation(evaluated, 'old', duration=1),
+            ),
+        )
+        await asyncio.sleep(DEBOUNCE_WINDOW * 5)
+        current = await scheduler.run_coalesced(
+            'org/repo#1', 'new-sha', _make_evaluation(evaluated, 'new'),
+        )
+        return await outdated, current
+
+    assert asyncio.run(push_while_evaluating()) == (None, 'new')
+    assert evaluated == ['old started', 'new started', 'new finished']
+
+
+def test_same_head_waits_for_the_running_evaluation():
+    """Check that the evaluations of the same head never overlap."""
+    evaluated = []
+
+    async def relabel_while_evaluating():
+        scheduler = CoalescingScheduler(debounce_window=DEBOUNCE_WINDOW)
+        running = asyncio.create_task(
+            scheduler.run_coalesced(
+                'org/repo#1', 'sha',
+                _make_evaluation(evaluated, 'running', duration=0.05),
+            ),
+        )
+        await asyncio.sleep(DEBOUNCE_WINDOW * 2)
+        following = await scheduler.run_coalesced(
+            'org/repo#1', 'sha', _make_evaluation(evaluated, 'following'),
+        )
+        return await running, following
+
+    assert asyncio.run(relabel_while_evaluating()) == (
+        'running', 'following',
+    )
+    assert evaluated == [
+        'running started', 'running finished',
+        'following started', 'following finished',
+    ]
+
+
+def test_pending_evaluation_waits_for_the_running_one():
+    """Check that squashing a pending evaluation keeps the order."""
+    evaluated = []
+
+    async def burst_while_evaluating():
+        scheduler = CoalescingScheduler(debounce_window=DEBOUNCE_WINDOW)
+        running = asyncio.create_task(
+            scheduler.run_coalesced(
+                'org/repo#1', 'sha',
+                _make_evaluation(evaluated, 'running', duration=0.05),
+            ),
+        )
+        await asyncio.sleep(DEBOUNCE_WINDOW * 2)
+        return await asyncio.gather(
+            running,
+            *(
+                scheduler.run_coalesced(
+                    'org/repo#1', 'sha', _make_evaluation(evaluated, label),
+                )
+                for label in ('squashed', 'newest')
+            ),
+        )
+
+    assert asyncio.run(burst_while_evaluating()) == [
+        'running', None, 'newest',
+    ]
+    assert evaluated == [
+        'running started', 'running finished',
+        'newest started', 'newest finished',
+    ]
+
+
+def test_different_prs_are_evaluated_independently():
+    """Check that the evaluations of different PRs don't affect others."""
+    evaluated = []
+
+    async def submit_for_two_prs():
+        scheduler = CoalescingScheduler(debounce_window=DEBOUNCE_WINDOW)
+        return await asyncio.gather(
+            scheduler.run_coalesced(
+                'org/repo#1', 'sha', _make_evaluation(evaluated, 'first PR'),
+            ),
+            scheduler.run_coalesced(
+                'org/repo#2', 'sha', _make_evaluation(evaluated, 'second PR'),
+            ),
+        )
+
+    assert asyncio.run(submit_for_two_prs()) == ['first PR', 'second PR']
+    assert sorted(evaluated) == [
+        'first PR finished', 'first PR started',
+        'second PR finished', 'second PR started',
+    ]
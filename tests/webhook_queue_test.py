@@ -0,0 +1,156 @@
+"""Tests of the queue of the webhook events acknowledged ahead of time."""
+
+import asyncio
+import collections
+import uuid
+
+from octomachinery.github.models.events import GitHubWebhookEvent
+import pytest
+
+from chronographer import webhook_queue
+from chronographer.webhook_queue import WebhookQueue, WebhookQueueFull
+
+
+class _DispatchRecorder:  # pylint: disable=too-few-public-methods
+    """A stand-in for the event dispatcher recording what it's given."""
+
+    def __init__(self, *, duration=0, failing_delivery_ids=()):
+        """Initialize a dispatcher taking ``duration`` seconds per event."""
+        self.duration = duration
+        self.failing_delivery_ids = set(failing_delivery_ids)
+        self.dispatched = []
+        self.in_progress = collections.Counter()
+        self.peak_in_progress = collections.Counter()
+
+    async def __call__(self, *, github_event, github_app):
+        """Record the event, failing the dispatch if asked to."""
+        installation_id = github_event.payload['installation']['id']
+        self.in_progress[installation_id] += 1
+        self.peak_in_progress[installation_id] = max(
+            self.peak_in_progress[installation_id],
+            self.in_progress[installation_id],
+        )
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.in_progress[installation_id] -= 1
+
+        self.dispatched.append(github_event.delivery_id)
+        if github_event.delivery_id in self.failing_delivery_ids:
+            raise LookupError('The installation is gone')
+
+
+def _make_event(delivery_id, installation_id=1):
+    """Make a webhook event of the installation."""
+    return GitHubWebhookEvent(
+        name='pull_request',
+        payload={'installation': {'id': installation_id}},
+        delivery_id=delivery_id,
+    )
+
+
+def _make_queue(**queue_kwargs):
+    """Make a queue with the defaults the tests rely on."""
+    return WebhookQueue(
+        **{
+            'github_app': None,
+            'workers': 2,
+            'maxsize': 10,
+            'per_installation_limit': 2,
+            **queue_kwargs,
+        },
+    )
+
+
+@pytest.fixture(name='dispatch_recorder')
+def dispatch_recorder_fixture(monkeypatch):
+    """Replace the event dispatcher with a recording one."""
+    recorder = _DispatchRecorder()
+    monkeypatch.setattr(webhook_queue, 'route_github_event', recorder)
+    return recorder
+
+
+def test_repeated_delivery_is_dropped(dispatch_recorder):
+    """Check that the pending and the handled deliveries aren't repeated."""
+    delivery_id = uuid.uuid4()
+
+    async def deliver_thrice():
+        queue = _make_queue()
+        queue.start()
+        submissions = [
+            queue.submit(_make_event(delivery_id)),
+            queue.submit(_make_event(delivery_id)),
+        ]
+        await queue.drain(timeout=1)
+        submissions.append(queue.submit(_make_event(delivery_id)))
+        return submissions
+
+    assert asyncio.run(deliver_thrice()) == [True, False, False]
+    assert dispatch_recorder.dispatched == [delivery_id]
+
+
+def test_failed_dispatch_may_be_redelivered(dispatch_recorder):
+    """Check that a delivery failing to dispatch isn't remembered."""
+    delivery_id = uuid.uuid4()
+    dispatch_recorder.failing_delivery_ids.add(delivery_id)
+
+    async def redeliver_after_failure():
+        queue = _make_queue()
+        queue.start()
+        queue.submit(_make_event(delivery_id))
+        await queue.drain(timeout=1)
+
+        queue.start()
+        is_redelivered = queue.submit(_make_event(delivery_id))
+        await queue.drain(timeout=1)
+        return is_redelivered
+
+    assert asyncio.run(redeliver_after_failure())
+    assert dispatch_recorder.dispatched == [delivery_id, delivery_id]
+
+
+def test_full_queue_rejects_events(dispatch_recorder):
+    """Check that no more than ``maxsize`` events may be pending."""
+    dispatch_recorder.duration = 0.05
+    rejected_delivery_id = uuid.uuid4()
+
+    async def overfill():
+        queue = _make_queue(maxsize=3)
+        queue.start()
+        for _delivery_number in range(3):
+            queue.submit(_make_event(uuid.uuid4()))
+        with pytest.raises(WebhookQueueFull):
+            queue.submit(_make_event(rejected_delivery_id))
+
+        await queue.drain(timeout=1)
+        queue.start()
+        is_accepted_after_drain = queue.submit(
+            _make_event(rejected_delivery_id),
+        )
+        await queue.drain(timeout=1)
+        return is_accepted_after_drain
+
+    assert asyncio.run(overfill())
+    assert rejected_delivery_id not in dispatch_recorder.dispatched[:3]
+    assert dispatch_recorder.dispatched[3:] == [rejected_delivery_id]
+
+
+def test_busy_installation_leaves_workers_to_others(dispatch_recorder):
+    """Check that an installation never exceeds its concurrency limit."""
+    dispatch_recorder.duration = 0.02
+    quiet_delivery_id = uuid.uuid4()
+
+    async def flood_from_one_installation():
+        queue = _make_queue(workers=4, maxsize=20, per_installation_limit=2)
+        queue.start()
+        for _delivery_number in range(10):
+            queue.submit(_make_event(uuid.uuid4()))
+        queue.submit(_make_event(quiet_delivery_id, installation_id=2))
+        await asyncio.sleep(dispatch_recorder.duration * 2)
+        is_quiet_done = quiet_delivery_id in dispatch_recorder.dispatched
+        await queue.drain(timeout=1)
+        return is_quiet_done
+
+    assert asyncio.run(flood_from_one_installation())
+    assert dispatch_recorder.peak_in_progress == {1: 2, 2: 1}
+    assert len(dispatch_recorder.dispatched) == 11